@@ -0,0 +1,129 @@
+"""
+Micro-benchmark of batch text cleaning against the per-text implementation.
+
+Generates VK-like texts with mentions, links, Tangut runs and other tricky
+characters, checks that TextProcessor.clean_text and clean_texts produce
+exactly the output of the original per-character implementation and
+reports the time of each variant.
+
+Usage (from the crawler-vk directory):
+    uv run python -m benchmarks.clean_text --texts 20000
+"""
+
+import argparse
+import random
+import re
+import time
+
+import pandas as pd
+
+from src.crawler.preprocessing.text_processor import TextProcessor
+
+FRAGMENTS = [
+    "Мне Очень ГРУСТНО сегодня",
+    "[id123|Иван Иванов], привет!",
+    "[club1|Сообщество] [id2|Анна]",
+    "смотри https://vk.com/wall-1_2?x=1 и www.example.com/page",
+    "http",
+    "ΟΔΟΣ ΣΟΦΟΣ Σ",
+    "İstanbul",
+    "\U00017000\U00017001 тангут \U00018800\U00018d00",
+    "\U00018aff",
+    "\n\n  ",
+    "[незакрытая|скобка",
+    "\0",
+    "",
+    "ёжик в тумане…",
+]
+
+
+def legacy_clean_text(text: str) -> str:
+    """Original clean_text implementation kept as a reference."""
+
+    def is_tangut(ch):
+        code_point = ord(ch)
+        return (
+            (0x17000 <= code_point <= 0x187FF)
+            or (0x18800 <= code_point <= 0x18AFF)
+            or (0x18D00 <= code_point <= 0x18D8F)
+        )
+
+    def replace_vk_mentions(text):
+        return re.sub(r"\[.*?\|(.*?)\]", "<NAME>", text)
+
+    def replace_url(text):
+        return re.sub(r"http\S+|www\.\S+", "<URL>", text)
+
+    def replace_tangut(text):
+        result = []
+        inside_tangut = False
+
+        for ch in text:
+            if is_tangut(ch):
+                if not inside_tangut:
+                    result.append("<UNK>")
+                    inside_tangut = True
+            else:
+                result.append(ch)
+                inside_tangut = False
+        return "".join(result)
+
+    text = text.lower()
+    text = replace_vk_mentions(text)
+    text = replace_url(text)
+    text = replace_tangut(text)
+    return text
+
+
+def generate_texts(count: int, seed: int = 0) -> list[str]:
+    """Generate texts built from random fragments."""
+    rng = random.Random(seed)
+    separators = [" ", "", "\n", "|", "]"]
+    return [
+        "".join(
+            rng.choice(FRAGMENTS) + rng.choice(separators)
+            for _ in range(rng.randint(0, 12))
+        )
+        for _ in range(count)
+    ]
+
+
+def measure(name: str, func, *args):
+    """Run func once and print its duration."""
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{name:<24}{time.perf_counter() - start:>10.3f} s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=20000)
+    args = parser.parse_args()
+
+    texts = generate_texts(args.texts)
+    processor = TextProcessor()
+
+    expected = measure(
+        "legacy clean_text", lambda: [legacy_clean_text(t) for t in texts]
+    )
+    per_text = measure(
+        "clean_text", lambda: [processor.clean_text(t) for t in texts]
+    )
+    batch_list = measure("clean_texts (list)", processor.clean_texts, texts)
+    series = pd.Series(texts, index=range(1, len(texts) * 2, 2))
+    batch_series = measure(
+        "clean_texts (Series)", processor.clean_texts, series
+    )
+
+    assert per_text == expected, "clean_text output differs"
+    assert batch_list == expected, "clean_texts output differs for list"
+    assert batch_series.tolist() == expected, "clean_texts Series differs"
+    assert batch_series.index.equals(series.index), "Series index differs"
+    # Texts containing the separator fall back to per-text cleaning
+    assert processor.clean_texts(["a\n\0\nb", "C"]) == ["a\n\0\nb", "c"]
+    print("Outputs are identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Offline benchmark of pipeline stages on synthetic VK data.
+
+Trains a tiny vectorizer and classifier, collects synthetic groups through
+the real Collector backed by a fake VK API client and times each stage of
+the pipeline at several corpus sizes: collect, load, clean, tokenize,
+features, embed, predict and save. Saving runs against the configured
+Postgres database in a transaction that is rolled back.
+
+Timings are compared with a baseline and the exit code is 1 if a stage
+got slower than the tolerance allows. Baselines depend on the machine,
+record one before changing the code and compare after.
+
+Usage (from the crawler-vk directory):
+    uv run python -m benchmarks.pipeline --sizes 1000 5000 --save-baseline
+    uv run python -m benchmarks.pipeline --sizes 1000 5000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+STAGES = [
+    "collect",
+    "load",
+    "clean",
+    "tokenize",
+    "features",
+    "embed",
+    "predict",
+    "save",
+]
+GROUPS = 4
+# Collected posts are newer than this date
+TARGET_DATE = "2023-11-01"
+# Differences below this many seconds are noise, not regressions
+MIN_REGRESSION_SECONDS = 0.02
+
+
+def configure(work_dir: Path) -> None:
+    """Point settings at benchmark models and data, before src is imported."""
+    os.environ["VECTORIZER_MODEL_PATH"] = str(work_dir / "models/vectorizer")
+    os.environ["CLASSIFIER_MODEL_PATH"] = str(work_dir / "models/classifier")
+    os.environ["DATA_DIR"] = str(work_dir / "data")
+    os.environ.setdefault("SERVICE_TOKEN", "benchmark")
+
+
+def prepare_models(vk, rebuild: bool) -> None:
+    """Train the tiny models unless they are already in place."""
+    from benchmarks.synthetic import train_models
+    from src.config import settings
+
+    if rebuild or not (settings.classifier_model_path / "model.pkl").exists():
+        for path in (
+            settings.vectorizer_model_path,
+            settings.classifier_model_path,
+        ):
+            shutil.rmtree(path, ignore_errors=True)
+        start = time.perf_counter()
+        train_models(
+            settings.vectorizer_model_path,
+            settings.classifier_model_path,
+            vk,
+            settings.bow_count_feature,
+        )
+        print(f"Trained models in {time.perf_counter() - start:.1f}s")
+
+
+def timed(timings: Dict[str, float], stage: str, func: Callable, *args):
+    """Call func and keep the fastest time of the stage."""
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    timings[stage] = min(timings.get(stage, elapsed), elapsed)
+    return result
+
+
+def collect(vk, data_dir: Path, domains: List[str]):
+    """Collect synthetic groups, posts and comments with the Collector."""
+    from benchmarks.synthetic import create_fake_collector
+    from src.crawler.collect_data import collect_data
+    from src.crawler.collect_groups import collect_groups
+    from src.crawler.status_manager.status_manager import CrawlerStatusManager
+
+    shutil.rmtree(data_dir, ignore_errors=True)
+    collector = create_fake_collector(vk)
+    status_manager = CrawlerStatusManager()
+    # The Collector prints progress of every request
+    with contextlib.redirect_stdout(io.StringIO()):
+        groups_files = collect_groups(
+            domains, TARGET_DATE, data_dir, collector, status_manager
+        )
+        posts_files, comments_files = collect_data(
+            domains, TARGET_DATE, str(data_dir), collector, status_manager
+        )
+    return groups_files, posts_files, comments_files
+
+
+def run_stages(
+    timings: Dict[str, float],
+    files,
+    models,
+    conn,
+) -> int:
+    """
+    Run load to save stages once, keeping the fastest time of each.
+
+    Returns:
+        Number of loaded publications
+    """
+    import numpy as np
+    import pandas as pd
+
+    from src.config import settings
+    from src.crawler.database_handler.database_handler import DatabaseHandler
+    from src.crawler.predict_depression import (
+        apply_predictions,
+        predict_depression,
+    )
+    from src.crawler.prediction_cache.prediction_cache import text_hash
+    from src.crawler.preprocess_data import iter_publications, run_tokenizer
+    from src.crawler.preprocess_groups import preprocess_groups
+    from src.crawler.preprocessing.feature_extractor import (
+        DepressionFeatureExtractor,
+    )
+    from src.crawler.preprocessing.mean_embedder import MeanEmbedder
+
+    groups_files, posts_files, comments_files = files
+
+    def load() -> pd.DataFrame:
+        return pd.concat(
+            list(iter_publications(posts_files, comments_files)),
+            ignore_index=True,
+        )
+
+    def clean(publications: pd.DataFrame) -> pd.DataFrame:
+        publications = publications.copy()
+        text_processor = models.get_text_processor()
+        publications["text"] = text_processor.clean_texts(publications["text"])
+        publications["text_hash"] = publications["text"].map(text_hash)
+        return publications
+
+    def features(data: pd.DataFrame) -> pd.DataFrame:
+        extractor = DepressionFeatureExtractor(
+            str(settings.depression_dictionary_path)
+        )
+        dictionary = extractor.extract_features(data["tokens"].tolist())
+        bow = extractor.select_features(
+            dictionary, models.get_selected_features()
+        )
+        bow.index = data.index
+        return pd.concat([data, bow], axis=1)
+
+    def embed(data: pd.DataFrame):
+        embedder = MeanEmbedder(models.get_vectorizer())
+        embeddings, mask = embedder.transform(data["tokens"].tolist())
+        return data[mask], embeddings
+
+    def predict(publications, data, embeddings) -> pd.DataFrame:
+        predict_depression(data, embeddings, models)
+        publications = publications.drop(columns="text")
+        publications["depression_prediction"] = np.nan
+        return apply_predictions(publications, data)
+
+    def save(results: pd.DataFrame) -> None:
+        groups_data = preprocess_groups(groups_files)
+        db_handler = DatabaseHandler(
+            conn=conn,
+            group_ids=groups_data["id"].tolist(),
+            target_date=pd.Timestamp(TARGET_DATE).date(),
+        )
+        try:
+            db_handler.save_groups(groups_data)
+            run_id = db_handler.save_run()
+            db_handler.save_predictions(run_id, results)
+        finally:
+            # Keep the database as it was, only the writes are measured
+            conn.rollback()
+
+    publications = timed(timings, "load", load)
+    publications = timed(timings, "clean", clean, publications)
+    data = publications.drop_duplicates("text_hash")
+    data = data.assign(
+        tokens=timed(
+            timings, "tokenize", run_tokenizer, data["text"].tolist(), models
+        )
+    )
+    data = data[data["tokens"].apply(len) > 0]
+    data = timed(timings, "features", features, data)
+    data, embeddings = timed(timings, "embed", embed, data)
+    results = timed(timings, "predict", predict, publications, data, embeddings)
+    if conn is not None:
+        timed(timings, "save", save, results)
+    return len(publications)
+
+
+def connect(enabled: bool):
+    """Open a database connection, None if disabled or unavailable."""
+    if not enabled:
+        return None
+    from src.db.db import create_tables, get_db_connection
+
+    try:
+        conn = get_db_connection()
+        create_tables(conn)
+        return conn
+    except Exception as e:
+        print(f"Database is unavailable, skipping the save stage: {e}")
+        return None
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float,
+) -> List[str]:
+    """
+    Find stages slower than the baseline by more than the tolerance.
+
+    Returns:
+        Descriptions of regressions
+    """
+    regressions = []
+    for size, timings in results.items():
+        for stage, seconds in timings.items():
+            if stage == "publications":
+                continue
+            base = baseline.get(size, {}).get(stage)
+            if base is None:
+                continue
+            if (
+                seconds > base * (1 + tolerance)
+                and seconds - base > MIN_REGRESSION_SECONDS
+            ):
+                regressions.append(
+                    f"{stage} at {size} posts: {seconds:.3f}s, "
+                    f"baseline {base:.3f}s ({seconds / base - 1:+.0%})"
+                )
+    return regressions
+
+
+def print_table(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+) -> None:
+    """Print seconds of each stage and the change against the baseline."""
+    print(f"{'posts':>8} {'texts':>8} " + " ".join(f"{s:>14}" for s in STAGES))
+    for size, timings in results.items():
+        cells = []
+        for stage in STAGES:
+            seconds = timings.get(stage)
+            base = baseline.get(size, {}).get(stage)
+            if seconds is None:
+                cell = "-"
+            elif base:
+                cell = f"{seconds:.3f} {seconds / base - 1:+.0%}"
+            else:
+                cell = f"{seconds:.3f}"
+            cells.append(f"{cell:>14}")
+        print(f"{size:>8} {int(timings['publications']):>8} " + " ".join(cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 5000, 20000],
+        help="Numbers of posts in the corpus",
+    )
+    parser.add_argument("--comments", type=float, default=2.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--work-dir", type=Path, default=Path("data/benchmark"))
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=Path("data/benchmark/baseline.json"),
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Save timings as the new baseline instead of comparing",
+    )
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--no-db", action="store_true")
+    parser.add_argument("--rebuild-models", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    work_dir = args.work_dir.resolve()
+    configure(work_dir)
+
+    from benchmarks.synthetic import SyntheticVK, load_dictionary
+    from src.config import settings
+    from src.crawler.model_registry.model_registry import ModelRegistry
+
+    dictionary = load_dictionary(settings.depression_dictionary_path)
+    prepare_models(SyntheticVK(dictionary, seed=args.seed), args.rebuild_models)
+
+    models = ModelRegistry()
+    start = time.perf_counter()
+    models.get_vectorizer()
+    models.get_classifier()
+    models.get_text_processor()
+    print(f"Loaded models in {time.perf_counter() - start:.2f}s")
+
+    conn = connect(not args.no_db)
+    domains = [f"synthetic_{i}" for i in range(GROUPS)]
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        for size in args.sizes:
+            vk = SyntheticVK(
+                dictionary,
+                posts_per_group=max(1, size // GROUPS),
+                comments_per_post=args.comments,
+                seed=args.seed,
+            )
+            data_dir = work_dir / "corpus" / str(size)
+            timings: Dict[str, float] = {}
+            for _ in range(args.repeat):
+                files = timed(
+                    timings, "collect", collect, vk, data_dir, domains
+                )
+                publications = run_stages(timings, files, models, conn)
+            timings["publications"] = publications
+            results[str(size)] = timings
+    finally:
+        if conn is not None:
+            conn.close()
+
+    baseline = {}
+    if args.baseline.exists() and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "machine": platform.node(),
+                    "python": platform.python_version(),
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+"""
+Synthetic VK data and tiny models for offline benchmarks.
+
+Generates groups, posts and comments shaped like VK API responses, serves
+them through a fake VK API client to the real Collector and trains a small
+FastText vectorizer and SVC classifier laid out like the production models.
+Data is deterministic for a seed, so runs are comparable.
+
+Usage (from the crawler-vk directory):
+    uv run python -m benchmarks.synthetic --out data/synthetic --posts 1000
+"""
+
+import argparse
+import json
+import pickle
+import random
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Neutral words mixed with depression dictionary words into texts
+COMMON_WORDS = (
+    "день утро вечер город дом работа учеба друг семья кот собака солнце "
+    "дождь снег музыка фильм книга море лето зима весна осень праздник "
+    "дорога машина магазин кофе чай ужин завтрак прогулка парк спорт "
+    "новость выходной отпуск поездка фотография концерт подарок сосед "
+    "школа университет экзамен проект встреча разговор звонок письмо "
+    "хороший новый большой красивый интересный смешной теплый быстрый "
+    "гулять читать смотреть слушать думать говорить писать работать"
+).split()
+DECORATIONS = [
+    "[id{id}|Иван Петров], привет!",
+    "подробнее https://vk.com/wall-{id}_1",
+    "смотри www.example.com/page{id}",
+    "!!! ...",
+    "🙂",
+]
+# Dates of generated posts go back from this timestamp
+BASE_TIMESTAMP = 1_700_000_000
+
+
+def load_dictionary(path: Path) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class SyntheticVK:
+    """Deterministic VK groups with posts and comments."""
+
+    def __init__(
+        self,
+        dictionary: List[str],
+        posts_per_group: int = 100,
+        comments_per_post: float = 2.0,
+        replies_per_comment: float = 0.5,
+        depressive_share: float = 0.2,
+        seed: int = 0,
+    ) -> None:
+        """
+        Args:
+            dictionary: Depression dictionary words
+            posts_per_group: Posts on the wall of each group
+            comments_per_post: Mean number of top level comments of a post
+            replies_per_comment: Mean number of replies to a comment
+            depressive_share: Share of texts using dictionary words
+            seed: Seed of the generated data
+        """
+        self.dictionary = dictionary
+        self.posts_per_group = posts_per_group
+        self.comments_per_post = comments_per_post
+        self.replies_per_comment = replies_per_comment
+        self.depressive_share = depressive_share
+        self.seed = seed
+
+    def group_id(self, domain: str) -> int:
+        return zlib.crc32(domain.encode()) % 1_000_000 + 1
+
+    def _rng(self, *key: Any) -> random.Random:
+        return random.Random(f"{self.seed}:{':'.join(map(str, key))}")
+
+    def text(self, rng: random.Random) -> str:
+        """Generate a text of 8 to 60 words, some with VK markup."""
+        depressive = rng.random() < self.depressive_share
+        words = []
+        for _ in range(rng.randint(8, 60)):
+            if depressive and rng.random() < 0.3:
+                words.append(rng.choice(self.dictionary))
+            else:
+                words.append(rng.choice(COMMON_WORDS))
+        if rng.random() < 0.2:
+            words.insert(
+                0, rng.choice(DECORATIONS).format(id=rng.randint(1, 9999))
+            )
+        if rng.random() < 0.3:
+            words[0] = words[0].capitalize()
+        return " ".join(words) + rng.choice([".", "!", "...", ""])
+
+    def group(self, domain: str) -> Dict[str, Any]:
+        return {
+            "id": self.group_id(domain),
+            "name": domain.replace("_", " ").title(),
+            "screen_name": domain,
+            "is_closed": 0,
+            "type": "page",
+        }
+
+    def posts(self, domain: str) -> List[Dict[str, Any]]:
+        """Posts of a group, newest first like wall.get returns them."""
+        group_id = self.group_id(domain)
+        posts = []
+        for post_id in range(self.posts_per_group, 0, -1):
+            rng = self._rng(domain, post_id)
+            posts.append(
+                {
+                    "id": post_id,
+                    "owner_id": -group_id,
+                    "from_id": -group_id,
+                    "date": BASE_TIMESTAMP + post_id * 3600,
+                    "text": self.text(rng),
+                    "comments": {
+                        "count": int(
+                            rng.expovariate(1 / self.comments_per_post)
+                        )
+                        if self.comments_per_post
+                        else 0
+                    },
+                    "likes": {"count": rng.randint(0, 500)},
+                    "attachments": [],
+                }
+            )
+        return posts
+
+    def comments(self, owner_id: int, post_id: int, count: int) -> List[dict]:
+        """Top level comments of a post with their replies in threads."""
+        comments = []
+        for i in range(count):
+            rng = self._rng(owner_id, post_id, i)
+            comment_id = post_id * 1000 + i * 10
+            replies = [
+                {
+                    "id": comment_id + j + 1,
+                    "owner_id": owner_id,
+                    "post_id": post_id,
+                    "from_id": rng.randint(1, 10**8),
+                    "date": BASE_TIMESTAMP + post_id * 3600 + j,
+                    "text": self.text(rng),
+                }
+                for j in range(
+                    min(9, int(rng.expovariate(1 / self.replies_per_comment)))
+                    if self.replies_per_comment
+                    else 0
+                )
+            ]
+            comments.append(
+                {
+                    "id": comment_id,
+                    "owner_id": owner_id,
+                    "post_id": post_id,
+                    "from_id": rng.randint(1, 10**8),
+                    "date": BASE_TIMESTAMP + post_id * 3600,
+                    "text": self.text(rng),
+                    "thread": {"count": len(replies), "items": replies},
+                }
+            )
+        return comments
+
+    def write_corpus(self, domains: List[str], out_dir: Path) -> Dict[str, Any]:
+        """
+        Write collected files like the Collector saves them.
+
+        Returns:
+            Paths of groups, posts and comments files
+        """
+        files: Dict[str, List[str]] = {
+            "groups": [],
+            "posts": [],
+            "comments": [],
+        }
+        for subdir in ("groups", "posts", "comments"):
+            (out_dir / subdir).mkdir(parents=True, exist_ok=True)
+        for domain in domains:
+            path = out_dir / "groups" / f"{domain}_group.json"
+            _write_json(path, [self.group(domain)])
+            files["groups"].append(str(path))
+
+            posts = self.posts(domain)
+            path = out_dir / "posts" / f"{domain}_posts.json"
+            _write_json(path, posts)
+            files["posts"].append(str(path))
+
+            comments = {
+                f"{post['owner_id']}_{post['id']}": self.comments(
+                    post["owner_id"], post["id"], post["comments"]["count"]
+                )
+                for post in posts
+                if post["comments"]["count"]
+            }
+            path = out_dir / "comments" / f"{domain}_posts_comments.json"
+            _write_json(path, comments)
+            files["comments"].append(str(path))
+        return files
+
+
+def _write_json(path: Path, data: Any) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+class FakeResponse:
+    """Response of the fake client with the interface the Service uses."""
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self.data = data
+        self.ok = True
+        self.status_code = 200
+        self.text = ""
+
+    def json(self) -> Dict[str, Any]:
+        return self.data
+
+
+class FakeVKClient:
+    """
+    VK API client answering from synthetic data.
+
+    Replaces the HTTP client of the Service, so the real Collector, the
+    rate limiter and the file layout they produce are exercised.
+    """
+
+    def __init__(self, vk: SyntheticVK, latency: float = 0.0) -> None:
+        """
+        Args:
+            vk: Synthetic data to serve
+            latency: Seconds each request takes, simulating the network
+        """
+        self.vk = vk
+        self.latency = latency
+        self._posts: Dict[str, List[dict]] = {}
+
+    def make_request(
+        self, endpoint: str, params: Dict[str, Any]
+    ) -> FakeResponse:
+        if self.latency:
+            time.sleep(self.latency)
+        method = endpoint.rsplit("/", 1)[-1]
+        if method == "groups.getById":
+            group = self.vk.group(params["group_id"])
+            return FakeResponse({"response": {"groups": [group]}})
+        if method == "wall.get":
+            domain = params["domain"]
+            if domain not in self._posts:
+                self._posts[domain] = self.vk.posts(domain)
+            posts = self._posts[domain]
+            offset = params.get("offset", 0)
+            items = posts[offset : offset + params.get("count", 20)]
+            return FakeResponse(
+                {"response": {"count": len(posts), "items": items}}
+            )
+        if method == "wall.getComments":
+            return FakeResponse({"response": self._comments(params)})
+        raise ValueError(f"Unsupported VK API method: {method}")
+
+    def _comments(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        owner_id, post_id = params["owner_id"], params["post_id"]
+        posts = self._posts.get(self._domain(owner_id), [])
+        post = next((p for p in posts if p["id"] == post_id), None)
+        count = post["comments"]["count"] if post else 0
+        comments = self.vk.comments(owner_id, post_id, count)
+        offset = params.get("offset", 0)
+        if "comment_id" in params:
+            replies = next(
+                c["thread"]["items"]
+                for c in comments
+                if c["id"] == params["comment_id"]
+            )
+            items = replies[offset : offset + params.get("count", 20)]
+            return {
+                "count": len(replies),
+                "current_level_count": len(replies),
+                "items": items,
+            }
+        items = comments[offset : offset + params.get("count", 20)]
+        return {
+            "count": count,
+            "current_level_count": len(comments),
+            "items": items,
+        }
+
+    def _domain(self, owner_id: int) -> str:
+        for domain in self._posts:
+            if self.vk.group_id(domain) == -owner_id:
+                return domain
+        return ""
+
+
+def create_fake_collector(vk: SyntheticVK, latency: float = 0.0):
+    """
+    Create the real Collector backed by the fake VK API client.
+
+    Args:
+        vk: Synthetic data to serve
+        latency: Seconds each request takes
+
+    Returns:
+        Collector
+    """
+    from vk_data_collector import Collector
+
+    from src.crawler.rate_limiter.rate_limiter import (
+        RateLimitedService,
+        TokenBucket,
+    )
+
+    # Rate is high enough not to throttle unless latency is simulated
+    limiter = TokenBucket(10_000)
+    return Collector(RateLimitedService(FakeVKClient(vk, latency), limiter))
+
+
+def train_models(
+    vectorizer_dir: Path,
+    classifier_dir: Path,
+    vk: SyntheticVK,
+    bow_count_feature: str,
+    vector_size: int = 32,
+    samples: int = 2000,
+) -> None:
+    """
+    Train a small FastText vectorizer and SVC on synthetic texts.
+    Files are laid out like the downloaded models, so the model registry
+    loads them without downloading anything.
+
+    Args:
+        vectorizer_dir: Directory of the vectorizer model
+        classifier_dir: Directory of the classifier and its features
+        vk: Synthetic data generator
+        bow_count_feature: Name of the dictionary word count feature
+        vector_size: Dimension of word vectors
+        samples: Number of training texts
+    """
+    from gensim.models import FastText
+    from sklearn.svm import SVC
+
+    rng = random.Random(vk.seed)
+    texts = [vk.text(rng).lower().split() for _ in range(samples)]
+
+    vectorizer_dir.mkdir(parents=True, exist_ok=True)
+    model = FastText(
+        sentences=texts,
+        vector_size=vector_size,
+        min_count=1,
+        epochs=5,
+        # Few n-gram buckets keep the model at a few megabytes
+        bucket=20_000,
+        seed=vk.seed,
+        workers=1,
+    )
+    # Arrays are saved separately, so the vectorizer can be memory-mapped
+    model.wv.save(str(vectorizer_dir / "model.model"), sep_limit=0)
+
+    dictionary_index = {word: i for i, word in enumerate(vk.dictionary)}
+    selected = sorted(
+        {
+            dictionary_index[w]
+            for text in texts
+            for w in text
+            if w in dictionary_index
+        }
+    )[:20]
+    features = [f"bow_{i}" for i in selected] + [bow_count_feature]
+
+    # Labels follow the share of dictionary words, so the SVC learns
+    # a boundary with a realistic number of support vectors
+    embeddings = np.array(
+        [np.mean([model.wv[w] for w in text], axis=0) for text in texts]
+    )
+    counts = np.array(
+        [sum(w in dictionary_index for w in text) for text in texts],
+        dtype=float,
+    )
+    bow = np.array(
+        [
+            [text.count(vk.dictionary[i]) / max(count, 1) for i in selected]
+            for text, count in zip(texts, counts)
+        ]
+    )
+    scaled_counts = (counts - counts.min()) / max(np.ptp(counts), 1)
+    labels = (counts / np.array([len(t) for t in texts]) > 0.1).astype(int)
+    classifier = SVC().fit(
+        np.hstack((embeddings, bow, scaled_counts[:, None])), labels
+    )
+
+    classifier_dir.mkdir(parents=True, exist_ok=True)
+    with open(classifier_dir / "model.pkl", "wb") as f:
+        pickle.dump(classifier, f)
+    _write_json(classifier_dir / "selected_features.json", features)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--out", type=Path, default=Path("data/synthetic"))
+    parser.add_argument("--groups", type=int, default=5)
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--comments", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dictionary = load_dictionary(Path("resources/depression_dictionary.json"))
+    vk = SyntheticVK(dictionary, args.posts, args.comments, seed=args.seed)
+    domains = [f"synthetic_{i}" for i in range(args.groups)]
+    files = vk.write_corpus(domains, args.out)
+    print(json.dumps(files, indent=2))
+
+
+if __name__ == "__main__":
+    main()
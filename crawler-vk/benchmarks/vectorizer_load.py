@@ -0,0 +1,116 @@
+"""
+Compare vectorizer startup time and memory of heap and mmap loading.
+
+Starts several worker processes per mode, each loading the FastText
+vectorizer and resolving a sample of words, and keeps them alive together
+so that shared pages are visible. RssAnon is private heap memory, RssFile
+is file-backed memory (shared page cache for mmap) and Pss splits shared
+pages between the processes using them.
+
+Usage (from the crawler-vk directory):
+    uv run python -m benchmarks.vectorizer_load --workers 4
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+WORDS = ["грустный", "одиночество", "депрессия", "жизнь", "несуществующее"]
+
+
+def read_memory() -> dict[str, int]:
+    """Read memory counters of the current process in kilobytes."""
+    memory = {}
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                memory[key] = int(value.split()[0])
+    with open("/proc/self/smaps_rollup", "r") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key == "Pss":
+                memory[key] = int(value.split()[0])
+    return memory
+
+
+def run_child(mode: str) -> None:
+    """Load the vectorizer, report stats and wait for the parent."""
+    from src.config import settings
+    from src.crawler.model_loader.model_loader import ModelLoader
+
+    loader = ModelLoader(
+        vectorizer_model_path=settings.vectorizer_model_path,
+        classifier_model_path=settings.classifier_model_path,
+    )
+    start = time.perf_counter()
+    model = loader.load_vectorizer_model(
+        str(settings.vectorizer_model_path), mmap=mode == "mmap"
+    )
+    for word in WORDS:
+        model[word]
+    load_seconds = time.perf_counter() - start
+
+    print(json.dumps({"load_seconds": load_seconds}), flush=True)
+    # Measure memory once every worker of the mode has loaded the model
+    sys.stdin.readline()
+    print(json.dumps(read_memory()), flush=True)
+
+
+def run_mode(mode: str, workers: int) -> list[dict]:
+    """Start workers for a loading mode and collect their stats."""
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.vectorizer_load", "--child"]
+            + [mode],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(workers)
+    ]
+    pipes = []
+    for p in processes:
+        assert p.stdin is not None and p.stdout is not None
+        pipes.append((p.stdin, p.stdout))
+
+    results = [json.loads(stdout.readline()) for _, stdout in pipes]
+    for stdin, _ in pipes:
+        stdin.write("\n")
+        stdin.flush()
+    for p, (_, stdout), result in zip(processes, pipes, results):
+        result.update(json.loads(stdout.readline()))
+        p.wait()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--child", choices=["heap", "mmap"])
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    print(
+        f"{'mode':<6}{'worker':>8}{'load, s':>10}{'RSS, MB':>10}"
+        f"{'anon, MB':>10}{'file, MB':>10}{'PSS, MB':>10}"
+    )
+    for mode in ["heap", "mmap"]:
+        results = run_mode(mode, args.workers)
+        for i, r in enumerate(results):
+            print(
+                f"{mode:<6}{i:>8}{r['load_seconds']:>10.2f}"
+                f"{r['VmRSS'] / 1024:>10.0f}{r['RssAnon'] / 1024:>10.0f}"
+                f"{r['RssFile'] / 1024:>10.0f}{r['Pss'] / 1024:>10.0f}"
+            )
+        total_pss = sum(r["Pss"] for r in results) / 1024
+        print(f"{mode:<6}{'total':>8}{'':>50}{total_pss:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,86 @@
 import logging
 from datetime import datetime
-from typing import List
+from typing import List, Literal
 
-from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
 from pydantic import BaseModel, Field, field_validator
-from vk_data_collector import create_collector
 
 from src.config import settings
+from src.crawler.checkpoint.checkpoint import RunManifest
 from src.crawler.crawler import Crawler
+from src.crawler.job_queue.job_queue import JobWorker, PostgresJobScheduler
+from src.crawler.metrics.metrics import CONTENT_TYPE, REGISTRY
+from src.crawler.profiling.profiling import (
+    PROFILE_FILES,
+    RUN_ID_PATTERN,
+    ProfileInfo,
+    get_profile_file,
+    list_profiles,
+)
+from src.crawler.rate_limiter.rate_limiter import create_collector
+from src.crawler.rescoring.rescoring import RescoreInfo, Rescorer
+from src.crawler.scheduler.scheduler import JobInfo, JobScheduler
+from src.crawler.status_manager.status_manager import CrawlerStatusManager
+from src.crawler.status_stream.status_stream import StatusBroadcaster
 
 app = FastAPI()
 log = logging.getLogger(__name__)
 
 # Initialize services
-collector = create_collector(settings.service_token)
+collector = create_collector(
+    settings.service_token, settings.vk_requests_per_second
+)
 crawler = Crawler(collector)
+# Pushes status changes of jobs to the status streams
+broadcaster = StatusBroadcaster()
+# Jobs of the postgres backend may run on other nodes, their streams read
+# the status reported with the worker heartbeats
+status_poll_interval = (
+    settings.job_heartbeat_interval
+    if settings.job_backend == "postgres"
+    else None
+)
+
+
+def create_scheduler() -> JobScheduler | PostgresJobScheduler:
+    """Create the job queue of the configured backend."""
+    if settings.job_backend == "memory":
+        # Runs requested through the API are queued and share the crawler
+        return JobScheduler(
+            crawler,
+            settings.max_concurrent_jobs,
+            settings.data_dir,
+            settings.max_groups_per_job,
+            broadcaster,
+        )
+
+    # Jobs are shared with the workers of other nodes through the database
+    worker = None
+    if settings.job_worker_enabled:
+        worker = JobWorker(
+            crawler,
+            settings.data_dir,
+            settings.max_concurrent_jobs,
+            settings.job_lease_seconds,
+            settings.job_heartbeat_interval,
+            settings.job_poll_interval,
+            settings.job_max_attempts,
+        )
+        worker.start()
+    return PostgresJobScheduler(
+        crawler.db_pool, settings.max_groups_per_job, worker
+    )
+
+
+scheduler = create_scheduler()
+# Re-scores stored publications with a new classifier in the background
+rescorer = Rescorer(crawler, settings.rescore_batch_size)
 
 
 class CollectDataRequest(BaseModel):
@@ -23,6 +88,10 @@ class CollectDataRequest(BaseModel):
         ..., min_items=1, description="List of group names to collect data from"
     )
     target_date: str = Field(..., description="Date in YYYY-MM-DD format")
+    profile: bool = Field(
+        False,
+        description="Profile the runs and save profiles under logs_dir",
+    )
 
     @field_validator("target_date")
     @classmethod
@@ -34,6 +103,36 @@ class CollectDataRequest(BaseModel):
             raise ValueError("Date must be in YYYY-MM-DD format")
 
 
+class RescoreRequest(BaseModel):
+    group_ids: List[int] = Field(
+        [], description="VK group IDs to re-score, all groups if empty"
+    )
+    run_ids: List[int] = Field(
+        [],
+        description=(
+            "Crawler runs whose groups are re-scored, predictions of other "
+            "runs are left as they are"
+        ),
+    )
+    source: Literal["features", "texts"] = Field(
+        "features",
+        description=(
+            "Read stored features, or stored texts for publications "
+            "processed before features were stored. Texts of crawls older "
+            "than the retention of the columnar store are not re-scored"
+        ),
+    )
+    apply: bool = Field(
+        False,
+        description="Replace predictions of the runs with the new ones",
+    )
+    reload_classifier: bool = Field(
+        True,
+        description="Use the classifier in its files instead of the "
+        "resident one, which running jobs keep using",
+    )
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, e: Exception):
     log.exception("Unhandled error")
@@ -44,50 +143,218 @@ async def global_exception_handler(request: Request, e: Exception):
 
 
 @app.get("/status")
-async def get_status():
-    """Get current crawler status."""
+def get_status():
+    """
+    Get status of the current job.
+    Reports the earliest running job or, if none is running, the most
+    recently started one.
+    """
     try:
-        status = crawler.status_manager.get_status()
-        return status
+        job = scheduler.get_current_job()
+        if job is None:
+            return CrawlerStatusManager().get_status()
+        return job["status"]
     except Exception as e:
         log.exception("Error getting status", exc_info=e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def stream_job_status(job_id: str) -> StreamingResponse:
+    """Create a server-sent events response streaming status of a job."""
+    events = broadcaster.stream(
+        job_id,
+        lambda: scheduler.get(job_id),
+        status_poll_interval,
+    )
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Proxies must pass events on as they come
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/status/stream")
+def stream_status():
+    """
+    Stream status of the current job as server-sent events.
+    Sends a snapshot of the status, then only the changed fields, and ends
+    when the job is no longer active.
+    """
+    job = scheduler.get_current_job()
+    if job is None:
+        raise HTTPException(status_code=404, detail="No jobs")
+    return stream_job_status(job["id"])
+
+
+@app.get("/jobs/{job_id}/stream")
+def stream_job(job_id: str):
+    """Stream status of a job as server-sent events."""
+    if scheduler.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return stream_job_status(job_id)
+
+
 @app.post("/stop")
 def stop_crawler():
-    """Request the crawler to stop its current work."""
-    crawler.status_manager.set_stop_flag()
+    """Request all queued and running jobs to stop."""
+    scheduler.cancel_all()
     log.info("Crawler stop requested")
     return {"status": "stop_requested"}
 
 
 @app.post("/collect")
-def collect_data(
-    request: CollectDataRequest, background_tasks: BackgroundTasks
-):
+def collect_data(request: CollectDataRequest):
     """
-    Start data collection for specified groups up to target date.
+    Queue data collection for specified groups up to target date.
+    Large group lists may be split into several jobs.
     """
-    # Check if crawler is already working
-    current_status = crawler.status_manager.get_status()
-    if current_status["state"] != "idle":
-        return {
-            "error": f"Crawler is already working: {current_status['state']}",
-            "current_status": current_status,
-        }
-
-    background_tasks.add_task(
-        crawler.run_pipeline,
-        request.groups,
-        request.target_date,
+    job_ids = scheduler.submit(
+        request.groups, request.target_date, request.profile
     )
+    return {"status": "ok", "job_id": job_ids[0], "job_ids": job_ids}
+
+
+@app.post("/resume/{run_id}")
+def resume_run(run_id: str, profile: bool = False):
+    """
+    Queue a job continuing a failed or cancelled run from the first
+    incomplete stage of each group. The run ID is the ID of its first job.
+    """
+    manifest = None
+    if RUN_ID_PATTERN.match(run_id):
+        manifest = RunManifest.load(settings.data_dir / "runs" / run_id)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if manifest.saved:
+        raise HTTPException(status_code=409, detail="Run already completed")
+    if any(
+        job["run_id"] == run_id and job["state"] in ("queued", "running")
+        for job in scheduler.list_jobs()
+    ):
+        raise HTTPException(status_code=409, detail="Run is already active")
+    job_id = scheduler.resume(
+        run_id, manifest.groups, manifest.target_date, profile
+    )
+    return {"status": "ok", "job_id": job_id}
 
-    return {"status": "ok"}
+
+@app.get("/jobs")
+def list_jobs() -> List[JobInfo]:
+    """Get queued, running and recently finished jobs."""
+    return scheduler.list_jobs()
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str) -> JobInfo:
+    """Get state and pipeline status of a job."""
+    job = scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """Cancel a queued job or request a running job to stop."""
+    if not scheduler.cancel(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"status": "cancel_requested"}
+
+
+@app.post("/rescore")
+def rescore(request: RescoreRequest):
+    """
+    Queue re-scoring of stored publications with the classifier, e.g. after
+    its files were replaced with a retrained one. Predictions are saved to
+    model_predictions under the version of the models.
+    """
+    try:
+        rescore_id = rescorer.submit(
+            request.group_ids,
+            request.run_ids,
+            request.source,
+            request.apply,
+            request.reload_classifier,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "ok", "rescore_id": rescore_id}
+
+
+@app.get("/rescore")
+def list_rescores() -> List[RescoreInfo]:
+    """Get queued, running and recently finished re-scorings."""
+    return rescorer.list_rescores()
+
+
+@app.get("/rescore/{rescore_id}")
+def get_rescore(rescore_id: str) -> RescoreInfo:
+    """Get state and progress of a re-scoring."""
+    info = rescorer.get(rescore_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Re-scoring not found")
+    return info
+
+
+@app.get("/profiles")
+def get_profiles() -> List[ProfileInfo]:
+    """List saved profiles of runs, most recent first."""
+    return list_profiles(settings.profiles_dir)
+
+
+@app.get("/profiles/{run_id}/{name}")
+def download_profile(run_id: str, name: str):
+    """
+    Download a file of a run profile: profile.prof with cProfile stats,
+    profile.txt with the slowest functions or allocations.txt with the
+    allocation sites at the peak of traced memory.
+    """
+    path = get_profile_file(settings.profiles_dir, run_id, name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(
+        path, media_type=PROFILE_FILES[name], filename=f"{run_id}-{name}"
+    )
+
+
+@app.get("/models")
+def get_models():
+    """Get load time and resident size of loaded models."""
+    return crawler.models.get_stats()
+
+
+@app.post("/models/reload")
+def reload_models():
+    """Reload all models, e.g. after model files were replaced."""
+    stats = crawler.models.reload()
+    log.info("Models reloaded")
+    return {"status": "ok", "models": stats}
+
+
+@app.get("/db/pool")
+async def get_db_pool_stats():
+    """Get database connection pool usage and checkout wait time."""
+    return crawler.db_pool.get_stats()
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Get pipeline, VK API, database and process metrics for Prometheus."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
 
 
 @app.post("/reset")
-async def reset_status():
-    """Reset crawler status."""
-    crawler.status_manager.reset()
+def reset_status():
+    """Reset status of the current job if it has finished."""
+    job = scheduler.get_current_job()
+    if job is not None:
+        scheduler.reset_status(job["id"])
     return {"status": "ok"}
+
+
+@app.on_event("shutdown")
+def shutdown_scheduler():
+    """Stop running jobs before the process exits."""
+    scheduler.shutdown()
+    rescorer.shutdown()
@@ -1,5 +1,6 @@
 import logging
 from pathlib import Path
+from typing import Literal
 
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -24,18 +25,114 @@ class Settings(BaseSettings):
         "https://drive.google.com/uc?id=1FgczRLX0H22maPxkIUa6hhvWC07LDnWD"
     )
 
+    # Jobs running at once, further jobs wait in the queue
+    max_concurrent_jobs: int = 2
+    # Larger group lists are split into several jobs, 0 never splits
+    max_groups_per_job: int = 0
+    # Job queue, "memory" runs jobs in the API process, "postgres" queues
+    # them in the database for the workers of all crawler nodes
+    job_backend: Literal["memory", "postgres"] = "memory"
+    # Run a job worker in the API process with the postgres backend
+    job_worker_enabled: bool = True
+    # Seconds a job stays leased to a worker without a heartbeat
+    job_lease_seconds: float = 60.0
+    job_heartbeat_interval: float = 5.0
+    # Seconds between checks of the queue for new jobs
+    job_poll_interval: float = 2.0
+    # Runs of a job before it's failed when its workers die
+    job_max_attempts: int = 3
+    # Port of the metrics endpoint of standalone workers, 0 disables it
+    worker_metrics_port: int = 0
+
+    # Profiles of runs requested with profiling, one directory per run
+    profiles_dir: Path = logs_dir / "profiles"
+    # Allocation sites listed in the profile of a run
+    profile_top_allocations: int = 25
+    # Seconds between checks for a new peak of traced memory
+    profile_snapshot_interval: float = 1.0
+
+    # VK API requests per second shared by all collection threads
+    vk_requests_per_second: float = 4.0
+    # Groups collected in parallel, 1 collects them one by one
+    collection_workers: int = 4
+
+    # Collect comments only for new posts and posts whose comment count
+    # changed since the previous runs
+    incremental_crawl: bool = True
+    # Days before the newest post seen in a group that are listed again
+    # with incremental crawling, so new comments of recent posts are
+    # collected. Older posts are not listed.
+    incremental_recheck_days: int = 7
+
     # Skip texts less than min_text_length
     min_text_length: int = 50
 
+    # Publications processed at once, 0 processes each collected group in one
+    # batch. Bounds peak memory of preprocessing and inference. The word
+    # count is min-max scaled over each batch, whether or not collection
+    # overlaps with processing.
+    pipeline_chunk_size: int = 0
+    # Preprocess and save collected groups while the next groups download
+    pipeline_overlap: bool = True
+    # Save the output of each stage in the data directory of a run, so that
+    # a failed run resumes from its first incomplete stage
+    checkpoints_enabled: bool = True
+
+    # Database connection pool
+    db_pool_min_size: int = 1
+    db_pool_max_size: int = 5
+    # Seconds to wait for a free connection before failing
+    db_pool_timeout: float = 30.0
+    # Connections idle for longer are checked before being handed out
+    db_pool_health_check_interval: float = 30.0
+
     # Model paths
     vectorizer_model_path: Path = models_dir / "vectorizer"
     classifier_model_path: Path = models_dir / "classifier"
 
+    # Memory-map vectorizer arrays so that worker processes share
+    # one page-cached copy instead of each holding its own
+    vectorizer_mmap: bool = True
+
+    # Tokenization worker processes, 0 or 1 tokenizes in the crawler process
+    tokenization_workers: int = 0
+    # Characters of text sent to a tokenization worker at once
+    tokenization_chunk_chars: int = 200_000
+
+    # Persistent cache of tokenized texts
+    token_cache_enabled: bool = True
+    token_cache_path: Path = data_dir / "token_cache.sqlite3"
+    token_cache_max_entries: int = 1_000_000
+
+    # Cache of predictions by text and version of models in the database,
+    # unused if the classifier uses the word count scaled over the batch
+    prediction_cache_enabled: bool = True
+
+    # Publications longer than min_text_length are written to a columnar
+    # store as they are parsed, re-scoring from texts reads it instead of
+    # the collected JSON files
+    columnar_store_enabled: bool = True
+    columnar_store_dir: Path = data_dir / "store"
+    # Days partitions of the store are kept, 0 keeps them forever. Texts of
+    # older crawls are deleted and can't be re-scored from texts.
+    columnar_store_retention_days: int = 30
+
+    # Embeddings and dictionary features of texts are stored by version of
+    # the vectorizer, the dictionary and the text processing
+    feature_store_enabled: bool = True
+    feature_store_dir: Path = data_dir / "features"
+    # Days shards of the store are kept, 0 keeps them forever. Features of
+    # other versions are always deleted.
+    feature_store_retention_days: int = 30
+
+    # Publications predicted and saved at once when re-scoring stored
+    # publications with a new classifier
+    rescore_batch_size: int = 50_000
+
     # Features
     depression_dictionary_path: Path = (
         resources_dir / "depression_dictionary.json"
     )
-    bow_vector_feature: str = "depression_bow_vector"
     bow_count_feature: str = "depression_words_count"
 
     model_config = SettingsConfigDict()
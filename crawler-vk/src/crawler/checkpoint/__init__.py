@@ -0,0 +1,3 @@
+from .checkpoint import GroupCheckpoint, GroupState, RunManifest
+
+__all__ = ["GroupCheckpoint", "GroupState", "RunManifest"]
@@ -0,0 +1,287 @@
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Tuple, TypedDict
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+GroupState = Literal[
+    "pending",  # not collected yet
+    "collected",  # posts and comments files are collected
+    "preprocessed",  # features of all chunks are saved
+    "predicted",  # predictions of all chunks are saved
+]
+GROUP_STATES: List[GroupState] = [
+    "pending",
+    "collected",
+    "preprocessed",
+    "predicted",
+]
+
+
+class GroupCheckpoint(TypedDict):
+    state: GroupState
+    posts_files: List[str]  # posts to process, selected by incremental crawl
+    comments_files: List[str]
+    collected_posts_files: List[str]  # all collected posts
+    chunks: int  # chunks of publications, known once preprocessed
+
+
+class RunManifest:
+    """
+    Progress of a pipeline run saved in its data directory.
+
+    Records the output of each stage: collected groups information, files
+    collected for every group and the number of chunks whose features and
+    predictions are saved next to the manifest. A run started again in the
+    same directory continues from the first incomplete stage of each group,
+    so a failed group does not invalidate the groups completed before it.
+    """
+
+    def __init__(self, run_dir: Path, data: Dict[str, Any]) -> None:
+        self.run_dir = Path(run_dir)
+        self._data = data
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, run_dir: Path) -> "RunManifest | None":
+        """
+        Load the manifest of a run.
+
+        Args:
+            run_dir: Data directory of the run
+
+        Returns:
+            Manifest, None if the directory has no readable manifest
+        """
+        try:
+            with open(
+                Path(run_dir) / MANIFEST_FILE, "r", encoding="utf-8"
+            ) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        return cls(run_dir, data)
+
+    @classmethod
+    def open(
+        cls, run_dir: Path, groups: List[str], target_date: str
+    ) -> "RunManifest":
+        """
+        Continue a run from its manifest or start a new one.
+        Files of a run for other groups or another date are removed.
+
+        Args:
+            run_dir: Data directory of the run
+            groups: VK group names of the run
+            target_date: Target date in YYYY-MM-DD format
+
+        Returns:
+            Manifest of the run
+        """
+        groups = list(dict.fromkeys(groups))
+        manifest = cls.load(run_dir)
+        if manifest is not None:
+            if (
+                manifest.groups == groups
+                and manifest.target_date == target_date
+            ):
+                log.info(f"Resuming run from {run_dir}")
+                return manifest
+            log.warning(f"Manifest in {run_dir} is for another run, ignoring")
+        shutil.rmtree(run_dir, ignore_errors=True)
+        Path(run_dir).mkdir(parents=True, exist_ok=True)
+        manifest = cls(
+            run_dir,
+            {
+                "version": MANIFEST_VERSION,
+                "groups": groups,
+                "target_date": target_date,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "groups_files": None,
+                "group_checkpoints": {
+                    group: {
+                        "state": "pending",
+                        "posts_files": [],
+                        "comments_files": [],
+                        "collected_posts_files": [],
+                        "chunks": 0,
+                    }
+                    for group in groups
+                },
+                "saved": False,
+            },
+        )
+        manifest._write()
+        return manifest
+
+    @property
+    def groups(self) -> List[str]:
+        return self._data["groups"]
+
+    @property
+    def target_date(self) -> str:
+        return self._data["target_date"]
+
+    @property
+    def groups_files(self) -> List[str] | None:
+        """Collected groups information, None if not collected yet."""
+        return self._data["groups_files"]
+
+    @property
+    def saved(self) -> bool:
+        """Whether results of the run are saved to the database."""
+        return self._data["saved"]
+
+    def get_group(self, group: str) -> GroupCheckpoint:
+        with self._lock:
+            return self._data["group_checkpoints"][group].copy()
+
+    def get_groups(self, state: GroupState) -> List[str]:
+        """Get groups that reached a state, in the order of the run."""
+        minimum = GROUP_STATES.index(state)
+        with self._lock:
+            checkpoints = self._data["group_checkpoints"]
+            return [
+                group
+                for group in self.groups
+                if GROUP_STATES.index(checkpoints[group]["state"]) >= minimum
+            ]
+
+    def get_progress(self) -> Dict[GroupState, int]:
+        """Count groups in each state."""
+        with self._lock:
+            checkpoints = self._data["group_checkpoints"].values()
+            return {
+                state: sum(c["state"] == state for c in checkpoints)
+                for state in GROUP_STATES
+            }
+
+    def set_groups_files(self, groups_files: List[str]) -> None:
+        with self._lock:
+            self._data["groups_files"] = [str(path) for path in groups_files]
+            self._write()
+
+    def set_collected(
+        self,
+        group: str,
+        posts_files: List[str],
+        comments_files: List[str],
+        collected_posts_files: List[str],
+    ) -> None:
+        with self._lock:
+            self._data["group_checkpoints"][group].update(
+                state="collected",
+                posts_files=[str(path) for path in posts_files],
+                comments_files=[str(path) for path in comments_files],
+                collected_posts_files=[
+                    str(path) for path in collected_posts_files
+                ],
+            )
+            self._write()
+
+    def set_group_state(
+        self, group: str, state: GroupState, chunks: int | None = None
+    ) -> None:
+        with self._lock:
+            checkpoint = self._data["group_checkpoints"][group]
+            checkpoint["state"] = state
+            if chunks is not None:
+                checkpoint["chunks"] = chunks
+            self._write()
+
+    def set_saved(self) -> None:
+        with self._lock:
+            self._data["saved"] = True
+            self._write()
+
+    def _write(self) -> None:
+        self._data["updated_at"] = datetime.now(timezone.utc).isoformat()
+        path = self.run_dir / MANIFEST_FILE
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=2)
+        # The manifest is replaced at once, a crash keeps the previous one
+        os.replace(tmp_path, path)
+
+    # Chunk checkpoints
+
+    def _chunk_path(self, group: str, kind: str, chunk: int) -> Path:
+        return self.run_dir / "checkpoints" / group / f"{kind}-{chunk}.pkl"
+
+    def clear_chunks(self, group: str) -> None:
+        """Remove chunks left by an incomplete preprocessing of a group."""
+        shutil.rmtree(self.run_dir / "checkpoints" / group, ignore_errors=True)
+
+    def save_features(
+        self,
+        group: str,
+        chunk: int,
+        publications: pd.DataFrame,
+        data: pd.DataFrame,
+        embeddings: np.ndarray,
+    ) -> None:
+        """Save a preprocessed chunk of a group."""
+        self._dump(
+            self._chunk_path(group, "features", chunk),
+            (publications, data, embeddings),
+        )
+
+    def load_features(
+        self, group: str, chunk: int
+    ) -> Tuple[pd.DataFrame, pd.DataFrame, np.ndarray]:
+        return self._load(self._chunk_path(group, "features", chunk))
+
+    def save_predictions(
+        self,
+        group: str,
+        chunk: int,
+        publications: pd.DataFrame,
+        predictions: pd.DataFrame,
+    ) -> None:
+        """
+        Save predictions of a chunk and drop its features.
+
+        Args:
+            group: VK group name
+            chunk: Number of the chunk
+            publications: Publications of the chunk with predictions
+            predictions: Predicted distinct texts with text_hash and
+                depression_prediction columns
+        """
+        self._dump(
+            self._chunk_path(group, "predictions", chunk),
+            (publications, predictions),
+        )
+        self._chunk_path(group, "features", chunk).unlink(missing_ok=True)
+
+    def load_predictions(
+        self, group: str, chunk: int
+    ) -> Tuple[pd.DataFrame, pd.DataFrame] | None:
+        """Load predictions of a chunk, None if it is not predicted yet."""
+        path = self._chunk_path(group, "predictions", chunk)
+        return self._load(path) if path.exists() else None
+
+    def _dump(self, path: Path, value: Any) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def _load(self, path: Path) -> Any:
+        with open(path, "rb") as f:
+            return pickle.load(f)
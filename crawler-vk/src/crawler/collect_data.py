@@ -1,20 +1,31 @@
 import logging
 import os
-from typing import List, Tuple
+from pathlib import Path
+from typing import Callable, List, Tuple
 
 from vk_data_collector import Collector
 
+from src.config import settings
+from src.crawler.exceptions.crawler_exceptions import CrawlerStopRequested
+from src.crawler.group_executor.group_executor import run_for_groups
+from src.crawler.incremental.incremental import IncrementalCrawl
 from src.crawler.status_manager.status_manager import CrawlerStatusManager
 
 log = logging.getLogger(__name__)
 
+# Called with the name, posts and comments files and all collected posts
+# files of a group
+CollectedCallback = Callable[[str, List[str], List[str], List[str]], None]
+
 
 def collect_data(
     group_names: List[str],
     target_date: str,
-    base_dir: str,
+    base_dir: str | Path,
     collector: Collector,
     status_manager: CrawlerStatusManager,
+    on_collected: CollectedCallback | None = None,
+    incremental: IncrementalCrawl | None = None,
 ) -> Tuple[List[str], List[str]]:
     """
     Collect posts and comments from specified VK groups up to target date.
@@ -25,45 +36,73 @@ def collect_data(
         base_dir: Base directory for storing collected data
         collector: VK data collector instance
         status_manager: Status manager for tracking progress and state
+        on_collected: Called with the name, posts and comments files and
+            all collected posts files of each group as soon as the group is
+            collected, possibly from a worker thread
+        incremental: State of incremental crawling, None to list posts
+            back to target_date, collect comments of all posts and return
+            all posts
     """
     try:
         # Create subdirectories
         posts_dir = os.path.join(base_dir, "posts")
         comments_dir = os.path.join(base_dir, "comments")
+        changed_dir = os.path.join(posts_dir, "changed")
         # Ensure directories exist
         os.makedirs(posts_dir, exist_ok=True)
         os.makedirs(comments_dir, exist_ok=True)
 
-        # Reset stop flag at the start
-        status_manager.reset_stop_flag()
-
-        posts_files = []
-        comments_files = []
-
-        total_groups = len(group_names)
-        for i, group in enumerate(group_names):
-            # Set current group and check if we should stop
-            status_manager.set_current_group(group)
-            status_manager.set_progress(int(i * 100 / total_groups))
-
+        def collect_group(group: str) -> Tuple[List[str], List[str]]:
             # Collect posts
             log.info(f"Collecting posts for group: {group}")
-            saved_files = collector.collect_posts_to_date(
-                [group], target_date, posts_dir
+            date_to = target_date
+            if incremental is not None:
+                date_to = incremental.get_date_to(group, target_date)
+            collected_posts = collector.collect_posts_to_date(
+                [group], date_to, posts_dir
             )
-            log.info(f"Collected posts saved to: {saved_files}")
-            posts_files.extend(saved_files)
+            log.info(f"Collected posts saved to: {collected_posts}")
+            posts = collected_posts
+
+            # Keep only new posts and posts with new comments
+            if incremental is not None:
+                posts = [
+                    selected
+                    for path in collected_posts
+                    if (selected := incremental.select_posts(path, changed_dir))
+                    is not None
+                ]
 
-            # Set current group and check if we should stop
-            status_manager.set_current_group(group)
+            # Check if we should stop
+            if status_manager.should_stop():
+                raise CrawlerStopRequested()
 
             # Collect comments
             log.info(f"Collecting comments for group: {group}")
-            saved_files = collector.collect_comments_for_posts(
-                saved_files, comments_dir
-            )
-            log.info(f"Collected comments saved to: {saved_files}")
-            comments_files.extend(saved_files)
+            comments = collector.collect_comments_for_posts(posts, comments_dir)
+            log.info(f"Collected comments saved to: {comments}")
+            status_manager.advance_stage("collecting_data")
+            if on_collected is not None:
+                on_collected(group, posts, comments, collected_posts)
+            return posts, comments
+
+        # Groups are collected in parallel under the shared rate limit,
+        # duplicates are dropped as they would write to the same files
+        groups = list(dict.fromkeys(group_names))
+        status_manager.start_stage("collecting_data", total=len(groups))
+        results = run_for_groups(
+            groups,
+            collect_group,
+            status_manager,
+            settings.collection_workers,
+        )
+
+        posts_files = []
+        comments_files = []
+        for posts, comments in results:
+            posts_files.extend(posts)
+            comments_files.extend(comments)
+        status_manager.finish_stage("collecting_data")
 
         return posts_files, comments_files
     except Exception as e:
@@ -1,9 +1,12 @@
 import logging
 import os
+from pathlib import Path
 from typing import List
 
 from vk_data_collector import Collector
 
+from src.config import settings
+from src.crawler.group_executor.group_executor import run_for_groups
 from src.crawler.status_manager.status_manager import CrawlerStatusManager
 
 log = logging.getLogger(__name__)
@@ -12,7 +15,7 @@ log = logging.getLogger(__name__)
 def collect_groups(
     groups: List[str],
     target_date: str,
-    base_dir: str,
+    base_dir: str | Path,
     collector: Collector,
     status_manager: CrawlerStatusManager,
 ) -> List[str]:
@@ -32,22 +35,24 @@ def collect_groups(
         # Ensure directories exist
         os.makedirs(group_dir, exist_ok=True)
 
-        # Reset stop flag at the start
-        status_manager.reset_stop_flag()
-
-        groups_files = []
-
-        total_groups = len(groups)
-        for i, group in enumerate(groups):
-            # Set current group and check if we should stop
-            status_manager.set_current_group(group)
-            status_manager.set_progress(int(i * 100 / total_groups))
-
+        def collect_group(group: str) -> List[str]:
             # Collect groups information
             log.info(f"Collecting group information: {group}")
             saved_files = collector.collect_groups([group], group_dir)
             log.info(f"Collected group information saved to: {saved_files}")
-            groups_files.extend(saved_files)
+            status_manager.advance_stage("collecting_groups")
+            return saved_files
+
+        groups = list(dict.fromkeys(groups))
+        status_manager.start_stage("collecting_groups", total=len(groups))
+        results = run_for_groups(
+            groups,
+            collect_group,
+            status_manager,
+            settings.collection_workers,
+        )
+        groups_files = [file for files in results for file in files]
+        status_manager.finish_stage("collecting_groups")
 
         return groups_files
     except Exception as e:
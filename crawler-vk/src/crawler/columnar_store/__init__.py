@@ -0,0 +1,3 @@
+from .columnar_store import COLUMNS, ColumnarStore, Filter
+
+__all__ = ["COLUMNS", "ColumnarStore", "Filter"]
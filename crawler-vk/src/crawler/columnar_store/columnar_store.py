@@ -0,0 +1,343 @@
+import json
+import logging
+import mmap
+import os
+import shutil
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+# Integer columns stored as .npy arrays, text_length allows filtering by
+# length without decoding texts
+INT_COLUMNS = ["owner_id", "post_id", "id", "text_length"]
+COLUMNS = INT_COLUMNS + ["text"]
+META_FILE = "_meta.json"
+STORE_VERSION = 1
+
+Filter = Tuple[str, str, Any]  # column, operator and value
+
+OPERATORS = {
+    "==": lambda column, value: column == value,
+    "!=": lambda column, value: column != value,
+    "<": lambda column, value: column < value,
+    "<=": lambda column, value: column <= value,
+    ">": lambda column, value: column > value,
+    ">=": lambda column, value: column >= value,
+    "in": lambda column, value: np.isin(column, list(value)),
+}
+
+
+def _may_match(stats: Dict[str, List[int]], filters: Sequence[Filter]) -> bool:
+    """Check min and max of a part against filters, False skips the part."""
+    for column, operator, value in filters:
+        low, high = stats[column]
+        if operator == "==" and not low <= value <= high:
+            return False
+        if operator == "<" and not low < value:
+            return False
+        if operator == "<=" and not low <= value:
+            return False
+        if operator == ">" and not high > value:
+            return False
+        if operator == ">=" and not high >= value:
+            return False
+        if operator == "in" and not any(low <= v <= high for v in value):
+            return False
+    return True
+
+
+class ColumnarStore:
+    """
+    Collected publications in a partitioned columnar layout.
+
+    Parts are written to group_id=<id>/crawl_date=<YYYY-MM-DD>/part-<id>
+    directories holding a .npy array per integer column, UTF-8 texts in
+    one file with their offsets and a _meta.json with row count and min
+    and max of the integer columns. Readers load only the requested
+    columns, skip partitions and parts that can't match the filters and
+    decode texts of matching rows only.
+    """
+
+    def __init__(self, root: Path) -> None:
+        """
+        Args:
+            root: Directory of the store
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def write_through(
+        self, frames: Iterable[pd.DataFrame], crawl_date: date | None = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Store publications as they are parsed, one part per group and frame.
+
+        Args:
+            frames: DataFrames with owner_id, post_id, id and text columns
+            crawl_date: Partition date, today in UTC by default
+
+        Yields:
+            The frames, each once it is stored
+        """
+        crawl_date = crawl_date or datetime.now(timezone.utc).date()
+        parts = 0
+        for frame in frames:
+            # Walls of groups have negative owner IDs
+            for owner_id, rows in frame.groupby("owner_id", sort=False):
+                self.write(-int(owner_id), crawl_date, rows)
+                parts += 1
+            yield frame
+        log.info(f"Stored collected publications in {parts} parts")
+
+    def write(
+        self, group_id: int, crawl_date: date, publications: pd.DataFrame
+    ) -> Path:
+        """
+        Write publications as a new part of a partition.
+
+        Args:
+            group_id: VK group ID of the partition
+            crawl_date: Date of the partition
+            publications: DataFrame with owner_id, post_id, id and text
+                columns
+
+        Returns:
+            Path of the part
+        """
+        partition = (
+            self.root / f"group_id={group_id}" / f"crawl_date={crawl_date}"
+        )
+        partition.mkdir(parents=True, exist_ok=True)
+        name = f"part-{uuid.uuid4().hex}"
+        # Readers never see a part before all of its files are written
+        tmp_dir = partition / f".{name}"
+        tmp_dir.mkdir()
+
+        encoded = [text.encode("utf-8") for text in publications["text"]]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in encoded], out=offsets[1:])
+        columns = {
+            "owner_id": publications["owner_id"].to_numpy(np.int64),
+            "post_id": publications["post_id"].to_numpy(np.int64),
+            "id": publications["id"].to_numpy(np.int64),
+            "text_length": publications["text"].str.len().to_numpy(np.int64),
+        }
+        for column, values in columns.items():
+            np.save(tmp_dir / f"{column}.npy", values)
+        np.save(tmp_dir / "text_offsets.npy", offsets)
+        with open(tmp_dir / "text.bin", "wb") as f:
+            f.writelines(encoded)
+
+        meta = {
+            "version": STORE_VERSION,
+            "rows": len(publications),
+            "group_id": group_id,
+            "crawl_date": crawl_date.isoformat(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "stats": {
+                column: (
+                    [int(values.min()), int(values.max())]
+                    if len(values)
+                    else [0, -1]
+                )
+                for column, values in columns.items()
+            },
+        }
+        with open(tmp_dir / META_FILE, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.rename(tmp_dir, partition / name)
+        return partition / name
+
+    def list_parts(
+        self,
+        group_ids: Sequence[int] | None = None,
+        start_date: date | None = None,
+        end_date: date | None = None,
+    ) -> List[Path]:
+        """
+        Find parts of partitions matching groups and a date range.
+
+        Args:
+            group_ids: VK group IDs, None for all groups
+            start_date: First crawl date, None for no lower bound
+            end_date: Last crawl date, None for no upper bound
+
+        Returns:
+            Paths of the parts ordered by group, date and write time
+        """
+        if group_ids is not None:
+            group_dirs = [self.root / f"group_id={g}" for g in group_ids]
+        else:
+            group_dirs = sorted(self.root.glob("group_id=*"))
+        parts = []
+        for group_dir in group_dirs:
+            for partition in sorted(group_dir.glob("crawl_date=*")):
+                crawl_date = date.fromisoformat(partition.name.split("=")[1])
+                if start_date is not None and crawl_date < start_date:
+                    continue
+                if end_date is not None and crawl_date > end_date:
+                    continue
+                parts.extend(
+                    sorted(
+                        partition.glob("part-*"),
+                        key=lambda part: part.stat().st_mtime,
+                    )
+                )
+        return parts
+
+    def scan(
+        self,
+        columns: Sequence[str] | None = None,
+        filters: Sequence[Filter] = (),
+        group_ids: Sequence[int] | None = None,
+        start_date: date | None = None,
+        end_date: date | None = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Read publications part by part.
+        Publications stored by several runs are read once, from the latest
+        part, and even if only an older copy matches the filters.
+
+        Args:
+            columns: Columns to read, all columns by default
+            filters: Conditions on integer columns all rows must meet, e.g.
+                ("text_length", ">", 50) or ("post_id", "==", 0)
+            group_ids: VK group IDs, None for all groups
+            start_date: First crawl date, None for no lower bound
+            end_date: Last crawl date, None for no upper bound
+
+        Yields:
+            DataFrames with the requested columns, parts without matching
+            rows are skipped
+        """
+        parts = self.list_parts(group_ids, start_date, end_date)
+        return self.read_parts(parts, columns, filters, latest_only=True)
+
+    def read_parts(
+        self,
+        parts: Sequence[Path],
+        columns: Sequence[str] | None = None,
+        filters: Sequence[Filter] = (),
+        latest_only: bool = False,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Read publications of the given parts.
+
+        Args:
+            parts: Paths of parts
+            columns: Columns to read, all columns by default
+            filters: Conditions on integer columns all rows must meet
+            latest_only: Read each publication from the last of the parts
+                holding it only, parts must be ordered like list_parts
+                returns them. Parts are then read in reverse.
+
+        Yields:
+            DataFrames with the requested columns, parts without matching
+            rows are skipped
+        """
+        columns = list(columns or COLUMNS)
+        for column, operator, _ in filters:
+            if column not in INT_COLUMNS or operator not in OPERATORS:
+                raise ValueError(f"Unsupported filter on {column}: {operator}")
+
+        # Keys of publications read from later parts of the current group
+        seen: Set[Tuple[int, int, int]] = set()
+        group_dir = None
+        for part in reversed(parts) if latest_only else parts:
+            with open(part / META_FILE, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["rows"] == 0:
+                continue
+
+            # Columns are memory-mapped, only what is used gets read
+            arrays: Dict[str, np.ndarray] = {}
+
+            def load(column: str) -> np.ndarray:
+                if column not in arrays:
+                    arrays[column] = np.load(
+                        part / f"{column}.npy", mmap_mode="r"
+                    )
+                return arrays[column]
+
+            rows = None
+            if latest_only:
+                # Copies of a publication are all in partitions of its group,
+                # keys are taken before filtering, so that an older copy
+                # isn't read in place of a newer one that doesn't match
+                if part.parent.parent != group_dir:
+                    group_dir, seen = part.parent.parent, set()
+                keys = list(
+                    zip(
+                        load("owner_id").tolist(),
+                        load("post_id").tolist(),
+                        load("id").tolist(),
+                    )
+                )
+                rows = np.fromiter(
+                    (key not in seen for key in keys),
+                    dtype=bool,
+                    count=len(keys),
+                )
+                seen.update(keys)
+            if not _may_match(meta["stats"], filters):
+                continue
+
+            for column, operator, value in filters:
+                mask = OPERATORS[operator](load(column), value)
+                rows = mask if rows is None else rows & mask
+            selected = np.arange(meta["rows"]) if rows is None else rows
+            if rows is not None and not rows.any():
+                continue
+
+            data: Dict[str, Any] = {}
+            for column in columns:
+                if column == "text":
+                    data["text"] = self._read_texts(part, selected)
+                else:
+                    data[column] = np.asarray(load(column)[selected])
+            yield pd.DataFrame(data, columns=columns)
+
+    def _read_texts(self, part: Path, selected: np.ndarray) -> List[str]:
+        offsets = np.load(part / "text_offsets.npy")
+        starts = offsets[:-1][selected]
+        ends = offsets[1:][selected]
+        if offsets[-1] == 0:
+            return [""] * len(starts)
+        with (
+            open(part / "text.bin", "rb") as f,
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer,
+        ):
+            return [
+                buffer[start:end].decode("utf-8")
+                for start, end in zip(starts.tolist(), ends.tolist())
+            ]
+
+    def prune(self, retention_days: int) -> int:
+        """
+        Delete partitions crawled more than retention_days ago.
+
+        Args:
+            retention_days: Days partitions are kept, 0 keeps them forever
+
+        Returns:
+            Number of deleted partitions
+        """
+        if retention_days <= 0:
+            return 0
+        oldest = datetime.now(timezone.utc).date() - timedelta(
+            days=retention_days
+        )
+        deleted = 0
+        for partition in self.root.glob("group_id=*/crawl_date=*"):
+            if date.fromisoformat(partition.name.split("=")[1]) < oldest:
+                shutil.rmtree(partition, ignore_errors=True)
+                deleted += 1
+        if deleted:
+            log.info(f"Deleted {deleted} partitions older than {oldest}")
+        return deleted
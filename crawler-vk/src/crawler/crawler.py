@@ -1,43 +1,105 @@
+import itertools
 import logging
+import os
+import queue
+import threading
 from datetime import date
-from typing import List
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
 
 from vk_data_collector import Collector
 
 from src.config import settings
-from src.crawler.collect_data import collect_data
+from src.crawler.checkpoint.checkpoint import RunManifest
+from src.crawler.collect_data import CollectedCallback, collect_data
 from src.crawler.collect_groups import collect_groups
+from src.crawler.columnar_store.columnar_store import ColumnarStore
 from src.crawler.database_handler.database_handler import DatabaseHandler
 from src.crawler.exceptions.crawler_exceptions import CrawlerStopRequested
-from src.crawler.predict_depression import predict_depression
+from src.crawler.feature_store.feature_store import FeatureStore
+from src.crawler.incremental.incremental import IncrementalCrawl
+from src.crawler.memory.memory import PeakMemoryTracker, format_bytes
+from src.crawler.metrics.metrics import STAGE_DURATION
+from src.crawler.model_registry.model_registry import ModelRegistry
+from src.crawler.predict_depression import (
+    apply_predictions,
+    predict_depression,
+)
+from src.crawler.prediction_cache.prediction_cache import PredictionCache
 from src.crawler.preprocess_data import preprocess_data
 from src.crawler.preprocess_groups import preprocess_groups
-from src.crawler.status_manager.status_manager import CrawlerStatusManager
-from src.db.db import create_tables, get_db_connection
+from src.crawler.preprocessing.text_processor import TextProcessor
+from src.crawler.status_manager.status_manager import (
+    CrawlerState,
+    CrawlerStatusManager,
+    PipelineStage,
+)
+from src.crawler.token_cache.token_cache import TokenCache
+from src.db.db import create_tables
+from src.db.pool import ConnectionPool
 
 log = logging.getLogger(__name__)
 
+# Stages run for each chunk of publications
+PROCESSING_STAGES: List[PipelineStage] = [
+    "preprocessing",
+    "inference",
+    "saving_results",
+]
+
+# Group name with its posts and comments files
+Batch = Tuple[str, List[str], List[str]]
+
 
 class Crawler:
     """
     Crawler for collecting posts from VK.
+
+    Holds the resources shared by all runs: the collector, resident models,
+    caches and the database pool. Several runs may execute at once, each
+    with its own status manager and data directory.
     """
 
     def __init__(self, collector: Collector) -> None:
         self.collector = collector
-        self.status_manager = CrawlerStatusManager()
-        # Get base data directory from environment
-        self.data_dir = settings.data_dir
+        # Models are loaded lazily and stay resident between runs
+        self.models = ModelRegistry()
 
-        # Initialize database connection
-        self.db_conn = get_db_connection()
-        if not self.db_conn:
-            log.exception("Crawler failed to connect to database")
-            raise ValueError("Crawler failed to connect to database")
+        # Tokenized texts are cached on disk between runs
+        self.token_cache = None
+        if settings.token_cache_enabled:
+            self.token_cache = TokenCache(
+                path=settings.token_cache_path,
+                version=TextProcessor.get_version(),
+                max_entries=settings.token_cache_max_entries,
+            )
+        # Collected publications are kept in a columnar store
+        self.store = None
+        if settings.columnar_store_enabled:
+            self.store = ColumnarStore(settings.columnar_store_dir)
+        # Features of texts are kept between runs and for bulk reads
+        self.feature_store = None
+        if settings.feature_store_enabled:
+            self.feature_store = FeatureStore(settings.feature_store_dir)
+        # Initialize database connection pool
+        try:
+            self.db_pool = ConnectionPool(
+                min_size=settings.db_pool_min_size,
+                max_size=settings.db_pool_max_size,
+                timeout=settings.db_pool_timeout,
+                health_check_interval=settings.db_pool_health_check_interval,
+            )
+        except Exception as e:
+            log.exception("Crawler failed to connect to database", exc_info=e)
+            raise ValueError("Crawler failed to connect to database") from e
 
         # Create database tables if they don't exist
         try:
-            create_tables(self.db_conn)
+            with self.db_pool.connection() as conn:
+                create_tables(conn)
             log.info("Database tables checked/created successfully.")
         except Exception as e:
             log.exception(
@@ -49,7 +111,42 @@ class Crawler:
             )
             raise
 
-    def run_pipeline(self, group_names: List[str], target_date: str) -> None:
+    def run_pipeline(
+        self,
+        group_names: List[str],
+        target_date: str,
+        status_manager: CrawlerStatusManager,
+        data_dir: Path,
+    ) -> bool:
+        """
+        Run the complete data pipeline and report its peak memory.
+
+        Args:
+            groups_names: List of VK group names to collect from
+            target_date: Target date in YYYY-MM-DD format
+            status_manager: Status manager of the run
+            data_dir: Directory for data collected by the run
+
+        Returns:
+            True if the pipeline completed, False if it failed or was stopped
+        """
+        with PeakMemoryTracker() as memory_tracker:
+            completed = self._run_pipeline(
+                group_names, target_date, status_manager, data_dir
+            )
+        status_manager.set_peak_rss(memory_tracker.peak_bytes)
+        log.info(
+            f"Peak memory of the run: {format_bytes(memory_tracker.peak_bytes)}"
+        )
+        return completed
+
+    def _run_pipeline(
+        self,
+        group_names: List[str],
+        target_date: str,
+        status_manager: CrawlerStatusManager,
+        data_dir: Path,
+    ) -> bool:
         """
         Run the complete data pipeline:
         1. Collect groups
@@ -58,116 +155,641 @@ class Crawler:
         4. Preprocess data
         5. Run inference
         6. Save all results to database
+        Steps 4-6 are repeated for each group and chunk of publications.
+        With pipeline overlap they start as soon as the first group is
+        collected. With checkpoints the output of each stage is saved in
+        data_dir, and a run started again in the same directory continues
+        from the first incomplete stage of each group.
 
         Args:
             groups_names: List of VK group names to collect from
             target_date: Target date in YYYY-MM-DD format
+            status_manager: Status manager of the run
+            data_dir: Directory for data collected by the run
+
+        Returns:
+            True if the pipeline completed, False if it failed or was stopped
         """
         try:
-            self.status_manager.reset()
+            manifest = None
+            if settings.checkpoints_enabled:
+                manifest = RunManifest.open(data_dir, group_names, target_date)
+                if manifest.saved:
+                    log.info("Results of the run are already saved")
+                    status_manager.set_state("idle")
+                    return True
 
             # ------ STEP 1: Collect groups --------------------
-            self.status_manager.set_state("collecting_groups")
-            groups_files = collect_groups(
-                group_names,
-                target_date,
-                self.data_dir,
-                self.collector,
-                self.status_manager,
-            )
+            status_manager.set_state("collecting_groups")
+            if manifest is not None and manifest.groups_files is not None:
+                groups_files = manifest.groups_files
+                status_manager.start_stage("collecting_groups")
+                status_manager.finish_stage("collecting_groups")
+            else:
+                with STAGE_DURATION.time(stage="collecting_groups"):
+                    groups_files = collect_groups(
+                        group_names,
+                        target_date,
+                        data_dir,
+                        self.collector,
+                        status_manager,
+                    )
+                if manifest is not None:
+                    manifest.set_groups_files(groups_files)
 
             # ------ STEP 2: Preprocess groups -----------------
-            self.status_manager.set_state("preprocessing_groups")
-            groups_data = preprocess_groups(groups_files)
+            status_manager.set_state("preprocessing_groups")
+            with STAGE_DURATION.time(stage="preprocessing_groups"):
+                groups_data = preprocess_groups(groups_files)
 
             # ------ STEP 3: Collect posts and comments ------
-            self.status_manager.set_state("collecting_data")
-            posts_files, comments_files = collect_data(
-                group_names,
-                target_date,
-                self.data_dir,
-                self.collector,
-                self.status_manager,
-            )
+            status_manager.set_state("collecting_data")
+            # Skip posts without changes since the previous runs
+            incremental = None
+            if settings.incremental_crawl:
+                incremental = IncrementalCrawl(
+                    self.db_pool, settings.incremental_recheck_days
+                )
+
+            # Groups collected by an earlier attempt are processed first
+            pending_groups = list(dict.fromkeys(group_names))
+            collected: List[Batch] = []
+            if manifest is not None:
+                collected = self._restore_collected(
+                    manifest, incremental, data_dir
+                )
+                done = {group for group, _, _ in collected}
+                pending_groups = [g for g in pending_groups if g not in done]
+
+            def on_collected(
+                group: str,
+                posts_files: List[str],
+                comments_files: List[str],
+                collected_posts_files: List[str],
+            ) -> None:
+                if manifest is not None:
+                    manifest.set_collected(
+                        group,
+                        posts_files,
+                        comments_files,
+                        collected_posts_files,
+                    )
+
+            batches: Iterable[Batch]
+            if settings.pipeline_overlap:
+                # Groups are processed as soon as they are collected while
+                # the next groups are downloaded
+                collector_thread, collecting = self._collect_in_background(
+                    pending_groups,
+                    target_date,
+                    status_manager,
+                    data_dir,
+                    incremental,
+                    on_collected,
+                )
+                batches = itertools.chain(collected, collecting)
+            else:
+                collector_thread = None
+                new_batches: List[Batch] = []
+
+                def collect_batch(group, posts, comments, collected_posts):
+                    on_collected(group, posts, comments, collected_posts)
+                    new_batches.append((group, posts, comments))
+
+                with STAGE_DURATION.time(stage="collecting_data"):
+                    collect_data(
+                        pending_groups,
+                        target_date,
+                        data_dir,
+                        self.collector,
+                        status_manager,
+                        on_collected=collect_batch,
+                        incremental=incremental,
+                    )
+                batches = collected + new_batches
 
-            # ------ STEP 4: Preprocess data -------------------
-            self.status_manager.set_state("preprocessing")
-            data = preprocess_data(posts_files, comments_files)
-            if data is None or data.empty:
+            try:
+                saved = self._process_batches(
+                    batches,
+                    groups_data,
+                    target_date,
+                    status_manager,
+                    collector_thread,
+                    incremental,
+                    manifest,
+                )
+            finally:
+                if collector_thread is not None and collector_thread.is_alive():
+                    # Processing failed, stop collection before leaving
+                    if status_manager.should_stop():
+                        collector_thread.join()
+                    else:
+                        status_manager.set_stop_flag()
+                        collector_thread.join()
+                        status_manager.reset_stop_flag()
+
+            if manifest is not None:
+                manifest.set_saved()
+
+            if not saved:
                 log.info(
                     (
                         "No data to process after preprocessing. "
                         "Stopping pipeline."
                     )
                 )
-                self.status_manager.set_state("idle")
-                self.status_manager.set_error("No data to process.")
-                return None
+                status_manager.set_state("idle")
+                status_manager.set_error("No data to process.")
+                return True
+
+            # Keep cache stats of the finished run visible until the next one
+            status_manager.reset_stop_flag()
+            status_manager.set_state("idle")
+            return True
+
+        except CrawlerStopRequested as sr:
+            log.exception("Crawler was stopped by user request", exc_info=sr)
+            status_manager.set_state("idle")
+            status_manager.set_error("Crawler was stopped by user request")
+            return False
 
-            # ------ STEP 5: Run inference ---------------------
-            self.status_manager.set_state("inference")
-            predict_depression(data)
+        except Exception as e:
+            log.exception("Error during data pipeline processing", exc_info=e)
+            status_manager.set_state("idle")
+            status_manager.set_error("Error during data pipeline processing")
+            return False
+
+    def _restore_collected(
+        self,
+        manifest: RunManifest,
+        incremental: IncrementalCrawl | None,
+        data_dir: Path,
+    ) -> List[Batch]:
+        """
+        Get files of groups collected by an earlier attempt of the run.
 
-            # ------ STEP 6: Save all results to database ------
-            self.status_manager.set_state("saving_results")
+        Args:
+            manifest: Manifest of the run
+            incremental: State of incremental crawling, None to collect all
+            data_dir: Directory for data collected by the run
+
+        Returns:
+            Group names with their posts and comments files
+        """
+        batches = []
+        for group in manifest.get_groups("collected"):
+            checkpoint = manifest.get_group(group)
+            if incremental is not None:
+                # Selecting posts again restores the crawl state saved with
+                # the results, comments are not collected again
+                for path in checkpoint["collected_posts_files"]:
+                    incremental.select_posts(
+                        path, os.path.join(data_dir, "posts", "changed")
+                    )
+            batches.append(
+                (
+                    group,
+                    checkpoint["posts_files"],
+                    checkpoint["comments_files"],
+                )
+            )
+        if batches:
+            log.info(
+                f"Groups collected by an earlier attempt: "
+                f"{', '.join(group for group, _, _ in batches)}"
+            )
+        return batches
+
+    def _collect_in_background(
+        self,
+        group_names: List[str],
+        target_date: str,
+        status_manager: CrawlerStatusManager,
+        data_dir: Path,
+        incremental: IncrementalCrawl | None = None,
+        on_collected: CollectedCallback | None = None,
+    ) -> Tuple[threading.Thread, Iterator[Batch]]:
+        """
+        Collect posts and comments in a background thread.
+
+        Args:
+            group_names: List of VK group names to collect from
+            target_date: Target date in YYYY-MM-DD format
+            status_manager: Status manager of the run
+            data_dir: Directory for data collected by the run
+            incremental: State of incremental crawling, None to collect all
+            on_collected: Called with files of each collected group before
+                they are passed on for processing
+
+        Returns:
+            Collecting thread and an iterator over group names with their
+            posts and comments files in the order the groups are collected.
+            The iterator re-raises the error the collection failed with.
+        """
+        collected: queue.Queue = queue.Queue()
+        errors: List[BaseException] = []
+
+        def collect_group(group, posts, comments, collected_posts) -> None:
+            if on_collected is not None:
+                on_collected(group, posts, comments, collected_posts)
+            collected.put((group, posts, comments))
+
+        def collect() -> None:
+            try:
+                with STAGE_DURATION.time(stage="collecting_data"):
+                    collect_data(
+                        group_names,
+                        target_date,
+                        data_dir,
+                        self.collector,
+                        status_manager,
+                        on_collected=collect_group,
+                        incremental=incremental,
+                    )
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                collected.put(None)
 
-            # Initialize database handler
+        thread = threading.Thread(target=collect, name="collect-data")
+        thread.start()
+
+        def batches() -> Iterator[Batch]:
+            while (batch := collected.get()) is not None:
+                yield batch
+            thread.join()
+            if errors:
+                raise errors[0]
+
+        return thread, batches()
+
+    def _process_batches(
+        self,
+        batches: Iterable[Batch],
+        groups_data: pd.DataFrame,
+        target_date: str,
+        status_manager: CrawlerStatusManager,
+        collector_thread: threading.Thread | None = None,
+        incremental: IncrementalCrawl | None = None,
+        manifest: RunManifest | None = None,
+    ) -> bool:
+        """
+        Preprocess, run inference and save results for collected files:
+        4. Preprocess data
+        5. Run inference
+        6. Save all results to database
+        Steps 4-6 are repeated for each group and chunk of publications and
+        all results are saved in one transaction. While groups are still
+        collected in the background, steps 4-5 run as they arrive and
+        saving waits for the end of collection, so that no transaction is
+        left open while groups are downloaded.
+
+        Args:
+            batches: Group names with their posts and comments files
+            groups_data: Preprocessed groups information
+            target_date: Target date in YYYY-MM-DD format
+            status_manager: Status manager of the run
+            collector_thread: Thread collecting the batches, None if
+                collection has already finished
+            incremental: State of incremental crawling saved with results,
+                None if crawling is not incremental
+            manifest: Manifest of the run saving output of the stages, None
+                to run without checkpoints
+
+        Returns:
+            True if results were saved, False if there was nothing to save
+        """
+        model_version = self.models.get_model_version()
+
+        # Predictions are cached by text for the current version of models.
+        # The word count is min-max scaled over the batch, predictions of a
+        # classifier using it depend on the batch and are not cached.
+        prediction_cache = None
+        if settings.prediction_cache_enabled:
+            if (
+                settings.bow_count_feature
+                in self.models.get_selected_features()
+            ):
+                log.info(
+                    "Predictions are not cached, the classifier uses the "
+                    "word count scaled over the batch"
+                )
+            else:
+                prediction_cache = PredictionCache(self.db_pool, model_version)
+
+        if self.store is not None:
+            self.store.prune(settings.columnar_store_retention_days)
+        if self.feature_store is not None:
+            self.feature_store.prune(
+                self.models.get_feature_version(),
+                settings.feature_store_retention_days,
+            )
+
+        for stage in PROCESSING_STAGES:
+            status_manager.start_stage(stage)
+
+        # Steps 4-5 run chunk by chunk, so memory is bounded by the chunk
+        # size instead of the size of the crawl
+        results = self._predict_batches(
+            batches,
+            status_manager,
+            prediction_cache,
+            collector_thread,
+            manifest,
+        )
+        if collector_thread is not None:
+            # No transaction is opened while groups are still downloaded,
+            # results wait for the end of collection in memory or, with a
+            # manifest, in the prediction checkpoints of the run
+            if manifest is None:
+                results = iter(list(results))
+            else:
+                for _ in results:
+                    pass
+                results = self._load_predictions(manifest)
+
+        return self._save_results(
+            results,
+            groups_data,
+            target_date,
+            status_manager,
+            model_version,
+            prediction_cache,
+            incremental,
+        )
+
+    def _predict_batches(
+        self,
+        batches: Iterable[Batch],
+        status_manager: CrawlerStatusManager,
+        prediction_cache: PredictionCache | None,
+        collector_thread: threading.Thread | None,
+        manifest: RunManifest | None,
+    ) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Preprocess and run inference for collected groups chunk by chunk.
+        Groups are processed one at a time whether or not collection
+        overlaps, a chunk never spans groups.
+        """
+        for group, posts_files, comments_files in batches:
+            chunks = self._predict_group(
+                group,
+                posts_files,
+                comments_files,
+                status_manager,
+                prediction_cache,
+                collector_thread,
+                manifest,
+            )
+            for chunk in chunks:
+                yield chunk
+                self._set_state(
+                    "preprocessing", status_manager, collector_thread
+                )
+
+    def _load_predictions(
+        self, manifest: RunManifest
+    ) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """Load predicted chunks from the checkpoints of a run."""
+        for group in manifest.get_groups("predicted"):
+            for chunk in range(manifest.get_group(group)["chunks"]):
+                predicted = manifest.load_predictions(group, chunk)
+                if predicted is not None:
+                    yield predicted
+
+    def _save_results(
+        self,
+        results: Iterable[Tuple[pd.DataFrame, pd.DataFrame]],
+        groups_data: pd.DataFrame,
+        target_date: str,
+        status_manager: CrawlerStatusManager,
+        model_version: str,
+        prediction_cache: PredictionCache | None,
+        incremental: IncrementalCrawl | None,
+    ) -> bool:
+        """
+        Save predictions of a run in one transaction.
+
+        Args:
+            results: Publications of each chunk with predictions and
+                predicted distinct texts with text_hash and
+                depression_prediction columns
+            groups_data: Preprocessed groups information
+            target_date: Target date in YYYY-MM-DD format
+            status_manager: Status manager of the run
+            model_version: Version of the models that made the predictions
+            prediction_cache: Cache of predictions by text, None to disable it
+            incremental: State of incremental crawling saved with results,
+                None if crawling is not incremental
+
+        Returns:
+            True if results were saved, False if there was nothing to save
+        """
+        run_id = None
+        # All chunks are saved in one transaction on a pooled connection
+        with self.db_pool.connection() as conn:
             db_handler = DatabaseHandler(
-                conn=self.db_conn,
+                conn=conn,
                 group_ids=groups_data["id"].tolist(),
                 target_date=date.fromisoformat(target_date),
+                model_version=model_version,
             )
 
             # Start transaction
             try:
-                # Save groups
-                for _, row in groups_data.iterrows():
-                    db_handler.add_group(
-                        group_id=row["id"],
-                        name=row["name"],
-                        screen_name=row["screen_name"],
-                        is_closed=row["is_closed"],
-                        type=row["type"],
+                for publications, predictions in results:
+                    # ------ STEP 6: Save results to database ----------
+                    status_manager.set_state("saving_results")
+                    with STAGE_DURATION.time(stage="saving_results"):
+                        if run_id is None:
+                            db_handler.save_groups(groups_data)
+                            run_id = db_handler.save_run()
+                        if prediction_cache is not None:
+                            prediction_cache.put_many(
+                                conn,
+                                zip(
+                                    predictions["text_hash"],
+                                    predictions["depression_prediction"],
+                                ),
+                            )
+                        inserted, skipped = db_handler.save_predictions(
+                            run_id, publications
+                        )
+                    status_manager.add_save_stats(inserted, skipped)
+                    status_manager.advance_stage(
+                        "saving_results", inserted + skipped
                     )
 
-                # Create run record
-                run_id = db_handler.save_run()
-
-                # Save predictions
-                for _, row in data.iterrows():
-                    db_handler.save_prediction(
-                        run_id=run_id,
-                        owner_id=abs(row["owner_id"]),
-                        post_id=row["post_id"],
-                        vk_id=row["id"],
-                        depression_prediction=bool(
-                            row["depression_prediction"]
-                        ),
-                    )
+                for stage in PROCESSING_STAGES:
+                    status_manager.finish_stage(stage)
+
+                # Remember what was collected even if nothing was new
+                if incremental is not None and incremental.has_changes():
+                    if run_id is None:
+                        db_handler.save_groups(groups_data)
+                    incremental.save(conn)
+                    if run_id is None:
+                        conn.commit()
+
+                if run_id is None:
+                    return False
 
                 # Commit transaction
-                self.db_conn.commit()
-                log.info("Successfully saved all results to database")
+                conn.commit()
+                save_stats = status_manager.get_status()["save_stats"]
+                log.info(
+                    "Successfully saved all results to database: "
+                    f"{save_stats['inserted']} predictions inserted, "
+                    f"{save_stats['skipped']} already existing skipped"
+                )
+                return True
 
             except Exception as e:
                 # Rollback transaction on any error
-                self.db_conn.rollback()
+                if not conn.closed:
+                    conn.rollback()
                 log.error(
                     "Failed to save results to database, rolling back changes",
                     exc_info=e,
                 )
                 raise
 
-            self.status_manager.reset()
+    def _predict_group(
+        self,
+        group: str,
+        posts_files: List[str],
+        comments_files: List[str],
+        status_manager: CrawlerStatusManager,
+        prediction_cache: PredictionCache | None,
+        collector_thread: threading.Thread | None,
+        manifest: RunManifest | None,
+    ) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Preprocess and run inference for publications of a group.
+        With a manifest the features and predictions of each chunk are
+        saved, and chunks predicted by an earlier attempt are loaded.
 
-        except CrawlerStopRequested as sr:
-            log.exception("Crawler was stopped by user request", exc_info=sr)
-            self.status_manager.set_state("idle")
-            self.status_manager.set_error("Crawler was stopped by user request")
+        Args:
+            group: VK group name
+            posts_files: List of paths to posts JSON files of the group
+            comments_files: List of paths to comments JSON files of the group
+            status_manager: Status manager of the run
+            prediction_cache: Cache of predictions by text, None to disable it
+            collector_thread: Thread collecting the groups, None if
+                collection has already finished
+            manifest: Manifest of the run, None to run without checkpoints
 
-        except Exception as e:
-            log.exception("Error during data pipeline processing", exc_info=e)
-            self.status_manager.set_state("idle")
-            self.status_manager.set_error(
-                "Error during data pipeline processing"
-            )
+        Yields:
+            Publications of each chunk with predictions and predicted
+            distinct texts with text_hash and depression_prediction columns
+        """
+        chunks = preprocess_data(
+            posts_files,
+            comments_files,
+            self.models,
+            status_manager,
+            self.token_cache,
+            chunk_size=settings.pipeline_chunk_size or None,
+            prediction_cache=prediction_cache,
+            store=self.store,
+            feature_store=self.feature_store,
+        )
+
+        # ------ STEP 4: Preprocess data -------------------
+        self._set_state("preprocessing", status_manager, collector_thread)
+        if manifest is None:
+            for publications, data, embeddings in chunks:
+                status_manager.advance_stage("preprocessing", len(publications))
+                yield self._predict_chunk(
+                    publications,
+                    data,
+                    embeddings,
+                    status_manager,
+                    collector_thread,
+                )
+            return
+
+        checkpoint = manifest.get_group(group)
+        preprocessed = checkpoint["state"] != "collected"
+        if not preprocessed:
+            # Features of all chunks are saved before the first prediction,
+            # a group preprocessed in part is preprocessed again
+            manifest.clear_chunks(group)
+            count = 0
+            for publications, data, embeddings in chunks:
+                status_manager.advance_stage("preprocessing", len(publications))
+                manifest.save_features(
+                    group, count, publications, data, embeddings
+                )
+                count += 1
+            manifest.set_group_state(group, "preprocessed", chunks=count)
+            checkpoint = manifest.get_group(group)
+        else:
+            log.info(f"Group {group} was processed by an earlier attempt")
+
+        for chunk in range(checkpoint["chunks"]):
+            predicted = manifest.load_predictions(group, chunk)
+            if predicted is None:
+                publications, data, embeddings = manifest.load_features(
+                    group, chunk
+                )
+                if preprocessed:
+                    status_manager.advance_stage(
+                        "preprocessing", len(publications)
+                    )
+                predicted = self._predict_chunk(
+                    publications,
+                    data,
+                    embeddings,
+                    status_manager,
+                    collector_thread,
+                )
+                manifest.save_predictions(group, chunk, *predicted)
+            else:
+                # Chunks predicted by an earlier attempt count as processed
+                for stage in ("preprocessing", "inference"):
+                    status_manager.advance_stage(stage, len(predicted[0]))
+            yield predicted
+        manifest.set_group_state(group, "predicted")
+
+    def _predict_chunk(
+        self,
+        publications: pd.DataFrame,
+        data: pd.DataFrame,
+        embeddings: np.ndarray,
+        status_manager: CrawlerStatusManager,
+        collector_thread: threading.Thread | None,
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Run inference for a preprocessed chunk of publications.
+
+        Returns:
+            Publications with predictions and predicted distinct texts with
+            text_hash and depression_prediction columns
+        """
+        # ------ STEP 5: Run inference ---------------------
+        # Only distinct texts without a cached prediction are predicted,
+        # the rest reuse their predictions
+        self._set_state("inference", status_manager, collector_thread)
+        with STAGE_DURATION.time(stage="inference"):
+            predict_depression(data, embeddings, self.models)
+            publications = apply_predictions(publications, data)
+        status_manager.advance_stage("inference", len(publications))
+        return publications, data[["text_hash", "depression_prediction"]]
+
+    def _set_state(
+        self,
+        state: CrawlerState,
+        status_manager: CrawlerStatusManager,
+        collector_thread: threading.Thread | None,
+    ) -> None:
+        """
+        Set state of the crawler unless collection is still running.
+        While groups are collected in the background the state keeps
+        reporting collection and processing is reported by its stages.
+        """
+        if collector_thread is not None and collector_thread.is_alive():
+            if status_manager.should_stop():
+                raise CrawlerStopRequested()
+            return
+        status_manager.set_state(state)
@@ -1,9 +1,10 @@
 import logging
 from datetime import date
 
+import pandas as pd
 import psycopg2
 
-from src.db.db import add_group, create_crawler_run, save_predictions
+from src.db.db import create_crawler_run, save_groups, save_predictions
 
 log = logging.getLogger(__name__)
 
@@ -16,6 +17,7 @@ class DatabaseHandler:
         conn: psycopg2.extensions.connection,
         group_ids: list[int],
         target_date: date,
+        model_version: str | None = None,
     ) -> None:
         """
         Initialize the handler.
@@ -24,10 +26,12 @@ class DatabaseHandler:
             conn: Database connection
             group_ids: List of VK group IDs to analyze
             target_date: Target date for the analysis
+            model_version: Version of the models saved with predictions
         """
         self.conn = conn
         self.group_ids = group_ids
         self.target_date = target_date
+        self.model_version = model_version
 
     def save_run(self) -> int:
         """
@@ -42,58 +46,49 @@ class DatabaseHandler:
             self.group_ids,
         )
 
-    def add_group(
-        self,
-        group_id: int,
-        name: str,
-        screen_name: str,
-        is_closed: int,
-        type: str,
-    ) -> None:
+    def save_groups(self, groups_data: pd.DataFrame) -> None:
         """
-        Add a new group or update existing one.
+        Add new groups or update existing ones.
 
         Args:
-            group_id: VK group ID
-            name: Group name
-            screen_name: Group screen name
-            is_closed: Group is closed
-            type: Group type
+            groups_data: DataFrame with id, name, screen_name, is_closed
+                and type columns
         """
-        add_group(
+        columns = ["id", "name", "screen_name", "is_closed", "type"]
+        save_groups(
             conn=self.conn,
-            group_id=group_id,
-            name=name,
-            screen_name=screen_name,
-            is_closed=is_closed,
-            type=type,
+            groups=list(
+                groups_data[columns]
+                .astype(object)
+                .itertuples(index=False, name=None)
+            ),
         )
 
-    def save_prediction(
-        self,
-        run_id: int,
-        owner_id: int,
-        post_id: int,
-        vk_id: int,
-        depression_prediction: bool,
-    ) -> None:
+    def save_predictions(
+        self, run_id: int, data: pd.DataFrame
+    ) -> tuple[int, int]:
         """
-        Save a single prediction to the database.
-        If a post with the same owner_id, post_id and vk_id already exists,
-        the prediction will be skipped.
+        Save predictions of publications in bulk.
+        If a publication with the same owner_id, post_id and vk_id already
+        exists, its prediction will be skipped.
 
         Args:
             run_id: ID of the crawler run
-            owner_id: VK group ID
-            post_id: Post ID (0 for posts, actual post_id for comments)
-            vk_id: Post ID for posts, comment ID for comments
-            depression_prediction: Prediction result (True/False)
+            data: DataFrame with owner_id, post_id (0 for posts), id (post ID
+                for posts, comment ID for comments) and depression_prediction
+                columns
+
+        Returns:
+            Numbers of inserted and skipped predictions
         """
-        save_predictions(
+        return save_predictions(
             conn=self.conn,
             run_id=run_id,
-            owner_id=owner_id,
-            post_id=post_id,
-            vk_id=vk_id,
-            depression_prediction=depression_prediction,
+            predictions=zip(
+                data["owner_id"].abs(),
+                data["post_id"],
+                data["id"],
+                data["depression_prediction"].astype(bool),
+            ),
+            model_version=self.model_version,
         )
@@ -8,3 +8,11 @@ class CrawlerStopRequested(Exception):
         self, message: str = "Crawler stop was requested by user"
     ) -> None:
         super().__init__(message)
+
+
+class VKAPIError(Exception):
+    """Exception raised when VK API returns an error."""
+
+    def __init__(self, code: int, message: str) -> None:
+        self.code = code
+        super().__init__(f"VK API error {code}: {message}")
@@ -0,0 +1,3 @@
+from .feature_store import FeatureStore
+
+__all__ = ["FeatureStore"]
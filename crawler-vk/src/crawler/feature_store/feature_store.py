@@ -0,0 +1,350 @@
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Collection, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.crawler.metrics.metrics import record_cache_lookups
+
+log = logging.getLogger(__name__)
+
+INDEX_FILE = "index.sqlite3"
+# Keep queries below the SQLite host parameter limit
+QUERY_BATCH_SIZE = 500
+# Shards kept memory-mapped at once
+MAX_OPEN_SHARDS = 64
+
+
+class FeatureStore:
+    """
+    Persistent store of features of cleaned texts.
+
+    Features of a batch of texts are written as one float32 .npy shard
+    under a directory per feature version, a SQLite index maps the text
+    hash and the version to the shard and row. Publications are mapped to
+    the hash of their text, so that features of groups are read in bulk
+    without tokenizing and embedding the texts again. Shards are read
+    memory-mapped, only the requested rows are copied.
+    """
+
+    def __init__(self, root: Path) -> None:
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory of the shards and the index
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._shards: Dict[str, np.ndarray] = {}
+        # Shards being gathered and versions being read in bulk, pruning
+        # leaves them in place
+        self._shard_readers: Counter[str] = Counter()
+        self._version_readers: Counter[str] = Counter()
+        self._conn = self._connect()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS features (
+                    version TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    shard TEXT NOT NULL,
+                    row INTEGER NOT NULL,
+                    PRIMARY KEY (version, text_hash)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS publications (
+                    version TEXT NOT NULL,
+                    owner_id INTEGER NOT NULL,
+                    post_id INTEGER NOT NULL,
+                    id INTEGER NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    PRIMARY KEY (version, owner_id, post_id, id)
+                ) WITHOUT ROWID
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(
+            str(self.root / INDEX_FILE), check_same_thread=False
+        )
+
+    def get_many(
+        self, version: str, text_hashes: Sequence[str]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get stored features of texts.
+
+        Args:
+            version: Version of the features
+            text_hashes: Hashes of cleaned texts
+
+        Returns:
+            Boolean mask of texts with stored features and a float32 array
+            of their features in the order of text_hashes
+        """
+        unique_hashes = list(dict.fromkeys(text_hashes))
+        locations: Dict[str, Tuple[str, int]] = {}
+        with self._lock:
+            for i in range(0, len(unique_hashes), QUERY_BATCH_SIZE):
+                batch = unique_hashes[i : i + QUERY_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, shard, row FROM features "
+                    f"WHERE version = ? AND text_hash IN ({placeholders})",
+                    [version, *batch],
+                ).fetchall()
+                locations.update(
+                    (text_hash, (shard, row)) for text_hash, shard, row in rows
+                )
+            shards = {shard for shard, _ in locations.values()}
+            self._shard_readers.update(shards)
+        found = np.array([h in locations for h in text_hashes], dtype=bool)
+        hits = int(found.sum())
+        record_cache_lookups("features", hits=hits, misses=len(found) - hits)
+        try:
+            return found, self._gather(
+                [locations[h] for h in text_hashes if h in locations]
+            )
+        finally:
+            self._release(shards)
+
+    def put_many(
+        self, version: str, text_hashes: Sequence[str], features: np.ndarray
+    ) -> None:
+        """
+        Store features of texts as a new shard.
+        Texts that already have features of the version are skipped.
+
+        Args:
+            version: Version of the features
+            text_hashes: Hashes of cleaned texts
+            features: Array of features aligned with text_hashes
+        """
+        if len(text_hashes) == 0:
+            return
+        directory = self.root / version
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"shard-{uuid.uuid4().hex}.npy"
+        # Readers never see a shard before it is fully written
+        tmp_path = directory / f".{name}"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(features, dtype=np.float32))
+        os.replace(tmp_path, directory / name)
+
+        shard = f"{version}/{name}"
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO features "
+                "(version, text_hash, shard, row) VALUES (?, ?, ?, ?)",
+                [
+                    (version, text_hash, shard, row)
+                    for row, text_hash in enumerate(text_hashes)
+                ],
+            )
+
+    def put_publications(
+        self, version: str, publications: pd.DataFrame
+    ) -> None:
+        """
+        Map publications to the hashes of their texts.
+
+        Args:
+            version: Version of the features
+            publications: DataFrame with owner_id, post_id, id and text_hash
+                columns
+        """
+        rows = zip(
+            publications["owner_id"].tolist(),
+            publications["post_id"].tolist(),
+            publications["id"].tolist(),
+            publications["text_hash"].tolist(),
+        )
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO publications "
+                "(version, owner_id, post_id, id, text_hash) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(version, *row) for row in rows],
+            )
+
+    def read(
+        self,
+        version: str,
+        group_ids: Sequence[int] | None = None,
+        batch_size: int = 10_000,
+    ) -> Iterator[Tuple[pd.DataFrame, np.ndarray]]:
+        """
+        Read features of stored publications in bulk.
+
+        Args:
+            version: Version of the features
+            group_ids: VK group IDs, None for all groups
+            batch_size: Publications per batch
+
+        Yields:
+            DataFrame with owner_id, post_id, id and text_hash columns and a
+            float32 array of features aligned with its rows
+        """
+        query = (
+            "SELECT p.owner_id, p.post_id, p.id, p.text_hash, f.shard, f.row "
+            "FROM publications p JOIN features f "
+            "ON f.version = p.version AND f.text_hash = p.text_hash "
+            "WHERE p.version = ?"
+        )
+        params: List = [version]
+        if group_ids is not None:
+            # Walls of groups have negative owner IDs
+            query += f" AND p.owner_id IN ({','.join('?' * len(group_ids))})"
+            params.extend(-int(group_id) for group_id in group_ids)
+        # Rows of a shard are read together
+        query += " ORDER BY f.shard, f.row"
+
+        # A connection of its own keeps the cursor open between batches,
+        # shards of the version are not pruned until the read is over
+        with self._lock:
+            self._version_readers[version] += 1
+        conn = self._connect()
+        try:
+            cursor = conn.execute(query, params)
+            while rows := cursor.fetchmany(batch_size):
+                publications = pd.DataFrame(
+                    [row[:4] for row in rows],
+                    columns=["owner_id", "post_id", "id", "text_hash"],
+                )
+                yield publications, self._gather([row[4:] for row in rows])
+        finally:
+            conn.close()
+            with self._lock:
+                self._version_readers[version] -= 1
+                if not self._version_readers[version]:
+                    del self._version_readers[version]
+
+    def prune(self, version: str, retention_days: int) -> int:
+        """
+        Delete features of other versions and shards of the version written
+        more than retention_days ago. Publications whose texts have no
+        features left are unmapped, texts seen again are stored anew.
+        Shards being read are left for a later pruning.
+
+        Args:
+            version: Current version of the features
+            retention_days: Days shards are kept, 0 keeps them forever
+
+        Returns:
+            Number of deleted shards
+        """
+        # Readers take the lock to find shards, so none of them starts
+        # reading a shard while it is deleted
+        with self._lock:
+            shards = [
+                path
+                for directory in self.root.iterdir()
+                if directory.is_dir() and directory.name != version
+                for path in directory.glob("shard-*.npy")
+            ]
+            if retention_days > 0 and (self.root / version).is_dir():
+                oldest = time.time() - retention_days * 86400
+                shards.extend(
+                    path
+                    for path in (self.root / version).glob("shard-*.npy")
+                    if path.stat().st_mtime < oldest
+                )
+            in_use = [
+                path
+                for path in shards
+                if path.parent.name in self._version_readers
+                or f"{path.parent.name}/{path.name}" in self._shard_readers
+            ]
+            shards = [path for path in shards if path not in in_use]
+            kept_versions = {version, *self._version_readers}
+            kept_versions.update(path.parent.name for path in in_use)
+            self._delete_shards(shards, kept_versions)
+
+        for directory in self.root.iterdir():
+            if directory.is_dir() and directory.name not in kept_versions:
+                shutil.rmtree(directory, ignore_errors=True)
+        if shards:
+            log.info(f"Deleted {len(shards)} feature shards")
+        if in_use:
+            log.info(f"Kept {len(in_use)} feature shards being read")
+        return len(shards)
+
+    def _delete_shards(
+        self, shards: List[Path], kept_versions: Collection[str]
+    ) -> None:
+        """Delete shards and their index entries, called with the lock."""
+        names = [f"{path.parent.name}/{path.name}" for path in shards]
+        kept = list(kept_versions)
+        with self._conn:
+            others = f"version NOT IN ({','.join('?' * len(kept))})"
+            self._conn.execute(f"DELETE FROM features WHERE {others}", kept)
+            self._conn.execute(f"DELETE FROM publications WHERE {others}", kept)
+            for i in range(0, len(names), QUERY_BATCH_SIZE):
+                batch = names[i : i + QUERY_BATCH_SIZE]
+                self._conn.execute(
+                    f"DELETE FROM features "
+                    f"WHERE shard IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+            if names:
+                self._conn.execute(
+                    "DELETE FROM publications WHERE NOT EXISTS ("
+                    "SELECT 1 FROM features f WHERE f.version = "
+                    "publications.version AND f.text_hash = "
+                    "publications.text_hash)"
+                )
+        for name in names:
+            self._shards.pop(name, None)
+
+        # Files are deleted once the index no longer points to them
+        for path in shards:
+            path.unlink(missing_ok=True)
+
+    def _gather(self, locations: List[Tuple[str, int]]) -> np.ndarray:
+        """Copy rows of shards into one array."""
+        if not locations:
+            return np.empty((0, 0), dtype=np.float32)
+        rows_by_shard: Dict[str, Tuple[List[int], List[int]]] = {}
+        for i, (shard, row) in enumerate(locations):
+            positions, rows = rows_by_shard.setdefault(shard, ([], []))
+            positions.append(i)
+            rows.append(row)
+
+        arrays = [self._open(shard) for shard in rows_by_shard]
+        features = np.empty(
+            (len(locations), arrays[0].shape[1]), dtype=np.float32
+        )
+        for array, (positions, rows) in zip(arrays, rows_by_shard.values()):
+            features[positions] = array[rows]
+        return features
+
+    def _open(self, shard: str) -> np.ndarray:
+        with self._lock:
+            array = self._shards.get(shard)
+            if array is None:
+                if len(self._shards) >= MAX_OPEN_SHARDS:
+                    self._shards.clear()
+                array = np.load(self.root / shard, mmap_mode="r")
+                self._shards[shard] = array
+            return array
+
+    def _release(self, shards: Collection[str]) -> None:
+        with self._lock:
+            for shard in shards:
+                self._shard_readers[shard] -= 1
+                if not self._shard_readers[shard]:
+                    del self._shard_readers[shard]
@@ -0,0 +1,3 @@
+from .group_executor import run_for_groups
+
+__all__ = ["run_for_groups"]
@@ -0,0 +1,70 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, TypeVar
+
+from src.crawler.exceptions.crawler_exceptions import CrawlerStopRequested
+from src.crawler.status_manager.status_manager import CrawlerStatusManager
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def run_for_groups(
+    groups: List[str],
+    func: Callable[[str], T],
+    status_manager: CrawlerStatusManager,
+    workers: int,
+) -> List[T]:
+    """
+    Run func for every group, several groups at a time.
+
+    Progress is the share of finished groups and the current group lists
+    all groups in flight. Groups not started yet are cancelled when one
+    fails or stop is requested.
+
+    Args:
+        groups: VK group names
+        func: Function processing a single group
+        status_manager: Status manager for tracking progress and stop flag
+        workers: Number of groups processed at once, 1 runs sequentially
+
+    Returns:
+        Results of func in the order of groups
+    """
+    lock = threading.Lock()
+    in_flight: List[str] = []
+    finished = 0
+    total = len(groups)
+
+    def run(group: str) -> T:
+        nonlocal finished
+        with lock:
+            if status_manager.should_stop():
+                raise CrawlerStopRequested()
+            in_flight.append(group)
+            status_manager.set_current_group(", ".join(in_flight))
+        try:
+            return func(group)
+        finally:
+            with lock:
+                in_flight.remove(group)
+                finished += 1
+                status_manager.set_progress(int(finished * 100 / total))
+
+    status_manager.set_progress(0)
+    if workers <= 1 or total <= 1:
+        return [run(group) for group in groups]
+
+    executor = ThreadPoolExecutor(
+        max_workers=min(workers, total), thread_name_prefix="collector"
+    )
+    try:
+        futures = [executor.submit(run, group) for group in groups]
+        return [future.result() for future in futures]
+    except BaseException:
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    finally:
+        executor.shutdown(wait=True)
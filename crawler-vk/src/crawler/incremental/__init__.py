@@ -0,0 +1,3 @@
+from .incremental import IncrementalCrawl
+
+__all__ = ["IncrementalCrawl"]
@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+from psycopg2._psycopg import connection
+
+from src.db.db import (
+    get_group_watermarks,
+    get_post_comment_counts,
+    save_crawl_state,
+)
+from src.db.pool import ConnectionPool
+
+log = logging.getLogger(__name__)
+
+
+class IncrementalCrawl:
+    """
+    Selects posts that changed since the previous runs.
+
+    The newest post seen in each group is its watermark. Posts are listed
+    back to the watermark less recheck_days rather than to the target
+    date, and comments are collected only for new posts and listed posts
+    whose comment count changed. The state of a run is kept in memory and
+    saved with its results, so a failed run does not hide changes from
+    the next one.
+    """
+
+    def __init__(self, db_pool: ConnectionPool, recheck_days: int) -> None:
+        """
+        Args:
+            db_pool: Pool of database connections to read the state from
+            recheck_days: Days before the watermark listed again to catch
+                new comments of recent posts
+        """
+        self.db_pool = db_pool
+        self.recheck_days = recheck_days
+        self._lock = threading.Lock()
+        self._watermarks: Dict[int, Tuple[int, datetime]] = {}
+        self._comment_counts: List[Tuple[int, int, int]] = []
+
+    def get_date_to(self, group: str, target_date: str) -> str:
+        """
+        Get the date posts of a group are listed back to.
+
+        Args:
+            group: VK group name
+            target_date: Target date in YYYY-MM-DD format
+
+        Returns:
+            Later of the target date and the watermark less recheck_days,
+            in YYYY-MM-DD format
+        """
+        with self.db_pool.connection() as conn:
+            watermark = get_group_watermarks(conn, [group]).get(group)
+        if watermark is None:
+            return target_date
+
+        # The collector stops at posts not newer than the local midnight
+        # of the date, the day of the watermark itself is listed again
+        recheck_from = watermark.astimezone().date() - timedelta(
+            days=self.recheck_days
+        )
+        date_to = max(date.fromisoformat(target_date), recheck_from)
+        log.info(f"Group {group}: listing posts back to {date_to}")
+        return date_to.isoformat()
+
+    def select_posts(self, posts_file: str, output_dir: str) -> str | None:
+        """
+        Write new and changed posts of a posts file to output_dir.
+
+        Args:
+            posts_file: Path to a posts JSON file of one group
+            output_dir: Directory for the file with selected posts
+
+        Returns:
+            Path to the file with selected posts, None if nothing changed
+        """
+        with open(posts_file, "r", encoding="utf-8") as f:
+            posts = json.load(f)
+        if not posts:
+            return None
+
+        group_id = abs(posts[0]["owner_id"])
+        with self.db_pool.connection() as conn:
+            known_counts = get_post_comment_counts(
+                conn, group_id, [post["id"] for post in posts]
+            )
+
+        selected = [
+            post
+            for post in posts
+            if known_counts.get(post["id"]) != post["comments"]["count"]
+        ]
+        new_posts = sum(post["id"] not in known_counts for post in posts)
+        log.info(
+            f"Group {group_id}: {len(selected)} of {len(posts)} posts "
+            f"changed, {new_posts} of them new"
+        )
+
+        newest = max(posts, key=lambda post: post["id"])
+        with self._lock:
+            self._watermarks[group_id] = (
+                newest["id"],
+                datetime.fromtimestamp(newest["date"], tz=timezone.utc),
+            )
+            self._comment_counts.extend(
+                (group_id, post["id"], post["comments"]["count"])
+                for post in selected
+            )
+
+        if not selected:
+            return None
+        os.makedirs(output_dir, exist_ok=True)
+        selected_file = os.path.join(output_dir, os.path.basename(posts_file))
+        with open(selected_file, "w", encoding="utf-8") as f:
+            json.dump(selected, f, ensure_ascii=False)
+        return selected_file
+
+    def save(self, conn: connection) -> None:
+        """
+        Save watermarks and comment counts of the run.
+        Does not commit, the caller owns the transaction.
+
+        Args:
+            conn: Database connection
+        """
+        with self._lock:
+            watermarks = [
+                (group_id, post_id, post_date)
+                for group_id, (post_id, post_date) in self._watermarks.items()
+            ]
+            save_crawl_state(conn, watermarks, self._comment_counts)
+
+    def has_changes(self) -> bool:
+        """Check if the run has state to save."""
+        with self._lock:
+            return bool(self._watermarks)
@@ -0,0 +1,3 @@
+from .job_queue import JobWorker, PostgresJobScheduler
+
+__all__ = ["JobWorker", "PostgresJobScheduler"]
@@ -0,0 +1,407 @@
+import logging
+import os
+import shutil
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from src.config import settings
+from src.crawler.crawler import Crawler
+from src.crawler.profiling.profiling import profile_run
+from src.crawler.scheduler.scheduler import (
+    MAX_FINISHED_JOBS,
+    JobInfo,
+    split_groups,
+)
+from src.crawler.status_manager.status_manager import CrawlerStatusManager
+from src.db.jobs import (
+    cancel_jobs,
+    claim_job,
+    create_jobs,
+    finish_job,
+    get_jobs,
+    heartbeat_job,
+    release_job,
+    requeue_expired_jobs,
+    reset_job_status,
+)
+from src.db.pool import ConnectionPool
+
+log = logging.getLogger(__name__)
+
+
+def _isoformat(timestamp: datetime | None) -> str | None:
+    return timestamp.isoformat() if timestamp else None
+
+
+def _job_info(row: Dict[str, Any]) -> JobInfo:
+    return {
+        "id": row["id"],
+        "groups": row["groups"],
+        "target_date": row["target_date"].isoformat(),
+        "state": row["state"],
+        "created_at": row["created_at"].isoformat(),
+        "started_at": _isoformat(row["started_at"]),
+        "finished_at": _isoformat(row["finished_at"]),
+        "profile": row["profile"],
+        "run_id": row["run_id"] or row["id"],
+        # Status is reported by the worker once the job runs
+        "status": row["status"] or CrawlerStatusManager().get_status(),
+    }
+
+
+class ClaimedJob:
+    """A job leased from the queue and run by this worker."""
+
+    def __init__(self, row: Dict[str, Any]) -> None:
+        self.id: str = row["id"]
+        self.groups: List[str] = row["groups"]
+        self.target_date: str = row["target_date"].isoformat()
+        self.attempt: int = row["attempts"]
+        self.profile: bool = row["profile"]
+        # Jobs queued before runs could be resumed have no run ID
+        self.run_id: str = row["run_id"] or row["id"]
+        self.status_manager = CrawlerStatusManager()
+        self.cancel_requested = False
+        # Lease expired and the job was taken over or closed
+        self.lease_lost = False
+
+
+class JobWorker:
+    """
+    Runs pipelines of jobs claimed from the database queue.
+
+    Any number of workers in one or many crawler processes share the queue.
+    A worker leases each job it runs and renews the lease with heartbeats,
+    jobs of workers that stopped renewing are queued again.
+    """
+
+    def __init__(
+        self,
+        crawler: Crawler,
+        data_dir: Path,
+        max_concurrent_jobs: int,
+        lease_seconds: float,
+        heartbeat_interval: float,
+        poll_interval: float,
+        max_attempts: int,
+    ) -> None:
+        """
+        Initialize the worker.
+
+        Args:
+            crawler: Crawler running the pipelines
+            data_dir: Base directory for data of the jobs
+            max_concurrent_jobs: Number of jobs running at once
+            lease_seconds: Time a job is held without a heartbeat
+            heartbeat_interval: Seconds between heartbeats of running jobs
+            poll_interval: Seconds between checks of the queue
+            max_attempts: Runs of a job before it's failed when its workers
+                die
+        """
+        self.crawler = crawler
+        self.db_pool: ConnectionPool = crawler.db_pool
+        self.data_dir = Path(data_dir)
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.worker_id = (
+            f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        )
+
+        self._lock = threading.Lock()
+        self._running: Dict[str, ClaimedJob] = {}
+        self._stopping = threading.Event()
+        # Set when a job finishes so that the next one is claimed at once
+        self._wakeup = threading.Event()
+        self._heartbeat_stopped = threading.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_jobs, thread_name_prefix="job"
+        )
+        self._poll_thread = threading.Thread(
+            target=self._poll, name="job-poll", daemon=True
+        )
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat, name="job-heartbeat", daemon=True
+        )
+
+    def start(self) -> None:
+        """Start claiming and running jobs."""
+        self._poll_thread.start()
+        self._heartbeat_thread.start()
+        log.info(f"Job worker {self.worker_id} started")
+
+    def stop(self) -> None:
+        """Stop claiming jobs and return running jobs to the queue."""
+        self._stopping.set()
+        self._wakeup.set()
+        with self._lock:
+            running = list(self._running.values())
+        for job in running:
+            job.status_manager.set_stop_flag()
+        if self._poll_thread.is_alive():
+            self._poll_thread.join()
+        self._executor.shutdown(wait=True)
+        # Leases are renewed until running jobs are released
+        self._heartbeat_stopped.set()
+        if self._heartbeat_thread.is_alive():
+            self._heartbeat_thread.join()
+        log.info(f"Job worker {self.worker_id} stopped")
+
+    def _poll(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                with self.db_pool.connection() as conn:
+                    job_ids = requeue_expired_jobs(conn, self.max_attempts)
+                    if job_ids:
+                        log.warning(
+                            f"Jobs with expired leases: {', '.join(job_ids)}"
+                        )
+                    self._claim_jobs(conn)
+            except Exception as e:
+                log.exception("Error polling job queue", exc_info=e)
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _claim_jobs(self, conn) -> None:
+        while not self._stopping.is_set():
+            with self._lock:
+                if len(self._running) >= self.max_concurrent_jobs:
+                    return
+            row = claim_job(conn, self.worker_id, self.lease_seconds)
+            if row is None:
+                return
+            job = ClaimedJob(row)
+            with self._lock:
+                self._running[job.id] = job
+            log.info(
+                f"Job {job.id} claimed, attempt {job.attempt} "
+                f"for groups: {', '.join(job.groups)}"
+            )
+            self._executor.submit(self._run, job)
+
+    def _heartbeat(self) -> None:
+        while not self._heartbeat_stopped.wait(self.heartbeat_interval):
+            with self._lock:
+                running = list(self._running.values())
+            if not running:
+                continue
+            try:
+                with self.db_pool.connection() as conn:
+                    for job in running:
+                        self._send_heartbeat(conn, job)
+            except Exception as e:
+                log.exception("Error sending job heartbeats", exc_info=e)
+
+    def _send_heartbeat(self, conn, job: ClaimedJob) -> None:
+        cancel_requested = heartbeat_job(
+            conn,
+            job.id,
+            self.worker_id,
+            self.lease_seconds,
+            job.status_manager.get_status(),
+        )
+        if cancel_requested is None:
+            if not job.lease_lost:
+                log.warning(f"Job {job.id} lease lost, stopping the run")
+            job.lease_lost = True
+            job.status_manager.set_stop_flag()
+        elif cancel_requested and not job.cancel_requested:
+            log.info(f"Job {job.id} cancel requested")
+            job.cancel_requested = True
+            job.status_manager.set_stop_flag()
+
+    def _run(self, job: ClaimedJob) -> None:
+        # Jobs collect into their own directory as collected files are
+        # named after groups and would clash between concurrent jobs
+        job_dir = self.data_dir / "runs" / job.run_id
+        # An earlier attempt of the job is continued from its checkpoints,
+        # without them its files are dropped
+        if not settings.checkpoints_enabled:
+            shutil.rmtree(job_dir, ignore_errors=True)
+        log.info(f"Job {job.id} started")
+        try:
+            try:
+                with profile_run(job.id, job.profile):
+                    completed = self.crawler.run_pipeline(
+                        job.groups,
+                        job.target_date,
+                        job.status_manager,
+                        job_dir,
+                    )
+            except Exception as e:
+                log.exception(f"Job {job.id} failed", exc_info=e)
+                completed = False
+
+            if job.lease_lost:
+                log.warning(f"Job {job.id} result dropped, lease was lost")
+                return
+            status = job.status_manager.get_status()
+            with self.db_pool.connection() as conn:
+                if not completed and self._stopping.is_set():
+                    release_job(conn, job.id, self.worker_id)
+                    log.info(f"Job {job.id} returned to the queue")
+                    return
+                if job.cancel_requested:
+                    state = "cancelled"
+                else:
+                    state = "finished" if completed else "failed"
+                finish_job(conn, job.id, self.worker_id, state, status)
+            log.info(f"Job {job.id} {state}")
+
+            # Keep data of failed and cancelled jobs for investigation and
+            # to resume their runs
+            if state == "finished":
+                shutil.rmtree(job_dir, ignore_errors=True)
+        except Exception as e:
+            log.exception(f"Error recording result of job {job.id}", exc_info=e)
+        finally:
+            with self._lock:
+                del self._running[job.id]
+            self._wakeup.set()
+
+
+class PostgresJobScheduler:
+    """
+    Queue of pipeline runs in the database shared by all crawler nodes.
+
+    Jobs are run by JobWorker instances of any node. Has the interface of
+    JobScheduler, so that the API works with either.
+    """
+
+    def __init__(
+        self,
+        db_pool: ConnectionPool,
+        max_groups_per_job: int = 0,
+        worker: JobWorker | None = None,
+    ) -> None:
+        """
+        Initialize the scheduler.
+
+        Args:
+            db_pool: Pool of connections to the database holding the queue
+            max_groups_per_job: Larger group lists are split into several
+                jobs, so that nodes share them, 0 never splits
+            worker: Worker of this process, stopped on shutdown
+        """
+        self.db_pool = db_pool
+        self.max_groups_per_job = max_groups_per_job
+        self.worker = worker
+
+    def submit(
+        self, groups: List[str], target_date: str, profile: bool = False
+    ) -> List[str]:
+        """
+        Queue pipeline runs for a group list.
+
+        Args:
+            groups: List of VK group names to collect from
+            target_date: Target date in YYYY-MM-DD format
+            profile: Profile the runs and save their profiles
+
+        Returns:
+            IDs of the queued jobs
+        """
+        jobs = []
+        for job_groups in split_groups(groups, self.max_groups_per_job):
+            job_id = uuid.uuid4().hex
+            jobs.append((job_id, job_groups, target_date, profile, job_id))
+        with self.db_pool.connection() as conn:
+            create_jobs(conn, jobs)
+        for job_id, job_groups, _, _, _ in jobs:
+            log.info(f"Job {job_id} queued for groups: {', '.join(job_groups)}")
+        return [job_id for job_id, _, _, _, _ in jobs]
+
+    def resume(
+        self,
+        run_id: str,
+        groups: List[str],
+        target_date: str,
+        profile: bool = False,
+    ) -> str:
+        """
+        Queue a job continuing a failed or cancelled run from its checkpoints.
+        The run's data directory must be on storage shared by the workers.
+
+        Args:
+            run_id: ID of the run to continue
+            groups: List of VK group names of the run
+            target_date: Target date of the run in YYYY-MM-DD format
+            profile: Profile the run and save its profile
+
+        Returns:
+            ID of the queued job
+        """
+        job_id = uuid.uuid4().hex
+        with self.db_pool.connection() as conn:
+            create_jobs(conn, [(job_id, groups, target_date, profile, run_id)])
+        log.info(f"Job {job_id} queued to resume run {run_id}")
+        return job_id
+
+    def get(self, job_id: str) -> JobInfo | None:
+        """Get a job by ID, None if it is unknown."""
+        with self.db_pool.connection() as conn:
+            rows = get_jobs(conn, job_id)
+        return _job_info(rows[0]) if rows else None
+
+    def list_jobs(self) -> List[JobInfo]:
+        """Get active and recently finished jobs, most recent first."""
+        with self.db_pool.connection() as conn:
+            rows = get_jobs(conn, limit=MAX_FINISHED_JOBS)
+        return [_job_info(row) for row in rows]
+
+    def get_current_job(self) -> JobInfo | None:
+        """
+        Get the job the legacy status API reports.
+
+        Returns:
+            Earliest started running job, the most recently started job if
+            none is running, None if there were no jobs
+        """
+        jobs = [job for job in self.list_jobs() if job["started_at"]]
+        running = [job for job in jobs if job["state"] == "running"]
+        if running:
+            return min(running, key=lambda job: job["started_at"] or "")
+        if jobs:
+            return max(jobs, key=lambda job: job["started_at"] or "")
+        return None
+
+    def reset_status(self, job_id: str) -> None:
+        """Reset pipeline status of a job if it has finished."""
+        with self.db_pool.connection() as conn:
+            reset_job_status(conn, job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued job or request a running job to stop.
+        Running jobs stop at the next heartbeat of their worker.
+
+        Args:
+            job_id: ID of the job
+
+        Returns:
+            False if the job is unknown
+        """
+        with self.db_pool.connection() as conn:
+            if not get_jobs(conn, job_id):
+                return False
+            cancel_jobs(conn, [job_id])
+        log.info(f"Job {job_id} cancel requested")
+        return True
+
+    def cancel_all(self) -> None:
+        """Cancel all queued and running jobs of all nodes."""
+        with self.db_pool.connection() as conn:
+            count = cancel_jobs(conn)
+        log.info(f"Cancel requested for {count} jobs")
+
+    def shutdown(self) -> None:
+        """Stop the worker of this process, its jobs return to the queue."""
+        if self.worker is not None:
+            self.worker.stop()
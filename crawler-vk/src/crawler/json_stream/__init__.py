@@ -0,0 +1,13 @@
+from .json_stream import (
+    JsonStreamReader,
+    PublicationColumns,
+    read_comments,
+    read_posts,
+)
+
+__all__ = [
+    "JsonStreamReader",
+    "PublicationColumns",
+    "read_posts",
+    "read_comments",
+]
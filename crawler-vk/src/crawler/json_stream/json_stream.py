@@ -0,0 +1,214 @@
+import json
+from array import array
+from typing import Any, Dict, Iterator, List, TextIO
+
+import numpy as np
+import pandas as pd
+
+# Characters read from a file at once
+CHUNK_SIZE = 1 << 20
+# Keys of publications kept while parsing, "thread" and "items" hold
+# replies to comments, everything else is dropped as soon as it is parsed
+PUBLICATION_KEYS = frozenset(
+    ("owner_id", "post_id", "id", "text", "thread", "items")
+)
+WHITESPACE = " \t\n\r"
+
+
+def _keep_publication_keys(pairs: List[tuple[str, Any]]) -> Dict[str, Any]:
+    return {key: value for key, value in pairs if key in PUBLICATION_KEYS}
+
+
+class JsonStreamReader:
+    """
+    Reads a JSON document incrementally, one array element at a time.
+
+    Containers the caller walks through are parsed token by token, their
+    elements are decoded by a JSONDecoder from a buffer holding only the
+    part of the file not consumed yet.
+    """
+
+    def __init__(
+        self,
+        file: TextIO,
+        decoder: json.JSONDecoder | None = None,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> None:
+        """
+        Args:
+            file: File opened in text mode
+            decoder: Decoder of elements, e.g. with an object_pairs_hook
+                dropping unused keys
+            chunk_size: Characters read from the file at once
+        """
+        self.file = file
+        self.decoder = decoder or json.JSONDecoder()
+        self.chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Read the next chunk, False at the end of the file."""
+        if self._eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # Drop the consumed part, so the buffer holds about one chunk
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Get the next character after whitespace, "" at the end."""
+        while True:
+            while (
+                self._pos < len(self._buffer)
+                and self._buffer[self._pos] in WHITESPACE
+            ):
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """Consume the next character, one of chars."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(
+                f"Expected one of {chars!r}, got {char or 'end of file'!r}"
+            )
+        self._pos += 1
+        return char
+
+    def decode(self) -> Any:
+        """Decode the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Value continues in the next chunk
+                if self._fill():
+                    continue
+                raise
+            # A number at the end of the buffer may be cut off
+            if end == len(self._buffer) and not self._eof:
+                if self._fill():
+                    continue
+            self._pos = end
+            return value
+
+    def iter_array(self) -> Iterator[Any]:
+        """Decode elements of the array at the current position."""
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.decode()
+            if self.expect(",]") == "]":
+                return
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        Walk through the object at the current position.
+        Yields each key, the caller consumes its value before resuming.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.decode()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+
+class PublicationColumns:
+    """Typed column buffers of publications filtered by text length."""
+
+    def __init__(self, min_text_length: int) -> None:
+        self.min_text_length = min_text_length
+        self.owner_id = array("q")
+        self.post_id = array("q")
+        self.id = array("q")
+        self.text: List[str] = []
+
+    def append(self, item: Dict[str, Any], post_id: int = 0) -> None:
+        """Add a publication unless it lacks IDs or its text is short."""
+        text = item.get("text") or ""
+        if len(text) <= self.min_text_length:
+            return
+        owner_id = item.get("owner_id")
+        vk_id = item.get("id")
+        if owner_id is None or vk_id is None:
+            return
+        self.owner_id.append(int(owner_id))
+        self.post_id.append(int(item.get("post_id") or post_id))
+        self.id.append(int(vk_id))
+        self.text.append(text)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Get publications with owner_id, post_id, id and text columns."""
+        return pd.DataFrame(
+            {
+                "owner_id": np.frombuffer(self.owner_id, dtype=np.int64),
+                "post_id": np.frombuffer(self.post_id, dtype=np.int64),
+                "id": np.frombuffer(self.id, dtype=np.int64),
+                "text": pd.Series(self.text, dtype=object),
+            }
+        )
+
+
+def _publication_reader(file: TextIO) -> JsonStreamReader:
+    decoder = json.JSONDecoder(object_pairs_hook=_keep_publication_keys)
+    return JsonStreamReader(file, decoder)
+
+
+def read_posts(path: str, min_text_length: int) -> pd.DataFrame:
+    """
+    Load posts with a long enough text from a posts JSON file.
+
+    Args:
+        path: Path to a file with an array of posts
+        min_text_length: Posts with this many characters or less are skipped
+
+    Returns:
+        DataFrame with owner_id, post_id (0 for posts), id and text columns
+    """
+    columns = PublicationColumns(min_text_length)
+    with open(path, "r", encoding="utf-8") as f:
+        for post in _publication_reader(f).iter_array():
+            columns.append(post)
+    return columns.to_frame()
+
+
+def read_comments(path: str, min_text_length: int) -> pd.DataFrame:
+    """
+    Load comments and their replies with a long enough text from a comments
+    JSON file. Replies of a comment's thread follow the comment.
+
+    Args:
+        path: Path to a file with arrays of comments by post
+        min_text_length: Comments with this many characters or less are
+            skipped, their replies are kept
+
+    Returns:
+        DataFrame with owner_id, post_id, id and text columns
+    """
+    columns = PublicationColumns(min_text_length)
+    with open(path, "r", encoding="utf-8") as f:
+        reader = _publication_reader(f)
+        for _ in reader.iter_object():
+            for comment in reader.iter_array():
+                columns.append(comment)
+                post_id = comment.get("post_id") or 0
+                for reply in (comment.get("thread") or {}).get("items", []):
+                    columns.append(reply, post_id)
+    return columns.to_frame()
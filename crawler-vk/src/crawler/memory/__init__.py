@@ -0,0 +1,13 @@
+from .memory import (
+    PeakMemoryTracker,
+    format_bytes,
+    get_peak_rss_bytes,
+    get_rss_bytes,
+)
+
+__all__ = [
+    "get_rss_bytes",
+    "get_peak_rss_bytes",
+    "format_bytes",
+    "PeakMemoryTracker",
+]
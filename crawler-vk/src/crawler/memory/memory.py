@@ -0,0 +1,81 @@
+import resource
+import sys
+import threading
+
+PAGE_SIZE = resource.getpagesize()
+
+
+def get_rss_bytes() -> int:
+    """Get current resident set size of the process in bytes.
+
+    Reads /proc/self/statm on Linux and falls back to the peak RSS
+    reported by getrusage on other platforms.
+
+    Returns:
+        Resident set size in bytes
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return get_peak_rss_bytes()
+
+
+def get_peak_rss_bytes() -> int:
+    """Get peak resident set size of the process in bytes.
+
+    Returns:
+        Peak resident set size in bytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def format_bytes(size: int) -> str:
+    """Format a size in bytes as a human readable string.
+
+    Args:
+        size: Size in bytes
+
+    Returns:
+        Formatted size, e.g. "1.5 GB"
+    """
+    value = float(size)
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(value) < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+class PeakMemoryTracker:
+    """
+    Tracks peak resident set size of the process while it is active.
+
+    getrusage only reports the peak over the lifetime of the process, so
+    RSS is sampled in a background thread to get the peak of a single run.
+    """
+
+    def __init__(self, interval: float = 0.1) -> None:
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "PeakMemoryTracker":
+        self.peak_bytes = get_rss_bytes()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, get_rss_bytes())
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, get_rss_bytes())
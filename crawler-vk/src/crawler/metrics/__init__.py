@@ -0,0 +1,23 @@
+from .metrics import (
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    record_cache_lookups,
+    record_db_write,
+    record_throughput,
+    start_metrics_server,
+)
+
+__all__ = [
+    "REGISTRY",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "record_cache_lookups",
+    "record_db_write",
+    "record_throughput",
+    "start_metrics_server",
+]
@@ -0,0 +1,430 @@
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple, TypeVar
+
+from src.crawler.memory.memory import get_rss_bytes
+
+log = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Buckets for short operations, e.g. requests and batches, in seconds
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)  # fmt: skip
+# Buckets for pipeline stages, which may take up to hours, in seconds
+STAGE_BUCKETS = (
+    0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 1800.0, 3600.0
+)  # fmt: skip
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return (
+        repr(float(value)) if not float(value).is_integer() else str(int(value))
+    )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    )
+    return f"{{{pairs}}}"
+
+
+class Metric:
+    """Base of metrics with a value per combination of label values."""
+
+    type = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labels: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.label_names}, "
+                f"got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def collect(self) -> List[str]:
+        """Get sample lines of the metric in the text exposition format."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Get the metric in the text exposition format."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self.collect(),
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class Counter(Metric):
+    """Monotonically increasing count, e.g. of requests or processed items."""
+
+    type = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labels: Sequence[str] = ()
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the count of the given label values."""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: str) -> float:
+        """Get the count of the given label values."""
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0.0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} "
+            f"{_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(Metric):
+    """Value that goes up and down, set directly or read at scrape time."""
+
+    type = "gauge"
+
+    def __init__(
+        self, name: str, documentation: str, labels: Sequence[str] = ()
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float | Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the value of the given label values."""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(
+        self, function: Callable[[], float], **labels: str
+    ) -> None:
+        """Read the value of the given label values from a function."""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = function
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        lines = []
+        for key, value in values:
+            if callable(value):
+                try:
+                    value = value()
+                except Exception as e:
+                    log.exception(
+                        f"Error reading gauge {self.name}", exc_info=e
+                    )
+                    continue
+            lines.append(
+                f"{self.name}{_format_labels(self.label_names, key)} "
+                f"{_format_value(value)}"
+            )
+        return lines
+
+
+class Histogram(Metric):
+    """Distribution of observed values, e.g. durations, in buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        if not math.isinf(self.buckets[-1]):
+            self.buckets += (math.inf,)
+        # Per label values: count of each bucket, sum and count
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Add an observed value of the given label values."""
+        key = self._label_values(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * len(self.buckets), [0.0, 0.0])
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            total[0] += value
+            total[1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = [
+                (key, list(counts), list(total))
+                for key, (counts, total) in self._values.items()
+            ]
+        names = self.label_names + ("le",)
+        lines = []
+        for key, counts, (total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {_format_value(count)}")
+        return lines
+
+
+T = TypeVar("T", bound=Metric)
+
+
+class MetricsRegistry:
+    """Metrics of the process exposed to Prometheus."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: T) -> T:
+        """Add a metric, names must be unique."""
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Get all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(metric.render() for metric in metrics)
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_DURATION = REGISTRY.register(
+    Histogram(
+        "crawler_stage_duration_seconds",
+        "Time spent in pipeline stages, per run for collection stages "
+        "and per chunk for processing stages.",
+        ["stage"],
+        STAGE_BUCKETS,
+    )
+)
+ITEMS_PROCESSED = REGISTRY.register(
+    Counter(
+        "crawler_items_processed_total",
+        "Texts processed by each processing step.",
+        ["step"],
+    )
+)
+STEP_DURATION = REGISTRY.register(
+    Histogram(
+        "crawler_step_duration_seconds",
+        "Duration of each processing step per batch of texts.",
+        ["step"],
+    )
+)
+ITEMS_PER_SECOND = REGISTRY.register(
+    Gauge(
+        "crawler_items_per_second",
+        "Throughput of the last batch of each processing step.",
+        ["step"],
+    )
+)
+VK_REQUESTS = REGISTRY.register(
+    Counter(
+        "crawler_vk_requests_total",
+        "VK API requests by method and outcome.",
+        ["method", "outcome"],
+    )
+)
+VK_REQUEST_DURATION = REGISTRY.register(
+    Histogram(
+        "crawler_vk_request_duration_seconds",
+        "Latency of VK API requests.",
+        ["method"],
+    )
+)
+VK_RATE_LIMIT_WAIT = REGISTRY.register(
+    Histogram(
+        "crawler_vk_rate_limit_wait_seconds",
+        "Time VK API requests waited for the shared rate limit.",
+    )
+)
+DB_ROWS_WRITTEN = REGISTRY.register(
+    Counter(
+        "crawler_db_rows_written_total",
+        "Rows written to the database by table.",
+        ["table"],
+    )
+)
+DB_WRITE_DURATION = REGISTRY.register(
+    Histogram(
+        "crawler_db_write_duration_seconds",
+        "Duration of batched writes to the database by table.",
+        ["table"],
+    )
+)
+DB_ROWS_PER_SECOND = REGISTRY.register(
+    Gauge(
+        "crawler_db_rows_per_second",
+        "Throughput of the last batched write by table.",
+        ["table"],
+    )
+)
+CACHE_LOOKUPS = REGISTRY.register(
+    Counter(
+        "crawler_cache_lookups_total",
+        "Cache lookups by cache and result, hit or miss.",
+        ["cache", "result"],
+    )
+)
+CACHE_HIT_RATIO = REGISTRY.register(
+    Gauge(
+        "crawler_cache_hit_ratio",
+        "Share of cache lookups that were hits since the process started.",
+        ["cache"],
+    )
+)
+PROCESS_RSS = REGISTRY.register(
+    Gauge(
+        "process_resident_memory_bytes",
+        "Resident memory size of the process in bytes.",
+    )
+)
+PROCESS_RSS.set_function(get_rss_bytes)
+
+
+def record_throughput(step: str, items: int, seconds: float) -> None:
+    """
+    Record a batch of texts processed by a processing step.
+
+    Args:
+        step: Name of the step, e.g. tokenization
+        items: Number of texts in the batch
+        seconds: Duration of the batch
+    """
+    if items == 0:
+        return
+    ITEMS_PROCESSED.inc(items, step=step)
+    STEP_DURATION.observe(seconds, step=step)
+    if seconds > 0:
+        ITEMS_PER_SECOND.set(items / seconds, step=step)
+
+
+def record_db_write(table: str, rows: int, seconds: float) -> None:
+    """
+    Record a batched write to the database.
+
+    Args:
+        table: Name of the table
+        rows: Rows written
+        seconds: Duration of the write
+    """
+    DB_ROWS_WRITTEN.inc(rows, table=table)
+    DB_WRITE_DURATION.observe(seconds, table=table)
+    if seconds > 0 and rows > 0:
+        DB_ROWS_PER_SECOND.set(rows / seconds, table=table)
+
+
+def record_cache_lookups(cache: str, hits: int, misses: int) -> None:
+    """
+    Record lookups of a cache.
+
+    Args:
+        cache: Name of the cache
+        hits: Lookups served from the cache
+        misses: Lookups not found in the cache
+    """
+    CACHE_LOOKUPS.inc(hits, cache=cache, result="hit")
+    CACHE_LOOKUPS.inc(misses, cache=cache, result="miss")
+    CACHE_HIT_RATIO.set_function(
+        lambda: _hit_ratio(cache),
+        cache=cache,
+    )
+
+
+def _hit_ratio(cache: str) -> float:
+    hits = CACHE_LOOKUPS.get(cache=cache, result="hit")
+    total = hits + CACHE_LOOKUPS.get(cache=cache, result="miss")
+    return hits / total if total else 0.0
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Scrapes are frequent, don't log each of them
+        pass
+
+
+def start_metrics_server(port: int) -> ThreadingHTTPServer:
+    """
+    Serve /metrics on a port for processes without the API, e.g. workers.
+
+    Args:
+        port: Port to listen on
+
+    Returns:
+        Running server, shut down with its shutdown method
+    """
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(
+        target=server.serve_forever, name="metrics", daemon=True
+    ).start()
+    log.info(f"Metrics served on port {port}")
+    return server
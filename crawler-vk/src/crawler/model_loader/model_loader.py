@@ -1,3 +1,4 @@
+import logging
 import os
 import pickle
 from pathlib import Path
@@ -8,6 +9,8 @@ import wget
 from gensim.models.fasttext import FastTextKeyedVectors
 from sklearn.svm import SVC
 
+log = logging.getLogger(__name__)
+
 
 class ModelLoader:
     def __init__(self, vectorizer_model_path, classifier_model_path):
@@ -30,10 +33,21 @@ class ModelLoader:
         os.remove(zip_file)
         return str(model_path)
 
-    def load_vectorizer_model(self, model_path: str) -> FastTextKeyedVectors:
-        return FastTextKeyedVectors.load(
-            os.path.join(model_path, "model.model")
-        )
+    def load_vectorizer_model(
+        self, model_path: str, mmap: bool = False
+    ) -> FastTextKeyedVectors:
+        model_file = os.path.join(model_path, "model.model")
+        if not mmap:
+            return FastTextKeyedVectors.load(model_file)
+
+        # Only arrays saved separately as .npy files can be memory-mapped,
+        # arrays pickled inline are still copied onto the heap
+        if not any(Path(model_path).glob("model.model.*.npy")):
+            log.warning(
+                f"No separately saved arrays found for {model_file}, "
+                "vectorizer will be loaded without memory mapping"
+            )
+        return FastTextKeyedVectors.load(model_file, mmap="r")
 
     def fetch_classifier_model(self, url: str) -> str:
         model_path = self.classifier_model_path
@@ -0,0 +1,3 @@
+from .model_registry import ModelRegistry
+
+__all__ = ["ModelRegistry"]
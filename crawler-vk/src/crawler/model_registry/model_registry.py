@@ -0,0 +1,331 @@
+import contextlib
+import hashlib
+import json
+import logging
+import pickle
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Tuple,
+    TypedDict,
+)
+
+from gensim.models.fasttext import FastTextKeyedVectors
+from sklearn.svm import SVC
+
+from src.config import settings
+from src.crawler.memory.memory import format_bytes, get_rss_bytes
+from src.crawler.model_loader.model_loader import ModelLoader
+from src.crawler.preprocessing.text_processor import TextProcessor
+from src.crawler.preprocessing.tokenizer_pool import TokenizerPool
+
+log = logging.getLogger(__name__)
+
+ModelName = Literal[
+    "text_processor",  # natasha segmenter, embeddings and morph tagger
+    "tokenizer_pool",  # worker processes forked with the text processor
+    "vectorizer",  # FastText word vectors
+    "classifier",  # SVC classifier with its selected features
+]
+
+MODEL_NAMES: List[ModelName] = [
+    "text_processor",
+    "tokenizer_pool",
+    "vectorizer",
+    "classifier",
+]
+
+
+class ModelStats(TypedDict):
+    load_seconds: float  # time spent loading the model
+    rss_delta_bytes: int  # process RSS growth caused by loading
+    loaded_at: str  # ISO timestamp of the load
+
+
+class ModelRegistry:
+    """
+    Process-wide registry keeping models resident between pipeline runs.
+
+    Models are loaded lazily on first access and then reused by every run
+    until they are invalidated or reloaded.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        # Serializes forking of tokenizer pools, done without the lock
+        self._pool_lock = threading.Lock()
+        # Incremented by every invalidation
+        self._generation = 0
+        self._models: Dict[ModelName, Any] = {}
+        self._stats: Dict[ModelName, ModelStats] = {}
+        self._model_version: str | None = None
+        self._feature_version: str | None = None
+        self._loader = ModelLoader(
+            vectorizer_model_path=settings.vectorizer_model_path,
+            classifier_model_path=settings.classifier_model_path,
+        )
+        self._load_functions: Dict[ModelName, Callable[[], Any]] = {
+            "text_processor": self._load_text_processor,
+            "tokenizer_pool": self._load_tokenizer_pool,
+            "vectorizer": self._load_vectorizer,
+            "classifier": self._load_classifier,
+        }
+
+    def get_text_processor(self) -> TextProcessor:
+        """Get text processor with loaded natasha models."""
+        return self._get("text_processor")
+
+    def get_tokenizer_pool(self) -> TokenizerPool:
+        """Get tokenizer pool forked after the text processor is loaded."""
+        while True:
+            # Load the text processor first so it is not counted as pool load
+            self.get_text_processor()
+            with self._pool_lock:
+                with self._lock:
+                    pool = self._models.get("tokenizer_pool")
+                    generation = self._generation
+                if pool is not None:
+                    return pool
+                # Workers are forked without holding the registry lock, so
+                # other threads keep using the registry meanwhile
+                pool, stats = self._load("tokenizer_pool")
+                with self._lock:
+                    if self._generation == generation:
+                        self._models["tokenizer_pool"] = pool
+                        self._stats["tokenizer_pool"] = stats
+                        return pool
+            # Models were invalidated while forking, the workers may hold
+            # an outdated text processor
+            pool.retire()
+
+    @contextlib.contextmanager
+    def use_tokenizer_pool(self) -> Iterator[TokenizerPool]:
+        """
+        Use the tokenizer pool. A pool invalidated meanwhile keeps its
+        workers until it is released.
+        """
+        pool = self.get_tokenizer_pool()
+        while not pool.acquire():
+            pool = self.get_tokenizer_pool()
+        try:
+            yield pool
+        finally:
+            pool.release()
+
+    def get_vectorizer(self) -> FastTextKeyedVectors:
+        """Get FastText vectorizer model."""
+        return self._get("vectorizer")
+
+    def get_classifier(self) -> SVC:
+        """Get depression classifier model."""
+        return self._get("classifier")[0]
+
+    def get_selected_features(self) -> List[str]:
+        """Get feature names the classifier was trained on."""
+        return self._get("classifier")[1]
+
+    def load_classifier(self) -> Tuple[SVC, List[str], str]:
+        """
+        Load the classifier from its files apart from the resident models.
+        The resident classifier and the version runs and cached predictions
+        use are left as they are.
+
+        Returns:
+            Classifier, its selected features and the version of models
+            predictions made with it get
+        """
+        classifier_path = Path(
+            self._loader.fetch_classifier_model(
+                settings.classifier_model_gdrive_id
+            )
+        )
+        # The version is computed from the very bytes that are loaded
+        model_bytes = (classifier_path / "model.pkl").read_bytes()
+        features_bytes = (
+            classifier_path / "selected_features.json"
+        ).read_bytes()
+        return (
+            pickle.loads(model_bytes),
+            json.loads(features_bytes),
+            self._hash_model_version(model_bytes, features_bytes),
+        )
+
+    def get_model_version(self) -> str:
+        """
+        Get version of the models and resources predictions depend on.
+        Changes whenever a model file, the selected features, the depression
+        dictionary or the text processing changes.
+        """
+        with self._lock:
+            if self._model_version is None:
+                self._model_version = self._compute_model_version()
+            return self._model_version
+
+    def get_feature_version(self) -> str:
+        """
+        Get version of the models and resources features depend on.
+        Changes whenever the vectorizer, the depression dictionary or the
+        text processing changes, but not with the classifier.
+        """
+        with self._lock:
+            if self._feature_version is None:
+                self._feature_version = self._compute_feature_version()
+            return self._feature_version
+
+    def invalidate(self, name: ModelName | None = None) -> None:
+        """
+        Drop loaded models so they are loaded again on next access.
+        Runs in progress keep using the models they already hold.
+
+        Args:
+            name: Model to invalidate, all models if None
+        """
+        with self._lock:
+            names = MODEL_NAMES if name is None else [name]
+            self._generation += 1
+            self._model_version = None
+            self._feature_version = None
+            # Workers hold a copy of the text processor they were forked with
+            if "text_processor" in names and "tokenizer_pool" not in names:
+                names = [*names, "tokenizer_pool"]
+            for model_name in names:
+                model = self._models.pop(model_name, None)
+                self._stats.pop(model_name, None)
+                # Workers are stopped once runs using them are done
+                if isinstance(model, TokenizerPool):
+                    model.retire()
+            log.info(f"Invalidated models: {', '.join(names)}")
+
+    def reload(self, name: ModelName | None = None) -> Dict[str, ModelStats]:
+        """
+        Invalidate and load models again.
+
+        Args:
+            name: Model to reload, all models if None
+
+        Returns:
+            Load statistics of the registry
+        """
+        names = MODEL_NAMES if name is None else [name]
+        with self._lock:
+            self.invalidate(name)
+            for model_name in names:
+                if model_name != "tokenizer_pool":
+                    self._get(model_name)
+        if "tokenizer_pool" in names and settings.tokenization_workers > 1:
+            self.get_tokenizer_pool()
+        return self.get_stats()
+
+    def get_stats(self) -> Dict[str, ModelStats]:
+        """Get load time and resident size of loaded models."""
+        with self._lock:
+            return {name: stats.copy() for name, stats in self._stats.items()}
+
+    def _get(self, name: ModelName) -> Any:
+        with self._lock:
+            if name not in self._models:
+                self._models[name], self._stats[name] = self._load(name)
+            return self._models[name]
+
+    def _load(self, name: ModelName) -> Tuple[Any, ModelStats]:
+        rss_before = get_rss_bytes()
+        start = time.perf_counter()
+        model = self._load_functions[name]()
+        load_seconds = time.perf_counter() - start
+        rss_delta = get_rss_bytes() - rss_before
+        log.info(
+            f"Loaded {name} model in {load_seconds:.2f}s, "
+            f"resident size {format_bytes(rss_delta)}"
+        )
+        stats: ModelStats = {
+            "load_seconds": round(load_seconds, 3),
+            "rss_delta_bytes": rss_delta,
+            "loaded_at": datetime.now(timezone.utc).isoformat(),
+        }
+        return model, stats
+
+    def _compute_model_version(self) -> str:
+        classifier_path = Path(
+            self._loader.fetch_classifier_model(
+                settings.classifier_model_gdrive_id
+            )
+        )
+        return self._hash_model_version(
+            (classifier_path / "model.pkl").read_bytes(),
+            (classifier_path / "selected_features.json").read_bytes(),
+        )
+
+    def _hash_model_version(
+        self, model_bytes: bytes, features_bytes: bytes
+    ) -> str:
+        vectorizer_path = Path(
+            self._loader.fetch_vectorizer_model(settings.vectorizer_model_url)
+        )
+
+        digest = hashlib.sha256()
+        digest.update(TextProcessor.get_version().encode("utf-8"))
+        digest.update(settings.bow_count_feature.encode("utf-8"))
+        for data in [
+            model_bytes,
+            features_bytes,
+            settings.depression_dictionary_path.read_bytes(),
+        ]:
+            digest.update(data)
+        self._update_vectorizer_digest(digest, vectorizer_path)
+        return digest.hexdigest()[:16]
+
+    def _compute_feature_version(self) -> str:
+        vectorizer_path = Path(
+            self._loader.fetch_vectorizer_model(settings.vectorizer_model_url)
+        )
+
+        digest = hashlib.sha256()
+        digest.update(TextProcessor.get_version().encode("utf-8"))
+        digest.update(settings.depression_dictionary_path.read_bytes())
+        self._update_vectorizer_digest(digest, vectorizer_path)
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def _update_vectorizer_digest(digest: Any, vectorizer_path: Path) -> None:
+        # Vectorizer files are too large to hash, use names and sizes
+        for path in sorted(vectorizer_path.iterdir()):
+            if path.is_file():
+                digest.update(f"{path.name}:{path.stat().st_size}".encode())
+
+    def _load_text_processor(self) -> TextProcessor:
+        return TextProcessor()
+
+    def _load_tokenizer_pool(self) -> TokenizerPool:
+        return TokenizerPool(
+            self.get_text_processor(),
+            workers=settings.tokenization_workers,
+            chunk_chars=settings.tokenization_chunk_chars,
+        )
+
+    def _load_vectorizer(self) -> FastTextKeyedVectors:
+        model_path = self._loader.fetch_vectorizer_model(
+            settings.vectorizer_model_url
+        )
+        return self._loader.load_vectorizer_model(
+            model_path, mmap=settings.vectorizer_mmap
+        )
+
+    def _load_classifier(self) -> tuple[SVC, List[str]]:
+        model_path = self._loader.fetch_classifier_model(
+            settings.classifier_model_gdrive_id
+        )
+        model = self._loader.load_classifier_model(model_path)
+        with open(
+            settings.classifier_model_path.joinpath("selected_features.json"),
+            "r",
+        ) as f:
+            selected_features = json.load(f)
+        return model, selected_features
@@ -1,49 +1,53 @@
-import json
 import logging
+import time
+from typing import List, Tuple
 
 import numpy as np
 import pandas as pd
+from sklearn.svm import SVC
 
-from src.config import settings
-from src.crawler.model_loader.model_loader import ModelLoader
+from src.crawler.metrics.metrics import record_throughput
+from src.crawler.model_registry.model_registry import ModelRegistry
 
 log = logging.getLogger(__name__)
 
 
-def predict_depression(data: pd.DataFrame) -> None:
+def predict_depression(
+    data: pd.DataFrame,
+    embeddings: np.ndarray,
+    models: ModelRegistry,
+    classifier: Tuple[SVC, List[str]] | None = None,
+) -> None:
     """Predict depression for posts and comments.
     Modifies input DataFrame by adding depression predictions.
 
     Args:
-        data: DataFrame with embeddings and features to predict on
+        data: DataFrame with features to predict on
+        embeddings: Mean embeddings aligned with data rows
+        models: Registry with resident models
+        classifier: Classifier and its selected features to use instead of
+            the resident ones
     """
     try:
-        # Initialize model
-        model_loader = ModelLoader(
-            vectorizer_model_path=settings.vectorizer_model_path,
-            classifier_model_path=settings.classifier_model_path,
-        )
-        model_path = model_loader.fetch_classifier_model(
-            settings.classifier_model_gdrive_id
-        )
-        model = model_loader.load_classifier_model(model_path)
+        if data.empty:
+            data["depression_prediction"] = pd.Series(dtype=bool)
+            return
 
-        # Prepare features list
-        with open(
-            settings.classifier_model_path.joinpath("selected_features.json"),
-            "r",
-        ) as f:
-            selected_features = json.load(f)
+        # Get resident model and features list
+        if classifier is None:
+            classifier = models.get_classifier(), models.get_selected_features()
+        model, selected_features = classifier
 
-        # Prepare embeddings and features
-        embeddings = np.array(data["embeddings"].to_list())
+        # Prepare features
         features = data[selected_features].to_numpy()
 
         # Combine embeddings and features
         combined = np.hstack((embeddings, features))
 
         # Use model
+        start = time.perf_counter()
         predictions = model.predict(combined)
+        record_throughput("prediction", len(data), time.perf_counter() - start)
 
         # Add predictions to original data
         data["depression_prediction"] = predictions
@@ -53,3 +57,31 @@ def predict_depression(data: pd.DataFrame) -> None:
             exc_info=e,
         )
         raise
+
+
+def apply_predictions(
+    publications: pd.DataFrame, data: pd.DataFrame
+) -> pd.DataFrame:
+    """Set predictions of distinct texts to all publications with the text.
+
+    Args:
+        publications: DataFrame with text_hash and depression_prediction
+            columns, the prediction is missing for texts predicted in data
+        data: DataFrame with text_hash and depression_prediction columns
+
+    Returns:
+        Publications with a prediction, publications whose text was
+        filtered out during preprocessing are dropped
+    """
+    predictions = pd.Series(
+        data["depression_prediction"].to_numpy(), index=data["text_hash"]
+    )
+    publications = publications.copy()
+    publications["depression_prediction"] = publications[
+        "depression_prediction"
+    ].fillna(publications["text_hash"].map(predictions))
+    publications = publications[publications["depression_prediction"].notna()]
+    publications["depression_prediction"] = publications[
+        "depression_prediction"
+    ].astype(bool)
+    return publications
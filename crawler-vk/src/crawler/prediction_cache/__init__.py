@@ -0,0 +1,3 @@
+from .prediction_cache import PredictionCache, text_hash
+
+__all__ = ["PredictionCache", "text_hash"]
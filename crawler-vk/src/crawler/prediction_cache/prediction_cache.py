@@ -0,0 +1,73 @@
+import hashlib
+import logging
+from typing import Dict, Iterable, Sequence, Tuple
+
+from psycopg2._psycopg import connection
+
+from src.crawler.metrics.metrics import record_cache_lookups
+from src.db.db import get_cached_predictions, save_cached_predictions
+from src.db.pool import ConnectionPool
+
+log = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    """Get hash identifying a cleaned text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PredictionCache:
+    """
+    Cache of predictions shared by all runs, stored in PostgreSQL.
+
+    Maps a hash of the cleaned text to its prediction made by a version of
+    the models, so identical texts are classified once per model version.
+    """
+
+    def __init__(self, db_pool: ConnectionPool, model_version: str) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            db_pool: Pool of database connections for lookups
+            model_version: Version of the models making the predictions
+        """
+        self.db_pool = db_pool
+        self.model_version = model_version
+
+    def get_many(self, text_hashes: Sequence[str]) -> Dict[str, bool]:
+        """
+        Get cached predictions of texts.
+
+        Args:
+            text_hashes: Hashes of cleaned texts
+
+        Returns:
+            Prediction by text hash, texts not in cache are missing
+        """
+        unique_hashes = list(dict.fromkeys(text_hashes))
+        if not unique_hashes:
+            return {}
+        with self.db_pool.connection() as conn:
+            cached = get_cached_predictions(
+                conn, self.model_version, unique_hashes
+            )
+        record_cache_lookups(
+            "predictions",
+            hits=len(cached),
+            misses=len(unique_hashes) - len(cached),
+        )
+        return cached
+
+    def put_many(
+        self, conn: connection, predictions: Iterable[Tuple[str, bool]]
+    ) -> None:
+        """
+        Add predictions of texts to the cache.
+        Does not commit, the caller owns the transaction.
+
+        Args:
+            conn: Database connection
+            predictions: Tuples of text hash and prediction
+        """
+        save_cached_predictions(conn, self.model_version, predictions)
@@ -1,192 +1,398 @@
-import json
 import logging
-from typing import List
+import time
+from typing import Iterable, Iterator, List, Tuple
 
 import numpy as np
 import pandas as pd
-from gensim.models.fasttext import FastTextKeyedVectors
 
 from src.config import settings
-from src.crawler.model_loader.model_loader import ModelLoader
+from src.crawler.columnar_store.columnar_store import ColumnarStore
+from src.crawler.feature_store.feature_store import FeatureStore
+from src.crawler.json_stream.json_stream import read_comments, read_posts
+from src.crawler.metrics.metrics import STAGE_DURATION, record_throughput
+from src.crawler.model_registry.model_registry import ModelRegistry
+from src.crawler.prediction_cache.prediction_cache import (
+    PredictionCache,
+    text_hash,
+)
 from src.crawler.preprocessing.feature_extractor import (
     DepressionFeatureExtractor,
 )
-from src.crawler.preprocessing.text_processor import TextProcessor
+from src.crawler.preprocessing.mean_embedder import MeanEmbedder
+from src.crawler.status_manager.status_manager import CrawlerStatusManager
+from src.crawler.token_cache.token_cache import TokenCache
 
 log = logging.getLogger(__name__)
 
 
-def load_comments_with_replies(files):
+def run_tokenizer(texts: List[str], models: ModelRegistry) -> List[List[str]]:
+    """Tokenize texts in the tokenizer pool or in the current process.
+
+    Args:
+        texts: Cleaned texts
+        models: Registry with resident models
+
+    Returns:
+        Lemma lists aligned with texts
     """
-    Load flattened comments with replies from JSON files.
+    start = time.perf_counter()
+    if settings.tokenization_workers > 1:
+        with models.use_tokenizer_pool() as pool:
+            tokens = pool.tokenize(texts)
+    else:
+        text_processor = models.get_text_processor()
+        tokens = [text_processor.tokenize_text(text) for text in texts]
+    record_throughput("tokenization", len(texts), time.perf_counter() - start)
+    return tokens
+
+
+def tokenize_texts(
+    texts: List[str],
+    models: ModelRegistry,
+    token_cache: TokenCache | None,
+    status_manager: CrawlerStatusManager,
+) -> List[List[str]]:
+    """Tokenize texts, reusing lemmas of texts seen in previous runs.
 
     Args:
-        files: List of paths to JSON files containing comments
+        texts: Cleaned texts
+        models: Registry with resident models
+        token_cache: Persistent tokenization cache, None to disable caching
+        status_manager: Status manager for reporting cache hits and misses
 
     Returns:
-        DataFrame with flattened comments and replies
+        Lemma lists aligned with texts
     """
-    all_comments = []
-
-    for path in files:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        for comments in data.values():
-            for comment in comments:
-                comment["is_reply"] = 0
-                all_comments.append(comment)
-                thread = comment.get("thread", {})
-                replies = thread.get("items", [])
-                for reply in replies:
-                    reply["is_reply"] = 1
-                    all_comments.append(reply)
-
-    return pd.DataFrame(
-        all_comments, columns=["owner_id", "post_id", "id", "text"]
+    if token_cache is None:
+        return run_tokenizer(texts, models)
+
+    tokens = token_cache.get_many(texts)
+    misses = [i for i, lemmas in enumerate(tokens) if lemmas is None]
+    status_manager.add_cache_stats(
+        "tokens", hits=len(texts) - len(misses), misses=len(misses)
     )
 
+    # Tokenize each missing text once, even if it is reposted in the batch
+    missing_texts = list(dict.fromkeys(texts[i] for i in misses))
+    missing_tokens = run_tokenizer(missing_texts, models)
+    token_cache.put_many(missing_texts, missing_tokens)
+
+    tokenized = dict(zip(missing_texts, missing_tokens))
+    return [
+        lemmas if lemmas is not None else tokenized[text]
+        for text, lemmas in zip(texts, tokens)
+    ]
+
 
-def get_embeddings(
-    model: FastTextKeyedVectors, lemmas: list[str]
-) -> list[np.ndarray]:
-    """Get embeddings for a list of lemmas.
+def get_features(
+    data: pd.DataFrame,
+    models: ModelRegistry,
+    feature_extractor: DepressionFeatureExtractor,
+    status_manager: CrawlerStatusManager,
+    token_cache: TokenCache | None = None,
+    feature_store: FeatureStore | None = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Get mean embeddings and dictionary features of distinct texts.
+
+    Features of texts seen in previous runs are read from the feature
+    store, the rest are tokenized, embedded and stored.
 
     Args:
-        model: FastText model
-        lemmas: List of lemmas
+        data: DataFrame with text and text_hash columns, one row per text
+        models: Registry with resident models
+        feature_extractor: Extractor of dictionary features
+        status_manager: Status manager for reporting cache hits and misses
+        token_cache: Persistent tokenization cache, None to disable caching
+        feature_store: Store of features by text, None to disable it
 
     Returns:
-        List of embeddings
+        Float32 array with the mean embedding followed by the dictionary
+        features of each text that has them, and a boolean mask of those
+        texts in data
     """
-    embeddings = []
-    for lemma in lemmas:
-        try:
-            embeddings.append(model[lemma])
-        except KeyError:
-            # Skip words that are not in the model's vocabulary
-            continue
-    return embeddings
+    found = np.zeros(len(data), dtype=bool)
+    stored = np.empty((0, 0), dtype=np.float32)
+    if feature_store is not None:
+        version = models.get_feature_version()
+        found, stored = feature_store.get_many(
+            version, data["text_hash"].tolist()
+        )
+        hits = int(found.sum())
+        status_manager.add_cache_stats(
+            "features", hits=hits, misses=len(data) - hits
+        )
 
+    missing = data[~found]
+    computed = np.empty((0, 0), dtype=np.float32)
+    computed_mask = np.zeros(len(missing), dtype=bool)
+    if not missing.empty:
+        tokens = tokenize_texts(
+            missing["text"].tolist(),
+            models,
+            token_cache,
+            status_manager,
+        )
+        # Texts without tokens have no features
+        has_tokens = np.array([len(lemmas) > 0 for lemmas in tokens])
+        documents = [lemmas for lemmas in tokens if lemmas]
+        if documents:
+            # Calculate mean embeddings for the whole batch at once
+            embedder = MeanEmbedder(models.get_vectorizer())
+            start = time.perf_counter()
+            embeddings, embedded = embedder.transform(documents)
+            record_throughput(
+                "embedding", len(documents), time.perf_counter() - start
+            )
 
-def preprocess_data(
+            # Texts with an empty embedding are dropped as well
+            dictionary = feature_extractor.extract_features(
+                [lemmas for lemmas, e in zip(documents, embedded) if e]
+            )
+            computed = np.hstack((embeddings, dictionary))
+            computed_mask[np.flatnonzero(has_tokens)[embedded]] = True
+            if feature_store is not None:
+                feature_store.put_many(
+                    version,
+                    missing["text_hash"][computed_mask].tolist(),
+                    computed,
+                )
+
+    mask = found.copy()
+    mask[np.flatnonzero(~found)[computed_mask]] = True
+    if not mask.any():
+        return np.empty((0, 0), dtype=np.float32), mask
+
+    # Stored and computed rows are merged in the order of data
+    from_store = found[mask]
+    width = (stored if from_store.any() else computed).shape[1]
+    features = np.empty((len(from_store), width), dtype=np.float32)
+    if from_store.any():
+        features[from_store] = stored
+    if not from_store.all():
+        features[~from_store] = computed
+    return features, mask
+
+
+def load_publications(
     posts_files: List[str], comments_files: List[str]
-) -> pd.DataFrame:
-    """Preprocess posts and comments data.
+) -> Iterator[pd.DataFrame]:
+    """Load posts and comments with a long enough text file by file.
 
     Args:
         posts_files: List of paths to posts JSON files
         comments_files: List of paths to comments JSON files
 
-    Returns:
-        DataFrame with preprocessed data
+    Yields:
+        DataFrames with owner_id, post_id, id and text columns
     """
-    try:
-        # Check if there is no posts
-        if len(posts_files) == 0:
-            log.info("No posts downloaded, skipping further processing.")
-            return None
-
-        # Load and merge data
-        posts = pd.concat([pd.read_json(path) for path in posts_files])
-        comments = load_comments_with_replies(comments_files)
-
-        publications = pd.concat(
-            [
-                posts[["owner_id", "id", "text"]],
-                comments[["owner_id", "post_id", "id", "text"]],
-            ],
-            ignore_index=True,
-            join="outer",
-        )
-        posts = None
-        comments = None
+    # Files are parsed incrementally and publications with a short text
+    # are dropped while parsing
+    for path in posts_files:
+        yield read_posts(path, settings.min_text_length)
+    for path in comments_files:
+        yield read_comments(path, settings.min_text_length)
 
-        # Cast types
-        publications["post_id"] = publications["post_id"].fillna(0.0)
-        publications["post_id"] = publications["post_id"].astype(np.int64)
 
-        publications = publications[~publications["owner_id"].isna()]
-        publications["owner_id"] = publications["owner_id"].astype(np.int64)
+def rechunk(
+    frames: Iterable[pd.DataFrame], chunk_size: int | None = None
+) -> Iterator[pd.DataFrame]:
+    """Regroup publications into chunks of a fixed size.
 
-        publications = publications[~publications["id"].isna()]
-        publications["id"] = publications["id"].astype(np.int64)
+    Args:
+        frames: DataFrames of publications
+        chunk_size: Publications per chunk, None to yield a single chunk
 
-        # Filter by text length
-        publications["text"] = publications["text"].fillna("")
-        publications = publications[
-            publications["text"].apply(
-                lambda x: len(x) > settings.min_text_length
-            )
-        ]
+    Yields:
+        DataFrames with chunk_size rows, the last one may be smaller
+    """
+    buffer: List[pd.DataFrame] = []
+    buffered = 0
+    for publications in frames:
+        buffer.append(publications)
+        buffered += len(publications)
+        while chunk_size and buffered >= chunk_size:
+            data = pd.concat(buffer, ignore_index=True)
+            yield data.iloc[:chunk_size]
+            buffer = [data.iloc[chunk_size:]]
+            buffered -= chunk_size
+
+    if buffered > 0:
+        yield pd.concat(buffer, ignore_index=True)
+
+
+def iter_publications(
+    posts_files: List[str],
+    comments_files: List[str],
+    chunk_size: int | None = None,
+    store: ColumnarStore | None = None,
+) -> Iterator[pd.DataFrame]:
+    """Load posts and comments file by file and yield them in chunks.
 
-        if publications.empty:
-            log.info(
-                (
-                    "No publications after preprocessing, "
-                    "skipping further processing."
-                )
-            )
-            return None
+    Args:
+        posts_files: List of paths to posts JSON files
+        comments_files: List of paths to comments JSON files
+        chunk_size: Publications per chunk, None to yield a single chunk
+        store: Columnar store publications are written to as they are
+            parsed, None to not store them
 
-        # Initialize processors
-        text_processor = TextProcessor()
-        feature_extractor = DepressionFeatureExtractor(
-            str(settings.depression_dictionary_path)
-        )
-        model_loader = ModelLoader(
-            vectorizer_model_path=settings.vectorizer_model_path,
-            classifier_model_path=settings.classifier_model_path,
+    Yields:
+        DataFrames with owner_id, post_id, id and text columns
+    """
+    frames = load_publications(posts_files, comments_files)
+    if store is not None:
+        frames = store.write_through(frames)
+    return rechunk(frames, chunk_size)
+
+
+def preprocess_publications(
+    publications: pd.DataFrame,
+    models: ModelRegistry,
+    status_manager: CrawlerStatusManager,
+    token_cache: TokenCache | None = None,
+    prediction_cache: PredictionCache | None = None,
+    feature_store: FeatureStore | None = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame, np.ndarray] | None:
+    """Clean, tokenize, extract features and embed a batch of publications.
+
+    Publications are deduplicated by the hash of their cleaned text before
+    the expensive stages. Texts with a cached prediction and repeated texts
+    are not processed again, texts with stored features are not tokenized
+    and embedded again.
+
+    Args:
+        publications: DataFrame with owner_id, post_id, id and text columns
+        models: Registry with resident models
+        status_manager: Status manager for tracking progress and state
+        token_cache: Persistent tokenization cache, None to disable caching
+        prediction_cache: Cache of predictions by text, None to disable it
+        feature_store: Store of features by text, None to disable it
+
+    Returns:
+        DataFrame of all publications with owner_id, post_id, id,
+        text_hash and depression_prediction columns, the prediction is
+        missing for texts still to predict. DataFrame with preprocessed
+        distinct texts to predict and a 2D array of mean embeddings aligned
+        with its rows. None if nothing is left to process.
+    """
+    # Initialize processors
+    text_processor = models.get_text_processor()
+    feature_extractor = DepressionFeatureExtractor(
+        str(settings.depression_dictionary_path)
+    )
+
+    # Process text
+    publications = publications.copy()
+    publications["text"] = text_processor.clean_texts(publications["text"])
+    publications["text_hash"] = publications["text"].map(text_hash)
+    if feature_store is not None:
+        # Features of publications can then be read by groups
+        feature_store.put_publications(
+            models.get_feature_version(), publications
         )
 
-        # Process text
-        publications["text"] = publications["text"].apply(
-            text_processor.clean_text
+    # Reuse predictions of texts seen before and process each text once
+    cached = {}
+    if prediction_cache is not None:
+        cached = prediction_cache.get_many(publications["text_hash"].tolist())
+        distinct = publications["text_hash"].nunique()
+        status_manager.add_cache_stats(
+            "predictions", hits=len(cached), misses=distinct - len(cached)
         )
-        publications["tokens"] = publications["text"].apply(
-            text_processor.tokenize_text
+    publications["depression_prediction"] = publications["text_hash"].map(
+        cached
+    )
+    data = publications[
+        publications["depression_prediction"].isna()
+    ].drop_duplicates("text_hash")
+    publications = publications.drop(columns="text")
+
+    data = data.drop(columns="depression_prediction")
+    embeddings = np.empty((0, 0), dtype=np.float32)
+    if not data.empty:
+        features, mask = get_features(
+            data,
+            models,
+            feature_extractor,
+            status_manager,
+            token_cache,
+            feature_store,
         )
-
-        # Filter empty tokens
-        publications = publications[publications["tokens"].apply(len) > 0]
-
-        # Extract features
-        publications[
-            [
-                feature_extractor.bow_vector_feature,
-                feature_extractor.bow_count_feature,
-            ]
-        ] = (
-            publications["tokens"]
-            .apply(feature_extractor.extract_depression_features)
-            .apply(pd.Series)
+        data = data[mask]
+
+    if not data.empty:
+        # Split features into embeddings and those used by the classifier
+        vector_size = models.get_vectorizer().vector_size
+        embeddings = np.ascontiguousarray(features[:, :vector_size])
+        selected = feature_extractor.select_features(
+            features[:, vector_size:], models.get_selected_features()
         )
+        selected.index = data.index
+        data = pd.concat([data, selected], axis=1)
 
-        # Prepare BOW features
-        publications = feature_extractor.prepare_bow_features(publications)
-        publications = publications.drop(
-            columns=[feature_extractor.bow_vector_feature], axis=1
-        )
+    if data.empty and not cached:
+        return None
 
-        # Load FastText model
-        model_path = model_loader.fetch_vectorizer_model(
-            settings.vectorizer_model_url
-        )
-        model = model_loader.load_vectorizer_model(model_path)
+    return publications, data, embeddings
 
-        # Extract word embeddings for each token
-        publications["embeddings"] = publications["tokens"].apply(
-            lambda x: get_embeddings(model, x)
-        )
 
-        # Calculate mean embeddings
-        publications["embeddings"] = publications["embeddings"].apply(
-            lambda x: np.mean(x, axis=0)
-        )
+def preprocess_data(
+    posts_files: List[str],
+    comments_files: List[str],
+    models: ModelRegistry,
+    status_manager: CrawlerStatusManager,
+    token_cache: TokenCache | None = None,
+    chunk_size: int | None = None,
+    prediction_cache: PredictionCache | None = None,
+    store: ColumnarStore | None = None,
+    feature_store: FeatureStore | None = None,
+) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame, np.ndarray]]:
+    """Preprocess posts and comments data in chunks.
+
+    Only one chunk of publications is held in memory at a time, so memory
+    is bounded by the chunk size rather than by the size of the crawl.
 
-        # Filter rows with empty embeddings
-        publications = publications[publications["embeddings"].apply(len) > 0]
+    Args:
+        posts_files: List of paths to posts JSON files
+        comments_files: List of paths to comments JSON files
+        models: Registry with resident models
+        status_manager: Status manager for tracking progress and state
+        token_cache: Persistent tokenization cache, None to disable caching
+        chunk_size: Publications per chunk, None to process all at once
+        prediction_cache: Cache of predictions by text, None to disable it
+        store: Columnar store publications are written to as they are
+            parsed, None to not store them
+        feature_store: Store of features by text, None to disable it
+
+    Yields:
+        DataFrame of all publications, DataFrame with preprocessed distinct
+        texts to predict and a 2D array of mean embeddings aligned with its
+        rows, chunks with nothing to process are skipped
+    """
+    try:
+        # Check if there is no posts
+        if len(posts_files) == 0:
+            log.info("No posts downloaded, skipping further processing.")
+            return
 
-        return publications
+        chunks = iter_publications(
+            posts_files, comments_files, chunk_size, store
+        )
+        while True:
+            # Loading a chunk from the collected files is timed with it
+            with STAGE_DURATION.time(stage="preprocessing"):
+                publications = next(chunks, None)
+                if publications is None:
+                    break
+                result = preprocess_publications(
+                    publications,
+                    models,
+                    status_manager,
+                    token_cache,
+                    prediction_cache,
+                    feature_store,
+                )
+            if result is not None:
+                yield result
     except Exception as e:
         log.exception(
             "Error preprocessing posts and comments data",
@@ -1,4 +1,11 @@
 from .feature_extractor import DepressionFeatureExtractor
+from .mean_embedder import MeanEmbedder
 from .text_processor import TextProcessor
+from .tokenizer_pool import TokenizerPool
 
-__all__ = ["TextProcessor", "DepressionFeatureExtractor"]
+__all__ = [
+    "TextProcessor",
+    "DepressionFeatureExtractor",
+    "MeanEmbedder",
+    "TokenizerPool",
+]
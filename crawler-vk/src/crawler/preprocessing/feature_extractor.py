@@ -1,49 +1,101 @@
 import json
-from collections import Counter
-from typing import List, Tuple
+from typing import Dict, List, Sequence
 
 import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix
 from sklearn.preprocessing import MinMaxScaler
 
 from src.config import settings
 
+BOW_FEATURE_PREFIX = "bow_"
+
 
 class DepressionFeatureExtractor:
     def __init__(self, dictionary_path: str):
         with open(dictionary_path, "r") as f:
             self.depression_dictionary = json.load(f)
-        self.bow_vector_feature = settings.bow_vector_feature
+        self.word_index: Dict[str, int] = {
+            word: i for i, word in enumerate(self.depression_dictionary)
+        }
         self.bow_count_feature = settings.bow_count_feature
 
-    def extract_depression_features(
-        self, tokenized_text: List[str]
-    ) -> Tuple[np.ndarray, int]:
-        word_counts = Counter(tokenized_text)
-        bow_vector = np.array(
-            [word_counts[word] for word in self.depression_dictionary]
-        )
-        total_count = int(np.sum(bow_vector))
-        return bow_vector, total_count
-
-    def prepare_bow_features(self, data: pd.DataFrame) -> pd.DataFrame:
-        bow_df = (
-            data[self.bow_vector_feature]
-            .apply(pd.Series)
-            .fillna(0)
-            .astype(float)
+    def extract_bow_matrix(self, documents: Sequence[List[str]]) -> csr_matrix:
+        """Count dictionary words of documents in one pass over the tokens.
+
+        Args:
+            documents: Lemma lists, one per document
+
+        Returns:
+            Sparse matrix of word counts, documents by dictionary words
+        """
+        indices: List[int] = []
+        indptr = [0]
+        for tokens in documents:
+            for token in tokens:
+                column = self.word_index.get(token)
+                if column is not None:
+                    indices.append(column)
+            indptr.append(len(indices))
+
+        bow = csr_matrix(
+            (np.ones(len(indices)), indices, indptr),
+            shape=(len(documents), len(self.word_index)),
         )
-        bow_df.columns = [f"bow_{col}" for col in bow_df.columns]
+        bow.sum_duplicates()
+        return bow
 
-        data = pd.concat([data, bow_df], axis=1)
-        data[self.bow_count_feature] = bow_df.sum(axis=1)
+    def extract_features(self, documents: Sequence[List[str]]) -> np.ndarray:
+        """Compute all dictionary features of documents in stored form.
 
-        row_sums = bow_df.sum(axis=1).replace(0, 1)
-        data[bow_df.columns] = bow_df.div(row_sums, axis=0)
+        Columns are the words of the dictionary normalized by the number of
+        dictionary words in the document, followed by that number. The count
+        is not scaled, as its scaling depends on the batch.
 
-        scaler = MinMaxScaler()
-        data[[self.bow_count_feature]] = scaler.fit_transform(
-            data[[self.bow_count_feature]]
+        Args:
+            documents: Lemma lists, one per document
+
+        Returns:
+            Float32 array, documents by dictionary words plus one
+        """
+        bow = self.extract_bow_matrix(documents)
+        counts = np.asarray(bow.sum(axis=1)).ravel()
+
+        # Only the words found are normalized and written, the word columns
+        # are never densified as a whole
+        rows = np.repeat(np.arange(len(documents)), np.diff(bow.indptr))
+        features = np.zeros(
+            (len(documents), len(self.word_index) + 1), dtype=np.float32
         )
+        features[rows, bow.indices] = bow.data / counts[rows]
+        features[:, -1] = counts
+        return features
+
+    def select_features(
+        self, features: np.ndarray, feature_names: List[str]
+    ) -> pd.DataFrame:
+        """Get features the classifier uses from dictionary features.
+
+        The count feature is min-max scaled over the given rows.
+
+        Args:
+            features: Dictionary features from extract_features
+            feature_names: Feature names, bow_<i> or the count feature
 
-        return data
+        Returns:
+            DataFrame with a column per feature name in the given order
+        """
+        selected = {}
+        for name in feature_names:
+            if name == self.bow_count_feature:
+                counts = features[:, -1].astype(np.float64)
+                selected[name] = (
+                    MinMaxScaler().fit_transform(counts.reshape(-1, 1)).ravel()
+                )
+            elif name.startswith(BOW_FEATURE_PREFIX):
+                selected[name] = features[
+                    :, int(name[len(BOW_FEATURE_PREFIX) :])
+                ]
+            else:
+                raise ValueError(f"Unknown dictionary feature: {name}")
+        return pd.DataFrame(selected, columns=feature_names)
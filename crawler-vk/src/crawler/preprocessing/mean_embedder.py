@@ -0,0 +1,81 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from gensim.models.fasttext import FastTextKeyedVectors
+from scipy.sparse import csr_matrix
+
+
+class MeanEmbedder:
+    """
+    Computes mean word embeddings for a whole batch of documents at once.
+
+    Unique lemmas of the batch are resolved into one float32 matrix, so every
+    out-of-vocabulary n-gram vector is computed once per batch. Document
+    means are then a single sparse doc-term by embedding matrix product.
+    """
+
+    def __init__(self, model: FastTextKeyedVectors):
+        self.model = model
+
+    def transform(
+        self, documents: Sequence[List[str]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Get mean embeddings for tokenized documents.
+
+        Args:
+            documents: Lemma lists, one per document
+
+        Returns:
+            Contiguous float32 array of mean embeddings for documents with at
+            least one resolved lemma, and a boolean mask of those documents
+        """
+        vocabulary: Dict[str, int] = {}
+        indices: List[int] = []
+        indptr = [0]
+        for lemmas in documents:
+            for lemma in lemmas:
+                indices.append(vocabulary.setdefault(lemma, len(vocabulary)))
+            indptr.append(len(indices))
+
+        doc_term = csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), indices, indptr),
+            shape=(len(documents), len(vocabulary)),
+        )
+        vectors, resolved = self._resolve(list(vocabulary))
+
+        # Words that cannot be resolved are skipped like in model[lemma]
+        counts = doc_term @ resolved.astype(np.float32)
+        mask = counts > 0
+        sums = doc_term[mask] @ vectors
+        embeddings = sums / counts[mask, np.newaxis]
+        return np.ascontiguousarray(embeddings, dtype=np.float32), mask
+
+    def _resolve(self, lemmas: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Resolve lemmas into an embedding matrix.
+
+        Args:
+            lemmas: Unique lemmas
+
+        Returns:
+            Matrix with a row per lemma and a mask of resolved lemmas
+        """
+        vectors = np.zeros(
+            (len(lemmas), self.model.vector_size), dtype=np.float32
+        )
+        resolved = np.ones(len(lemmas), dtype=bool)
+
+        # In-vocabulary words are gathered with a single fancy index
+        key_to_index = self.model.key_to_index
+        rows = np.array(
+            [key_to_index.get(lemma, -1) for lemma in lemmas], dtype=np.int64
+        )
+        in_vocab = rows >= 0
+        vectors[in_vocab] = self.model.vectors[rows[in_vocab]]
+
+        # Out-of-vocabulary words are composed from n-grams once each
+        for i in np.flatnonzero(~in_vocab):
+            try:
+                vectors[i] = self.model.get_vector(lemmas[i])
+            except KeyError:
+                resolved[i] = False
+        return vectors, resolved
@@ -1,50 +1,101 @@
+import hashlib
 import re
 import string
+from importlib.metadata import version
 from typing import List
 
 import nltk
+import pandas as pd
 from natasha import Doc, MorphVocab, NewsEmbedding, NewsMorphTagger, Segmenter
 from nltk.corpus import stopwords
 
 nltk.download("stopwords", quiet=True)
 
+VK_MENTION_PATTERN = re.compile(r"\[.*?\|(.*?)\]")
+URL_PATTERN = re.compile(r"http\S+|www\.\S+")
+# Runs of Tangut, Tangut Components and Tangut Supplement characters
+TANGUT_PATTERN = re.compile(
+    "[\U00017000-\U000187ff\U00018800-\U00018aff\U00018d00-\U00018d8f]+"
+)
+# Joins texts of a batch, none of the patterns can match across it
+BATCH_SEPARATOR = "\n\0\n"
+# Texts with this character could form the separator with their neighbours
+SEPARATOR_CHAR = "\0"
+
 
 class TextProcessor:
+    # Bump when tokenization logic changes to invalidate cached tokens
+    VERSION = 1
+
     def __init__(self):
         self.segmenter = Segmenter()
         self.morph_vocab = MorphVocab()
         self.emb = NewsEmbedding()
         self.morph_tagger = NewsMorphTagger(self.emb)
-        self.stop_words = stopwords.words("russian")
-        self.punctuation = list(string.punctuation + "«»—…")
+        self.stop_words = self.get_stop_words()
+        self.punctuation = self.get_punctuation()
 
-    def clean_text(self, text: str) -> str:
-        def replace_vk_mentions(text):
-            return re.sub(r"\[.*?\|(.*?)\]", "<NAME>", text)
-
-        def replace_url(text):
-            return re.sub(r"http\S+|www\.\S+", "<URL>", text)
-
-        def replace_tangut(text):
-            result = []
-            inside_tangut = False
-
-            for ch in text:
-                if self._is_tangut(ch):
-                    if not inside_tangut:
-                        result.append("<UNK>")
-                        inside_tangut = True
-                else:
-                    result.append(ch)
-                    inside_tangut = False
-            return "".join(result)
+    @staticmethod
+    def get_stop_words() -> List[str]:
+        return stopwords.words("russian")
+
+    @staticmethod
+    def get_punctuation() -> List[str]:
+        return list(string.punctuation + "«»—…")
 
+    @classmethod
+    def get_version(cls) -> str:
+        """Get version of tokenization output.
+
+        Changes with the processor logic, the natasha release used for
+        lemmatization and the stopword and punctuation lists.
+        """
+        fingerprint = "\n".join(
+            [
+                str(cls.VERSION),
+                version("natasha"),
+                *cls.get_stop_words(),
+                *cls.get_punctuation(),
+            ]
+        )
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+    def clean_text(self, text: str) -> str:
         text = text.lower()
-        text = replace_vk_mentions(text)
-        text = replace_url(text)
-        text = replace_tangut(text)
+        text = VK_MENTION_PATTERN.sub("<NAME>", text)
+        text = URL_PATTERN.sub("<URL>", text)
+        text = TANGUT_PATTERN.sub("<UNK>", text)
         return text
 
+    def clean_texts(
+        self, texts: pd.Series | List[str]
+    ) -> pd.Series | List[str]:
+        """Clean a batch of texts with one pass of each pattern.
+
+        Texts are joined with a separator that no pattern can match across,
+        cleaned as a single string and split back. Falls back to cleaning
+        texts one by one if a text contains the null character of the
+        separator, as the split could not be trusted then.
+
+        Args:
+            texts: Series or list of raw texts
+
+        Returns:
+            Cleaned texts of the same type, index and order as the input
+        """
+        values = texts.tolist() if isinstance(texts, pd.Series) else texts
+        if any(SEPARATOR_CHAR in text for text in values):
+            cleaned = [self.clean_text(text) for text in values]
+        elif values:
+            joined = BATCH_SEPARATOR.join(values)
+            cleaned = self.clean_text(joined).split(BATCH_SEPARATOR)
+        else:
+            cleaned = []
+
+        if isinstance(texts, pd.Series):
+            return pd.Series(cleaned, index=texts.index, dtype=object)
+        return cleaned
+
     def tokenize_text(self, text: str) -> List[str]:
         doc = Doc(text)
         doc.segment(self.segmenter)
@@ -60,11 +111,3 @@ class TextProcessor:
                 ) and token.lemma is not None:
                     lemmatized_tokens.append(token.lemma)
         return lemmatized_tokens
-
-    def _is_tangut(self, ch):
-        code_point = ord(ch)
-        return (
-            (0x17000 <= code_point <= 0x187FF)
-            or (0x18800 <= code_point <= 0x18AFF)
-            or (0x18D00 <= code_point <= 0x18D8F)
-        )
@@ -0,0 +1,122 @@
+import logging
+import multiprocessing
+import threading
+from typing import List, Sequence
+
+from src.crawler.preprocessing.text_processor import TextProcessor
+
+log = logging.getLogger(__name__)
+
+# Text processor of forked workers, set by _init_worker
+_worker_processor: TextProcessor
+
+
+def _init_worker(text_processor: TextProcessor) -> None:
+    global _worker_processor
+    _worker_processor = text_processor
+
+
+def _tokenize_chunk(texts: List[str]) -> List[List[str]]:
+    return [_worker_processor.tokenize_text(text) for text in texts]
+
+
+def chunk_by_chars(texts: Sequence[str], max_chars: int) -> List[List[str]]:
+    """Split texts into consecutive chunks of about max_chars characters.
+
+    Args:
+        texts: Texts to split
+        max_chars: Total number of characters after which a chunk is closed
+
+    Returns:
+        Chunks of texts in original order
+    """
+    chunks: List[List[str]] = []
+    chunk: List[str] = []
+    chunk_chars = 0
+    for text in texts:
+        chunk.append(text)
+        chunk_chars += len(text)
+        if chunk_chars >= max_chars:
+            chunks.append(chunk)
+            chunk = []
+            chunk_chars = 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class TokenizerPool:
+    """
+    Process pool running TextProcessor.tokenize_text on several cores.
+
+    Workers are forked once from a process that already holds the loaded
+    natasha models, so they share them copy-on-write instead of loading
+    their own copies. Runs acquire the pool while they use it, a retired
+    pool stops its workers once its last user has released it.
+    """
+
+    def __init__(
+        self, text_processor: TextProcessor, workers: int, chunk_chars: int
+    ):
+        self.workers = workers
+        self.chunk_chars = chunk_chars
+        self._lock = threading.Lock()
+        self._users = 0
+        self._retired = False
+        context = multiprocessing.get_context("fork")
+        self._pool = context.Pool(
+            processes=workers,
+            initializer=_init_worker,
+            initargs=(text_processor,),
+        )
+        log.info(f"Started tokenizer pool with {workers} workers")
+
+    def tokenize(self, texts: Sequence[str]) -> List[List[str]]:
+        """Tokenize texts in worker processes.
+
+        Args:
+            texts: Cleaned texts
+
+        Returns:
+            Lemma lists in the order of texts
+        """
+        chunks = chunk_by_chars(texts, self.chunk_chars)
+        results = self._pool.map(_tokenize_chunk, chunks, chunksize=1)
+        return [tokens for chunk in results for tokens in chunk]
+
+    def acquire(self) -> bool:
+        """
+        Register a user of the pool.
+
+        Returns:
+            False if the pool is retired and must not be used
+        """
+        with self._lock:
+            if self._retired:
+                return False
+            self._users += 1
+            return True
+
+    def release(self) -> None:
+        """Unregister a user, the last user stops a retired pool."""
+        with self._lock:
+            self._users -= 1
+            stop = self._retired and self._users == 0
+        if stop:
+            self._stop()
+
+    def retire(self) -> None:
+        """Refuse new users and stop workers once current users are done."""
+        with self._lock:
+            if self._retired:
+                return
+            self._retired = True
+            stop = self._users == 0
+        if stop:
+            self._stop()
+
+    def _stop(self) -> None:
+        # Workers finish queued tasks and exit
+        self._pool.close()
+        self._pool.join()
+        log.info("Stopped tokenizer pool")
@@ -0,0 +1,17 @@
+from .profiling import (
+    PROFILE_FILES,
+    ProfileInfo,
+    RunProfiler,
+    get_profile_file,
+    list_profiles,
+    profile_run,
+)
+
+__all__ = [
+    "PROFILE_FILES",
+    "ProfileInfo",
+    "RunProfiler",
+    "get_profile_file",
+    "list_profiles",
+    "profile_run",
+]
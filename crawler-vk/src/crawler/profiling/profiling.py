@@ -0,0 +1,262 @@
+import contextlib
+import cProfile
+import io
+import linecache
+import logging
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import ContextManager, Dict, List, TypedDict
+
+from src.config import settings
+from src.crawler.memory.memory import format_bytes
+
+log = logging.getLogger(__name__)
+
+# Files written for each profiled run
+PROFILE_FILES = {
+    # cProfile stats, e.g. for snakeviz or pstats
+    "profile.prof": "application/octet-stream",
+    # Functions sorted by cumulative time
+    "profile.txt": "text/plain; charset=utf-8",
+    # Allocation sites holding the most memory at the traced peak
+    "allocations.txt": "text/plain; charset=utf-8",
+}
+# Run IDs are hex job IDs, anything else is not a profile directory
+RUN_ID_PATTERN = re.compile(r"^[0-9a-f]{1,64}$")
+# Functions listed in profile.txt
+PROFILE_TEXT_LINES = 100
+
+# tracemalloc is process-wide and shared by runs profiled at once
+_tracing_lock = threading.Lock()
+_tracing_runs = 0
+
+
+class ProfileInfo(TypedDict):
+    run_id: str
+    created_at: str  # ISO timestamp
+    files: Dict[str, int]  # sizes of the files in bytes
+
+
+class RunProfiler:
+    """
+    Profiles the calling thread and traces allocations of the process.
+
+    Function calls are recorded by cProfile in the thread entering the
+    profiler, so work of collection threads and tokenizer processes shows
+    up as time spent waiting for them. Allocations are traced in the whole
+    process and a snapshot is kept each time traced memory reaches a new
+    peak, so the allocation sites are those holding memory at the peak
+    rather than what is left at the end of the run.
+    """
+
+    def __init__(
+        self,
+        profiles_dir: Path,
+        run_id: str,
+        top_allocations: int = 25,
+        snapshot_interval: float = 1.0,
+    ) -> None:
+        """
+        Args:
+            profiles_dir: Base directory of profiles
+            run_id: ID of the run, names the directory of its files
+            top_allocations: Allocation sites written to allocations.txt
+            snapshot_interval: Seconds between checks for a new memory peak
+        """
+        self.run_dir = Path(profiles_dir) / run_id
+        self.run_id = run_id
+        self.top_allocations = top_allocations
+        self.snapshot_interval = snapshot_interval
+        self._profile = cProfile.Profile()
+        self._peak_snapshot: tracemalloc.Snapshot | None = None
+        self._peak_bytes = 0
+        self._concurrent = False
+        self._started = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "RunProfiler":
+        self._start_tracing()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._watch_peak, name="profile-peak", daemon=True
+        )
+        self._thread.start()
+        self._started = time.perf_counter()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._profile.disable()
+        elapsed = time.perf_counter() - self._started
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._take_snapshot_if_peak()
+        try:
+            self._write(elapsed)
+            log.info(f"Profile of run {self.run_id} saved to {self.run_dir}")
+        except Exception as e:
+            # A failed profile must not fail the run
+            log.exception(
+                f"Error saving profile of run {self.run_id}", exc_info=e
+            )
+        finally:
+            self._peak_snapshot = None
+            self._stop_tracing()
+
+    def _start_tracing(self) -> None:
+        global _tracing_runs
+        with _tracing_lock:
+            if _tracing_runs == 0:
+                tracemalloc.start()
+            self._concurrent = _tracing_runs > 0
+            _tracing_runs += 1
+
+    def _stop_tracing(self) -> None:
+        global _tracing_runs
+        with _tracing_lock:
+            _tracing_runs -= 1
+            if _tracing_runs == 0:
+                tracemalloc.stop()
+
+    def _watch_peak(self) -> None:
+        while not self._stop.wait(self.snapshot_interval):
+            self._take_snapshot_if_peak()
+
+    def _take_snapshot_if_peak(self) -> None:
+        current, _ = tracemalloc.get_traced_memory()
+        # Snapshots are expensive, small increases of the peak are skipped
+        if current > self._peak_bytes * 1.05:
+            self._peak_snapshot = tracemalloc.take_snapshot()
+            self._peak_bytes = current
+
+    def _write(self, elapsed: float) -> None:
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self._profile.dump_stats(self.run_dir / "profile.prof")
+
+        text = io.StringIO()
+        text.write(f"Run {self.run_id}, {elapsed:.1f}s\n\n")
+        stats = pstats.Stats(self._profile, stream=text)
+        stats.sort_stats("cumulative").print_stats(PROFILE_TEXT_LINES)
+        (self.run_dir / "profile.txt").write_text(
+            text.getvalue(), encoding="utf-8"
+        )
+
+        (self.run_dir / "allocations.txt").write_text(
+            self._format_allocations(), encoding="utf-8"
+        )
+
+    def _format_allocations(self) -> str:
+        lines = [
+            f"Run {self.run_id}, traced memory at the peak: "
+            f"{format_bytes(self._peak_bytes)}"
+        ]
+        if self._concurrent:
+            lines.append(
+                "Other profiled runs were active, their allocations "
+                "are included"
+            )
+        lines.append("")
+        if self._peak_snapshot is None:
+            return "\n".join(lines + ["No allocations traced"]) + "\n"
+
+        snapshot = self._peak_snapshot.filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            ]
+        )
+        top = snapshot.statistics("lineno")[: self.top_allocations]
+        for i, stat in enumerate(top, 1):
+            frame = stat.traceback[0]
+            lines.append(
+                f"#{i}: {frame.filename}:{frame.lineno}: "
+                f"{format_bytes(stat.size)} in {stat.count} blocks"
+            )
+            source = linecache.getline(frame.filename, frame.lineno).strip()
+            if source:
+                lines.append(f"    {source}")
+        return "\n".join(lines) + "\n"
+
+
+def profile_run(run_id: str, enabled: bool) -> ContextManager:
+    """
+    Profile a run if profiling was requested.
+
+    Args:
+        run_id: ID of the run
+        enabled: Whether the run is profiled
+
+    Returns:
+        Profiler of the run, a no-op context if profiling is disabled
+    """
+    if not enabled:
+        return contextlib.nullcontext()
+    return RunProfiler(
+        settings.profiles_dir,
+        run_id,
+        settings.profile_top_allocations,
+        settings.profile_snapshot_interval,
+    )
+
+
+def list_profiles(profiles_dir: Path) -> List[ProfileInfo]:
+    """
+    List saved profiles, most recent first.
+
+    Args:
+        profiles_dir: Base directory of profiles
+
+    Returns:
+        Profiles with their files
+    """
+    profiles: List[ProfileInfo] = []
+    if not profiles_dir.is_dir():
+        return profiles
+    for run_dir in profiles_dir.iterdir():
+        if not run_dir.is_dir() or not RUN_ID_PATTERN.match(run_dir.name):
+            continue
+        files = {
+            name: (run_dir / name).stat().st_size
+            for name in PROFILE_FILES
+            if (run_dir / name).is_file()
+        }
+        if not files:
+            continue
+        created_at = datetime.fromtimestamp(
+            run_dir.stat().st_mtime, timezone.utc
+        )
+        profiles.append(
+            {
+                "run_id": run_dir.name,
+                "created_at": created_at.isoformat(),
+                "files": files,
+            }
+        )
+    profiles.sort(key=lambda profile: profile["created_at"], reverse=True)
+    return profiles
+
+
+def get_profile_file(profiles_dir: Path, run_id: str, name: str) -> Path | None:
+    """
+    Get a file of a saved profile.
+
+    Args:
+        profiles_dir: Base directory of profiles
+        run_id: ID of the profiled run
+        name: Name of the file, one of PROFILE_FILES
+
+    Returns:
+        Path of the file, None if there is no such file
+    """
+    if name not in PROFILE_FILES or not RUN_ID_PATTERN.match(run_id):
+        return None
+    path = profiles_dir / run_id / name
+    return path if path.is_file() else None
@@ -0,0 +1,3 @@
+from .rate_limiter import RateLimitedService, TokenBucket, create_collector
+
+__all__ = ["TokenBucket", "RateLimitedService", "create_collector"]
@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+
+from vk_data_collector import Client, Collector, Service
+
+from src.crawler.exceptions.crawler_exceptions import VKAPIError
+from src.crawler.metrics.metrics import (
+    VK_RATE_LIMIT_WAIT,
+    VK_REQUEST_DURATION,
+    VK_REQUESTS,
+)
+
+log = logging.getLogger(__name__)
+
+# VK API error "Too many requests per second"
+TOO_MANY_REQUESTS_ERROR = 6
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the rate of requests.
+
+    The rate halves when the API reports too many requests and recovers
+    step by step after a run of successful requests, so parallel workers
+    settle just below the limit VK actually enforces.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float = 0.5,
+        recovery_requests: int = 20,
+    ) -> None:
+        """
+        Args:
+            rate: Maximum requests per second, also the burst size
+            min_rate: Lower bound of the rate when backing off
+            recovery_requests: Successful requests before the rate is
+                raised after a back off
+        """
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.recovery_requests = recovery_requests
+        self._rate = rate
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._successes = 0
+        self._throttled_at = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """Current requests per second."""
+        with self._lock:
+            return self._rate
+
+    def acquire(self) -> None:
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    max(self._rate, 1.0),
+                    self._tokens + (now - self._updated) * self._rate,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+    def on_throttled(self) -> None:
+        """Halve the rate and drop accumulated tokens."""
+        with self._lock:
+            self._tokens = 0.0
+            self._successes = 0
+            # Requests in flight are rejected together, back off once
+            now = time.monotonic()
+            if now - self._throttled_at < 1.0:
+                return
+            self._throttled_at = now
+            self._rate = max(self.min_rate, self._rate / 2)
+            log.warning(f"VK API throttled, rate lowered to {self._rate:g}/s")
+
+    def on_success(self) -> None:
+        """Raise the rate back towards the maximum after enough successes."""
+        with self._lock:
+            if self._rate >= self.max_rate:
+                return
+            self._successes += 1
+            if self._successes >= self.recovery_requests:
+                self._rate = min(self.max_rate, self._rate * 1.25)
+                self._successes = 0
+                log.info(f"VK API rate raised to {self._rate:g}/s")
+
+
+class RateLimitedService(Service):
+    """
+    VK API service sharing one token bucket between threads.
+
+    Replaces the per-process limit of Service, which is not thread-safe,
+    and retries requests rejected with "too many requests".
+    """
+
+    def __init__(
+        self, client: Client, limiter: TokenBucket, max_retries: int = 5
+    ) -> None:
+        super().__init__(client)
+        self.limiter = limiter
+        self.max_retries = max_retries
+
+    def _execute_request(self, method, params):
+        endpoint = f"/method/{method}"
+        for attempt in range(self.max_retries + 1):
+            with VK_RATE_LIMIT_WAIT.time():
+                self.limiter.acquire()
+            log.debug(f"VK API request {method}: {params}")
+            with VK_REQUEST_DURATION.time(method=method):
+                response = self.client.make_request(endpoint, dict(params))
+            if not response.ok:
+                VK_REQUESTS.inc(method=method, outcome="http_error")
+                log.error(f"VK API response {response.status_code}: {method}")
+                raise Exception("Response Error")
+
+            data = response.json()
+            error = data.get("error")
+            if error is None:
+                VK_REQUESTS.inc(method=method, outcome="ok")
+                self.limiter.on_success()
+                return data
+            if error.get("error_code") != TOO_MANY_REQUESTS_ERROR:
+                VK_REQUESTS.inc(method=method, outcome="api_error")
+                raise VKAPIError(
+                    error.get("error_code"), error.get("error_msg")
+                )
+            VK_REQUESTS.inc(method=method, outcome="throttled")
+            self.limiter.on_throttled()
+            log.warning(
+                f"VK API request {method} throttled, "
+                f"attempt {attempt + 1} of {self.max_retries + 1}"
+            )
+        raise VKAPIError(error.get("error_code"), error.get("error_msg"))
+
+
+def create_collector(
+    service_token: str, requests_per_second: float
+) -> Collector:
+    """
+    Create a collector whose threads share one VK API rate limit.
+
+    Args:
+        service_token: VK API service token
+        requests_per_second: Maximum VK API requests per second
+
+    Returns:
+        Collector
+    """
+    limiter = TokenBucket(requests_per_second)
+    return Collector(RateLimitedService(Client(service_token), limiter))
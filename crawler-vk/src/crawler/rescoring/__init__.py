@@ -0,0 +1,3 @@
+from .rescoring import RescoreInfo, Rescorer, RescoreSource, RescoreState
+
+__all__ = ["RescoreInfo", "RescoreSource", "RescoreState", "Rescorer"]
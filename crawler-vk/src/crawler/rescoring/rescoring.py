@@ -0,0 +1,319 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Sequence,
+    Tuple,
+    TypedDict,
+    cast,
+)
+
+import numpy as np
+import pandas as pd
+from sklearn.svm import SVC
+
+from src.config import settings
+from src.crawler.crawler import Crawler
+from src.crawler.predict_depression import (
+    apply_predictions,
+    predict_depression,
+)
+from src.crawler.preprocess_data import preprocess_publications, rechunk
+from src.crawler.preprocessing.feature_extractor import (
+    DepressionFeatureExtractor,
+)
+from src.crawler.status_manager.status_manager import CrawlerStatusManager
+from src.db.db import get_run_group_ids, save_model_predictions
+
+log = logging.getLogger(__name__)
+
+RescoreSource = Literal[
+    "features",  # features of the feature store
+    # texts of the columnar store, cleaned and embedded again, crawls older
+    # than columnar_store_retention_days are skipped
+    "texts",
+]
+RescoreState = Literal["queued", "running", "finished", "failed"]
+
+# Finished re-scorings kept for the API
+MAX_FINISHED_RESCORES = 100
+
+
+class RescoreInfo(TypedDict):
+    id: str
+    group_ids: List[int]
+    run_ids: List[int]
+    source: RescoreSource
+    apply: bool  # whether depression_predictions is updated
+    state: RescoreState
+    model_version: str | None
+    scored: int  # predicted publications
+    saved: int  # predictions saved to model_predictions
+    updated: int  # predictions replaced in depression_predictions
+    created_at: str  # ISO timestamps
+    finished_at: str | None
+    error: str | None
+
+
+class Rescorer:
+    """
+    Re-scores saved publications with the current classifier.
+
+    Publications of groups are read in large batches from the stores of the
+    crawler instead of being collected again, predicted and upserted into
+    model_predictions under the version of the models, so that versions can
+    be compared before replacing the predictions of the runs. A classifier
+    loaded from its files is used by the re-scoring only, runs keep the
+    resident one until models are reloaded. Re-scorings run one at a time
+    in a background thread.
+    """
+
+    def __init__(self, crawler: Crawler, batch_size: int) -> None:
+        """
+        Initialize the rescorer.
+
+        Args:
+            crawler: Crawler with the resident models, stores and database
+                pool
+            batch_size: Publications predicted and saved at once
+        """
+        self.crawler = crawler
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._rescores: Dict[str, RescoreInfo] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="rescore"
+        )
+
+    def submit(
+        self,
+        group_ids: Sequence[int] = (),
+        run_ids: Sequence[int] = (),
+        source: RescoreSource = "features",
+        apply: bool = False,
+        reload_classifier: bool = True,
+    ) -> str:
+        """
+        Queue a re-scoring.
+
+        Args:
+            group_ids: VK group IDs to re-score
+            run_ids: Crawler runs whose groups are re-scored, predictions of
+                other runs are left as they are
+            source: Store the publications are read from. Texts are kept
+                for columnar_store_retention_days, publications of older
+                crawls are not re-scored from texts.
+            apply: Replace predictions in depression_predictions as well
+            reload_classifier: Use the classifier in its files instead of
+                the resident one
+
+        Returns:
+            ID of the re-scoring
+
+        Raises:
+            ValueError: If the store of the source is disabled
+        """
+        if source == "features" and self.crawler.feature_store is None:
+            raise ValueError("Feature store is disabled")
+        if source == "texts" and self.crawler.store is None:
+            raise ValueError("Columnar store is disabled")
+
+        rescore_id = uuid.uuid4().hex
+        info: RescoreInfo = {
+            "id": rescore_id,
+            "group_ids": list(group_ids),
+            "run_ids": list(run_ids),
+            "source": source,
+            "apply": apply,
+            "state": "queued",
+            "model_version": None,
+            "scored": 0,
+            "saved": 0,
+            "updated": 0,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "finished_at": None,
+            "error": None,
+        }
+        with self._lock:
+            self._rescores[rescore_id] = info
+            self._forget_finished()
+        self._executor.submit(self._run, rescore_id, reload_classifier)
+        log.info(f"Re-scoring {rescore_id} queued")
+        return rescore_id
+
+    def get(self, rescore_id: str) -> RescoreInfo | None:
+        """Get a re-scoring by ID, None if it is unknown."""
+        with self._lock:
+            info = self._rescores.get(rescore_id)
+            return info.copy() if info else None
+
+    def list_rescores(self) -> List[RescoreInfo]:
+        """Get known re-scorings, most recent first."""
+        with self._lock:
+            return [info.copy() for info in reversed(self._rescores.values())]
+
+    def shutdown(self) -> None:
+        """Wait for the running re-scoring to finish."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _run(self, rescore_id: str, reload_classifier: bool) -> None:
+        info = self._rescores[rescore_id]
+        models = self.crawler.models
+        self._update(rescore_id, state="running")
+        try:
+            if reload_classifier:
+                model, selected_features, model_version = (
+                    models.load_classifier()
+                )
+            else:
+                model, selected_features = (
+                    models.get_classifier(),
+                    models.get_selected_features(),
+                )
+                model_version = models.get_model_version()
+            classifier = model, selected_features
+            self._update(rescore_id, model_version=model_version)
+
+            run_ids = info["run_ids"] or None
+            group_ids = info["group_ids"] or None
+            with self.crawler.db_pool.connection() as conn:
+                if run_ids is not None:
+                    run_groups = get_run_group_ids(conn, run_ids)
+                    group_ids = [
+                        group_id
+                        for group_id in run_groups
+                        if group_ids is None or group_id in group_ids
+                    ]
+
+                batches = (
+                    self._score_features(group_ids, classifier)
+                    if info["source"] == "features"
+                    else self._score_texts(group_ids, classifier)
+                )
+                for publications in batches:
+                    # Each batch is committed, an interrupted re-scoring
+                    # keeps the saved batches and may simply be repeated
+                    try:
+                        saved, updated = save_model_predictions(
+                            conn,
+                            model_version,
+                            zip(
+                                publications["owner_id"].abs().tolist(),
+                                publications["post_id"].tolist(),
+                                publications["id"].tolist(),
+                                publications["depression_prediction"].tolist(),
+                            ),
+                            run_ids,
+                            info["apply"],
+                        )
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    self._update(
+                        rescore_id,
+                        scored=info["scored"] + len(publications),
+                        saved=info["saved"] + saved,
+                        updated=info["updated"] + updated,
+                    )
+            self._update(rescore_id, state="finished")
+            log.info(
+                f"Re-scoring {rescore_id} finished: {info['scored']} scored, "
+                f"{info['saved']} saved, {info['updated']} updated"
+            )
+        except Exception as e:
+            log.exception(f"Re-scoring {rescore_id} failed", exc_info=e)
+            self._update(rescore_id, state="failed", error=str(e))
+        finally:
+            self._update(
+                rescore_id, finished_at=datetime.now(timezone.utc).isoformat()
+            )
+
+    def _score_features(
+        self,
+        group_ids: List[int] | None,
+        classifier: Tuple[SVC, List[str]],
+    ) -> Iterator[pd.DataFrame]:
+        """Predict publications from their stored features."""
+        models = self.crawler.models
+        feature_store = self.crawler.feature_store
+        if feature_store is None:
+            raise ValueError("Feature store is disabled")
+        feature_extractor = DepressionFeatureExtractor(
+            str(settings.depression_dictionary_path)
+        )
+        vector_size = models.get_vectorizer().vector_size
+        batches = feature_store.read(
+            models.get_feature_version(), group_ids, self.batch_size
+        )
+        for publications, features in batches:
+            # Each distinct text is predicted once
+            first = ~publications["text_hash"].duplicated().to_numpy()
+            features = features[first]
+            data = publications.loc[first, ["text_hash"]]
+            selected = feature_extractor.select_features(
+                features[:, vector_size:], classifier[1]
+            )
+            selected.index = data.index
+            data = pd.concat([data, selected], axis=1)
+            predict_depression(
+                data,
+                np.ascontiguousarray(features[:, :vector_size]),
+                models,
+                classifier,
+            )
+            publications["depression_prediction"] = np.nan
+            yield apply_predictions(publications, data)
+
+    def _score_texts(
+        self,
+        group_ids: List[int] | None,
+        classifier: Tuple[SVC, List[str]],
+    ) -> Iterator[pd.DataFrame]:
+        """Predict publications from their collected texts."""
+        models = self.crawler.models
+        store = self.crawler.store
+        if store is None:
+            raise ValueError("Columnar store is disabled")
+        frames = store.scan(
+            columns=["owner_id", "post_id", "id", "text"],
+            filters=[("text_length", ">", settings.min_text_length)],
+            group_ids=group_ids,
+        )
+        for chunk in rechunk(frames, self.batch_size):
+            # Features are stored on the way, later re-scorings of the
+            # groups may read them instead
+            result = preprocess_publications(
+                chunk,
+                models,
+                CrawlerStatusManager(),
+                self.crawler.token_cache,
+                None,
+                self.crawler.feature_store,
+            )
+            if result is None:
+                continue
+            publications, data, embeddings = result
+            predict_depression(data, embeddings, models, classifier)
+            yield apply_predictions(publications, data)
+
+    def _update(self, rescore_id: str, **values) -> None:
+        with self._lock:
+            self._rescores[rescore_id].update(cast(RescoreInfo, values))
+
+    def _forget_finished(self) -> None:
+        finished = [
+            rescore_id
+            for rescore_id, info in self._rescores.items()
+            if info["state"] in ("finished", "failed")
+        ]
+        for rescore_id in finished[
+            : max(0, len(finished) - MAX_FINISHED_RESCORES)
+        ]:
+            del self._rescores[rescore_id]
@@ -0,0 +1,3 @@
+from .scheduler import Job, JobInfo, JobScheduler, JobState, split_groups
+
+__all__ = ["Job", "JobInfo", "JobState", "JobScheduler", "split_groups"]
@@ -0,0 +1,335 @@
+import functools
+import logging
+import shutil
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Literal, TypedDict
+
+from src.crawler.crawler import Crawler
+from src.crawler.profiling.profiling import profile_run
+from src.crawler.status_manager.status_manager import (
+    CrawlerStatus,
+    CrawlerStatusManager,
+)
+from src.crawler.status_stream.status_stream import StatusBroadcaster
+
+log = logging.getLogger(__name__)
+
+JobState = Literal[
+    "queued",  # waiting for a free slot
+    "running",  # pipeline is running
+    "finished",  # pipeline completed
+    "failed",  # pipeline failed
+    "cancelled",  # job was cancelled
+]
+
+# Finished jobs kept for the jobs API
+MAX_FINISHED_JOBS = 100
+
+
+def split_groups(groups: List[str], max_groups: int) -> List[List[str]]:
+    """
+    Split a group list into the group lists of separate jobs.
+
+    Args:
+        groups: List of VK group names
+        max_groups: Maximum groups per job, 0 keeps all groups in one job
+
+    Returns:
+        Group lists of the jobs
+    """
+    if max_groups <= 0:
+        return [groups]
+    return [
+        groups[i : i + max_groups] for i in range(0, len(groups), max_groups)
+    ]
+
+
+class JobInfo(TypedDict):
+    id: str
+    groups: List[str]
+    target_date: str
+    state: JobState
+    created_at: str  # ISO timestamps
+    started_at: str | None
+    finished_at: str | None
+    profile: bool  # whether the run is profiled
+    run_id: str  # data directory of the run, ID of the job it continues
+    status: CrawlerStatus  # pipeline status of the job
+
+
+class Job:
+    """A pipeline run requested through the API."""
+
+    def __init__(
+        self,
+        groups: List[str],
+        target_date: str,
+        broadcaster: StatusBroadcaster | None = None,
+        profile: bool = False,
+        run_id: str | None = None,
+    ) -> None:
+        self.id = uuid.uuid4().hex
+        # Resumed jobs continue in the data directory of an earlier job
+        self.run_id = run_id or self.id
+        self.groups = groups
+        self.target_date = target_date
+        self.profile = profile
+        self.state: JobState = "queued"
+        self.status_manager = CrawlerStatusManager(
+            on_change=(
+                functools.partial(broadcaster.publish, self.id)
+                if broadcaster
+                else None
+            )
+        )
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: datetime | None = None
+        self.finished_at: datetime | None = None
+        self.cancel_requested = False
+        self.future: Future | None = None
+
+    @property
+    def is_active(self) -> bool:
+        """Check if the job is queued or running."""
+        return self.state in ("queued", "running")
+
+    def get_info(self) -> JobInfo:
+        """Get job description with its pipeline status."""
+        return {
+            "id": self.id,
+            "groups": self.groups,
+            "target_date": self.target_date,
+            "state": self.state,
+            "created_at": self.created_at.isoformat(),
+            "started_at": (
+                self.started_at.isoformat() if self.started_at else None
+            ),
+            "finished_at": (
+                self.finished_at.isoformat() if self.finished_at else None
+            ),
+            "profile": self.profile,
+            "run_id": self.run_id,
+            "status": self.status_manager.get_status(),
+        }
+
+
+class JobScheduler:
+    """
+    Queue of pipeline runs executed by a fixed number of threads.
+
+    Jobs share the crawler with its resident models, caches and database
+    pool, each job has its own status and data directory.
+    """
+
+    def __init__(
+        self,
+        crawler: Crawler,
+        max_concurrent_jobs: int,
+        data_dir: Path,
+        max_groups_per_job: int = 0,
+        broadcaster: StatusBroadcaster | None = None,
+    ) -> None:
+        """
+        Initialize the scheduler.
+
+        Args:
+            crawler: Crawler running the pipelines
+            max_concurrent_jobs: Number of jobs running at once
+            data_dir: Base directory for data of the jobs
+            max_groups_per_job: Larger group lists are split into several
+                jobs, 0 never splits
+            broadcaster: Receives status changes of the jobs
+        """
+        self.crawler = crawler
+        self.data_dir = Path(data_dir)
+        self.max_groups_per_job = max_groups_per_job
+        self.broadcaster = broadcaster
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_jobs, thread_name_prefix="job"
+        )
+
+    def submit(
+        self, groups: List[str], target_date: str, profile: bool = False
+    ) -> List[str]:
+        """
+        Queue pipeline runs for a group list.
+
+        Args:
+            groups: List of VK group names to collect from
+            target_date: Target date in YYYY-MM-DD format
+            profile: Profile the runs and save their profiles
+
+        Returns:
+            IDs of the queued jobs
+        """
+        return [
+            self._queue(Job(job_groups, target_date, self.broadcaster, profile))
+            for job_groups in split_groups(groups, self.max_groups_per_job)
+        ]
+
+    def resume(
+        self,
+        run_id: str,
+        groups: List[str],
+        target_date: str,
+        profile: bool = False,
+    ) -> str:
+        """
+        Queue a job continuing a failed or cancelled run from its checkpoints.
+
+        Args:
+            run_id: ID of the run to continue
+            groups: List of VK group names of the run
+            target_date: Target date of the run in YYYY-MM-DD format
+            profile: Profile the run and save its profile
+
+        Returns:
+            ID of the queued job
+        """
+        job = Job(groups, target_date, self.broadcaster, profile, run_id)
+        job_id = self._queue(job)
+        log.info(f"Job {job_id} resumes run {run_id}")
+        return job_id
+
+    def _queue(self, job: Job) -> str:
+        with self._lock:
+            self._jobs[job.id] = job
+            self._forget_finished()
+            job.future = self._executor.submit(self._run, job)
+        log.info(f"Job {job.id} queued for groups: {', '.join(job.groups)}")
+        return job.id
+
+    def get(self, job_id: str) -> JobInfo | None:
+        """Get a job by ID, None if it is unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.get_info() if job else None
+
+    def list_jobs(self) -> List[JobInfo]:
+        """Get known jobs, most recent first."""
+        with self._lock:
+            jobs = list(reversed(self._jobs.values()))
+        return [job.get_info() for job in jobs]
+
+    def get_current_job(self) -> JobInfo | None:
+        """
+        Get the job the legacy status API reports.
+
+        Returns:
+            Earliest started running job, the most recently started job if
+            none is running, None if there were no jobs
+        """
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.started_at]
+        running = [job for job in jobs if job.state == "running"]
+        if running:
+            return min(
+                running, key=lambda job: job.started_at or job.created_at
+            ).get_info()
+        if jobs:
+            return max(
+                jobs, key=lambda job: job.started_at or job.created_at
+            ).get_info()
+        return None
+
+    def reset_status(self, job_id: str) -> None:
+        """Reset pipeline status of a job if it has finished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None and not job.is_active:
+            job.status_manager.reset()
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued job or request a running job to stop.
+
+        Args:
+            job_id: ID of the job
+
+        Returns:
+            False if the job is unknown
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            if not job.is_active:
+                return True
+            job.cancel_requested = True
+            cancelled = job.future is not None and job.future.cancel()
+            if cancelled:
+                job.state = "cancelled"
+                job.finished_at = datetime.now(timezone.utc)
+        job.status_manager.set_stop_flag()
+        if cancelled:
+            self._notify_end(job)
+        log.info(f"Job {job_id} cancel requested")
+        return True
+
+    def cancel_all(self) -> None:
+        """Cancel all queued and running jobs."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if job.is_active:
+                self.cancel(job.id)
+
+    def shutdown(self) -> None:
+        """Cancel all jobs and wait for running ones to stop."""
+        self.cancel_all()
+        self._executor.shutdown(wait=True)
+
+    def _run(self, job: Job) -> None:
+        with self._lock:
+            cancelled = job.cancel_requested
+            if cancelled:
+                job.state = "cancelled"
+                job.finished_at = datetime.now(timezone.utc)
+            else:
+                job.state = "running"
+                job.started_at = datetime.now(timezone.utc)
+        if cancelled:
+            self._notify_end(job)
+            return
+
+        # Jobs collect into their own directory as collected files are
+        # named after groups and would clash between concurrent jobs
+        job_dir = self.data_dir / "runs" / job.run_id
+        log.info(f"Job {job.id} started")
+        try:
+            with profile_run(job.id, job.profile):
+                completed = self.crawler.run_pipeline(
+                    job.groups, job.target_date, job.status_manager, job_dir
+                )
+        except Exception as e:
+            log.exception(f"Job {job.id} failed", exc_info=e)
+            completed = False
+
+        with self._lock:
+            if job.cancel_requested:
+                job.state = "cancelled"
+            else:
+                job.state = "finished" if completed else "failed"
+            job.finished_at = datetime.now(timezone.utc)
+        log.info(f"Job {job.id} {job.state}")
+        self._notify_end(job)
+
+        # Keep data of failed and cancelled jobs for investigation and to
+        # resume their runs
+        if job.state == "finished":
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+    def _notify_end(self, job: Job) -> None:
+        if self.broadcaster is not None:
+            self.broadcaster.close(job.id, job.state)
+
+    def _forget_finished(self) -> None:
+        finished = [job for job in self._jobs.values() if not job.is_active]
+        for job in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
@@ -1,5 +1,6 @@
+import copy
 import threading
-from typing import Literal, TypedDict
+from typing import Any, Callable, Dict, Literal, TypedDict, cast, get_args
 
 from src.crawler.exceptions.crawler_exceptions import CrawlerStopRequested
 
@@ -14,12 +15,52 @@ CrawlerState = Literal[
 ]
 
 
+PipelineStage = Literal[
+    "collecting_groups",
+    "collecting_data",
+    "preprocessing",
+    "inference",
+    "saving_results",
+]
+
+StageState = Literal[
+    "pending",  # stage has not started
+    "running",  # stage has started and may still get work
+    "done",  # stage has finished
+]
+
+
+class StageProgress(TypedDict):
+    state: StageState
+    completed: int  # groups for collection stages, publications otherwise
+    total: int | None  # work expected, None if not known in advance
+
+
+class CacheStats(TypedDict):
+    hits: int  # lookups served from cache
+    misses: int  # lookups that had to be computed
+
+
+class SaveStats(TypedDict):
+    inserted: int  # predictions written to the database
+    skipped: int  # predictions of already saved publications
+
+
 class CrawlerStatus(TypedDict):
     state: CrawlerState
     current_group: str | None  # current group data collection
     progress: int | None  # data collection progress in percent, None if not
     error: str | None  # error message, None if no error
     should_stop: bool  # flag to stop
+    cache_stats: Dict[str, CacheStats]  # cache usage of the run by cache
+    peak_rss_bytes: int | None  # peak memory of the last run, None if unknown
+    save_stats: SaveStats  # predictions saved by the run
+    stages: Dict[PipelineStage, StageProgress]  # progress of each stage
+
+
+# Called with changed fields of the status, nested like the status itself,
+# and whether they replace the whole status instead of updating it
+StatusListener = Callable[[Dict[str, Any], bool], None]
 
 
 class CrawlerStatusManager:
@@ -27,20 +68,21 @@ class CrawlerStatusManager:
     A class to manage the crawler's state.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, on_change: StatusListener | None = None) -> None:
+        """
+        Args:
+            on_change: Listener notified of each change of the status.
+                It's called under the status lock, in the order of the
+                changes, and must not block.
+        """
         self._lock = threading.Lock()
-        self._status: CrawlerStatus = {
-            "state": "idle",
-            "current_group": None,
-            "progress": None,
-            "error": None,
-            "should_stop": False,
-        }
+        self._status: CrawlerStatus = self._initial_status()
+        self._on_change = on_change
 
     def get_status(self) -> CrawlerStatus:
         """Get current status."""
         with self._lock:
-            return self._status.copy()
+            return self._copy_status()
 
     def set_state(self, state: CrawlerState) -> None:
         """Set current state."""
@@ -48,11 +90,12 @@ class CrawlerStatusManager:
             # Don't check stop flag when setting idle state
             if state != "idle" and self._status["should_stop"]:
                 raise CrawlerStopRequested()
-            self._status["state"] = state
+            changes: Dict[str, Any] = {"state": state}
             # Reset progress for non-collecting states
             if state not in ["collecting_data", "collecting_groups"]:
-                self._status["current_group"] = None
-                self._status["progress"] = None
+                changes["current_group"] = None
+                changes["progress"] = None
+            self._update(changes)
 
     def set_current_group(self, group: str | None) -> None:
         """Set current group being processed."""
@@ -60,27 +103,84 @@ class CrawlerStatusManager:
             # Don't check stop flag when resetting group to None
             if group is not None and self._status["should_stop"]:
                 raise CrawlerStopRequested()
-            self._status["current_group"] = group
+            self._update({"current_group": group})
 
     def set_progress(self, progress: int) -> None:
         """Set progress in percent."""
         with self._lock:
-            self._status["progress"] = progress
+            self._update({"progress": progress})
+
+    def start_stage(
+        self, stage: PipelineStage, total: int | None = None
+    ) -> None:
+        """Mark a pipeline stage as running."""
+        with self._lock:
+            if self._status["should_stop"]:
+                raise CrawlerStopRequested()
+            self._update(
+                {"stages": {stage: {"state": "running", "total": total}}}
+            )
+
+    def advance_stage(self, stage: PipelineStage, count: int = 1) -> None:
+        """Add completed work to a pipeline stage."""
+        with self._lock:
+            completed = self._status["stages"][stage]["completed"] + count
+            self._update({"stages": {stage: {"completed": completed}}})
+
+    def finish_stage(self, stage: PipelineStage) -> None:
+        """Mark a pipeline stage as done."""
+        with self._lock:
+            self._update({"stages": {stage: {"state": "done"}}})
 
     def set_error(self, error: str) -> None:
         """Set error message."""
         with self._lock:
-            self._status["error"] = error
+            self._update({"error": error})
+
+    def add_cache_stats(self, cache: str, hits: int, misses: int) -> None:
+        """Add cache hits and misses of the current run."""
+        with self._lock:
+            stats = self._status["cache_stats"].get(
+                cache, {"hits": 0, "misses": 0}
+            )
+            self._update(
+                {
+                    "cache_stats": {
+                        cache: {
+                            "hits": stats["hits"] + hits,
+                            "misses": stats["misses"] + misses,
+                        }
+                    }
+                }
+            )
+
+    def add_save_stats(self, inserted: int, skipped: int) -> None:
+        """Add numbers of inserted and skipped predictions of the run."""
+        with self._lock:
+            stats = self._status["save_stats"]
+            self._update(
+                {
+                    "save_stats": {
+                        "inserted": stats["inserted"] + inserted,
+                        "skipped": stats["skipped"] + skipped,
+                    }
+                }
+            )
+
+    def set_peak_rss(self, peak_rss_bytes: int) -> None:
+        """Set peak memory of the run in bytes."""
+        with self._lock:
+            self._update({"peak_rss_bytes": peak_rss_bytes})
 
     def set_stop_flag(self) -> None:
         """Set stop flag."""
         with self._lock:
-            self._status["should_stop"] = True
+            self._update({"should_stop": True})
 
     def reset_stop_flag(self) -> None:
         """Reset stop flag."""
         with self._lock:
-            self._status["should_stop"] = False
+            self._update({"should_stop": False})
 
     def should_stop(self) -> bool:
         """Check if should stop."""
@@ -90,10 +190,64 @@ class CrawlerStatusManager:
     def reset(self) -> None:
         """Reset status to initial state."""
         with self._lock:
-            self._status = {
-                "state": "idle",
-                "current_group": None,
-                "progress": None,
-                "error": None,
-                "should_stop": False,
-            }
+            self._status = self._initial_status()
+            if self._on_change is not None:
+                self._on_change(cast(Dict[str, Any], self._copy_status()), True)
+
+    def _copy_status(self) -> CrawlerStatus:
+        status = self._status.copy()
+        status["cache_stats"] = {
+            name: stats.copy()
+            for name, stats in self._status["cache_stats"].items()
+        }
+        status["save_stats"] = self._status["save_stats"].copy()
+        status["stages"] = {
+            stage: progress.copy()
+            for stage, progress in self._status["stages"].items()
+        }
+        return status
+
+    def _update(self, changes: Dict[str, Any]) -> None:
+        """Apply nested changes to the status and notify the listener."""
+        changed = merge_changes(cast(Dict[str, Any], self._status), changes)
+        if changed and self._on_change is not None:
+            self._on_change(changed, False)
+
+    @staticmethod
+    def _initial_status() -> CrawlerStatus:
+        return {
+            "state": "idle",
+            "current_group": None,
+            "progress": None,
+            "error": None,
+            "should_stop": False,
+            "cache_stats": {},
+            "peak_rss_bytes": None,
+            "save_stats": {"inserted": 0, "skipped": 0},
+            "stages": {
+                stage: {"state": "pending", "completed": 0, "total": None}
+                for stage in get_args(PipelineStage)
+            },
+        }
+
+
+def merge_changes(
+    target: Dict[str, Any], changes: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Merge nested changes into a dict.
+
+    Returns:
+        Changes that differ from the values in the dict
+    """
+    changed = {}
+    for key, value in changes.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            nested = merge_changes(target[key], value)
+            if nested:
+                changed[key] = nested
+        elif key not in target or target[key] != value:
+            # Changes are passed on to the listener, don't share them
+            target[key] = copy.deepcopy(value)
+            changed[key] = value
+    return changed
@@ -0,0 +1,3 @@
+from .status_stream import StatusBroadcaster
+
+__all__ = ["StatusBroadcaster"]
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import logging
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Set,
+    Tuple,
+)
+
+from starlette.concurrency import run_in_threadpool
+
+from src.crawler.status_manager.status_manager import merge_changes
+
+log = logging.getLogger(__name__)
+
+# Seconds without events before a comment keeps the connection open
+KEEP_ALIVE_INTERVAL = 15.0
+
+
+class _Subscriber:
+    """Changes not yet sent to one client."""
+
+    def __init__(self) -> None:
+        self.snapshot_due = True
+        self.changes: Dict[str, Any] = {}
+        self.ready = asyncio.Event()
+
+
+class _Topic:
+    """Status of a watched job shared by its subscribers."""
+
+    def __init__(self) -> None:
+        # None until the job is read
+        self.status: Dict[str, Any] | None = None
+        # Changes published while the job is read
+        self.pending: List[Tuple[Dict[str, Any], bool]] = []
+        self.ended = False
+        self.job_state: str | None = None
+        self.subscribers: Set[_Subscriber] = set()
+        # Reads the job, and polls it if it doesn't publish its changes
+        self.reader: asyncio.Task | None = None
+
+
+class StatusBroadcaster:
+    """
+    Fans out status changes of jobs to server-sent event streams.
+
+    Status managers publish their changes from pipeline threads, the event
+    loop keeps one copy of the status of each watched job and queues the
+    changes for each client. The status of a job is read once when the
+    first client starts watching it, later clients start from the copy.
+    Changes a slow client hasn't received yet are merged, so it gets the
+    latest values instead of every step.
+    """
+
+    def __init__(self) -> None:
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._topics: Dict[str, _Topic] = {}
+
+    def publish(
+        self, job_id: str, changes: Dict[str, Any], replace: bool = False
+    ) -> None:
+        """
+        Publish status changes of a job. Thread-safe.
+
+        Args:
+            job_id: ID of the job
+            changes: Changed fields of the status, not modified afterwards
+            replace: Changes are the whole status
+        """
+        # Changes of unwatched jobs are dropped, they are read when watched
+        if self._loop is None or job_id not in self._topics:
+            return
+        self._loop.call_soon_threadsafe(
+            self._apply_changes, job_id, changes, replace
+        )
+
+    def close(self, job_id: str, job_state: str) -> None:
+        """
+        End the streams of a job that is no longer active. Thread-safe.
+
+        Args:
+            job_id: ID of the job
+            job_state: Final state of the job
+        """
+        if self._loop is None or job_id not in self._topics:
+            return
+        self._loop.call_soon_threadsafe(self._end, job_id, job_state)
+
+    async def stream(
+        self,
+        job_id: str,
+        get_job: Callable[[], Mapping[str, Any] | None],
+        poll_interval: float | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream status of a job as server-sent events.
+
+        Emits a "snapshot" event with the whole status, then "changes"
+        events with changed fields nested like the status, and an "end"
+        event with the job state once the job is no longer active.
+
+        Args:
+            job_id: ID of the job
+            get_job: Reads the job info, called from a worker thread
+            poll_interval: Seconds between reads of jobs that don't publish
+                their changes, e.g. jobs of other nodes, None if they do
+
+        Yields:
+            Encoded events
+        """
+        self._loop = asyncio.get_running_loop()
+        topic = self._topics.get(job_id)
+        if topic is None:
+            # Topic is registered first, so changes published while the job
+            # is read are kept and applied on top of it. The job is read by
+            # the topic, not by the first client, which may disconnect
+            # before the read is done.
+            topic = self._topics[job_id] = _Topic()
+            topic.reader = asyncio.create_task(
+                self._read(job_id, get_job)
+                if poll_interval is None
+                else self._poll(job_id, get_job, poll_interval)
+            )
+        subscriber = _Subscriber()
+        topic.subscribers.add(subscriber)
+        if topic.status is not None or topic.ended:
+            subscriber.ready.set()
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(
+                        subscriber.ready.wait(), KEEP_ALIVE_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                subscriber.ready.clear()
+
+                if subscriber.snapshot_due and topic.status is not None:
+                    subscriber.snapshot_due = False
+                    subscriber.changes = {}
+                    yield _event("snapshot", topic.status)
+                elif subscriber.changes:
+                    changes, subscriber.changes = subscriber.changes, {}
+                    yield _event("changes", changes)
+                if topic.ended and not subscriber.ready.is_set():
+                    yield _event("end", {"state": topic.job_state})
+                    return
+        finally:
+            topic.subscribers.discard(subscriber)
+            if not topic.subscribers:
+                if topic.reader is not None:
+                    topic.reader.cancel()
+                del self._topics[job_id]
+
+    def _apply_changes(
+        self, job_id: str, changes: Dict[str, Any], replace: bool
+    ) -> None:
+        topic = self._topics.get(job_id)
+        if topic is None:
+            return
+        if topic.status is None:
+            topic.pending.append((changes, replace))
+            return
+        if replace:
+            topic.status = changes
+            self._send_snapshot(topic)
+            return
+        changed = merge_changes(topic.status, changes)
+        if changed:
+            for subscriber in topic.subscribers:
+                if not subscriber.snapshot_due:
+                    merge_changes(subscriber.changes, changed)
+                subscriber.ready.set()
+
+    def _apply_job(self, job_id: str, job: Mapping[str, Any] | None) -> None:
+        topic = self._topics.get(job_id)
+        if topic is None:
+            return
+        if job is None:
+            self._end(job_id, None)
+            return
+
+        if topic.status is None:
+            topic.status = job["status"]
+            # Pending changes are applied in order, each field ends up with
+            # its last published value, which is not older than the read one
+            for changes, replace in topic.pending:
+                if replace:
+                    topic.status = changes
+                else:
+                    merge_changes(topic.status, changes)
+            topic.pending = []
+            self._send_snapshot(topic)
+        else:
+            self._apply_changes(job_id, job["status"], False)
+
+        if job["state"] not in ("queued", "running"):
+            self._end(job_id, job["state"])
+
+    def _end(self, job_id: str, job_state: str | None) -> None:
+        topic = self._topics.get(job_id)
+        if topic is None:
+            return
+        topic.ended = True
+        topic.job_state = job_state
+        for subscriber in topic.subscribers:
+            subscriber.ready.set()
+
+    @staticmethod
+    def _send_snapshot(topic: _Topic) -> None:
+        for subscriber in topic.subscribers:
+            subscriber.snapshot_due = True
+            subscriber.ready.set()
+
+    async def _read(
+        self, job_id: str, get_job: Callable[[], Mapping[str, Any] | None]
+    ) -> None:
+        try:
+            job = await run_in_threadpool(get_job)
+        except Exception as e:
+            # Streams end, clients may watch the job again
+            log.exception(f"Error reading job {job_id}", exc_info=e)
+            self._end(job_id, None)
+        else:
+            self._apply_job(job_id, job)
+
+    async def _poll(
+        self,
+        job_id: str,
+        get_job: Callable[[], Mapping[str, Any] | None],
+        poll_interval: float,
+    ) -> None:
+        while True:
+            try:
+                job = await run_in_threadpool(get_job)
+            except Exception as e:
+                log.exception(f"Error reading job {job_id}", exc_info=e)
+            else:
+                self._apply_job(job_id, job)
+                if job is None or job["state"] not in ("queued", "running"):
+                    return
+            await asyncio.sleep(poll_interval)
+
+
+def _event(name: str, data: Any) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,3 @@
+from .token_cache import TokenCache
+
+__all__ = ["TokenCache"]
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+from src.crawler.metrics.metrics import record_cache_lookups
+
+log = logging.getLogger(__name__)
+
+# Keep queries below the SQLite host parameter limit
+QUERY_BATCH_SIZE = 500
+
+
+class TokenCache:
+    """
+    Persistent cache of tokenized texts backed by SQLite.
+
+    Maps a hash of the processor version and the cleaned text to its lemma
+    list. Entries carry a last access time and the least recently used ones
+    are evicted once the cache grows over its size cap.
+    """
+
+    def __init__(self, path: Path, version: str, max_entries: int) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            path: Path to the SQLite database file
+            version: Text processor version included in every key
+            max_entries: Maximum number of cached texts
+        """
+        self.version = version
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tokens (
+                    key TEXT PRIMARY KEY,
+                    lemmas TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS tokens_last_used "
+                "ON tokens (last_used)"
+            )
+
+    def key(self, text: str) -> str:
+        """Get cache key of a cleaned text."""
+        data = f"{self.version}\0{text}".encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def get_many(self, texts: Sequence[str]) -> List[List[str] | None]:
+        """
+        Get cached lemmas for texts.
+
+        Args:
+            texts: Cleaned texts
+
+        Returns:
+            Lemma lists aligned with texts, None for texts not in cache
+        """
+        keys = [self.key(text) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        found: Dict[str, str] = {}
+        with self._lock, self._conn:
+            now = time.time()
+            for i in range(0, len(unique_keys), QUERY_BATCH_SIZE):
+                batch = unique_keys[i : i + QUERY_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, lemmas FROM tokens "
+                    f"WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                found.update(rows)
+                self._conn.execute(
+                    f"UPDATE tokens SET last_used = ? "
+                    f"WHERE key IN ({placeholders})",
+                    [now, *batch],
+                )
+        hits = sum(key in found for key in keys)
+        record_cache_lookups("tokens", hits=hits, misses=len(keys) - hits)
+        return [
+            json.loads(found[key]) if key in found else None for key in keys
+        ]
+
+    def put_many(
+        self, texts: Sequence[str], lemmas: Sequence[List[str]]
+    ) -> None:
+        """
+        Store lemmas of texts and evict least recently used entries.
+
+        Args:
+            texts: Cleaned texts
+            lemmas: Lemma lists aligned with texts
+        """
+        now = time.time()
+        rows = [
+            (self.key(text), json.dumps(text_lemmas, ensure_ascii=False), now)
+            for text, text_lemmas in zip(texts, lemmas)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tokens (key, lemmas, last_used) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        count = self._conn.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                """
+                DELETE FROM tokens WHERE key IN (
+                    SELECT key FROM tokens ORDER BY last_used LIMIT ?
+                )
+                """,
+                (excess,),
+            )
+            log.info(f"Evicted {excess} least recently used cached texts")
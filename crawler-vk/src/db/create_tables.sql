@@ -34,4 +34,76 @@ CREATE TABLE IF NOT EXISTS depression_predictions (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     
     CONSTRAINT unique_post UNIQUE (owner_id, post_id, vk_id)
-);
\ No newline at end of file
+);
+
+-- Column added after the table was first released, version of the models
+-- that made the prediction
+ALTER TABLE depression_predictions
+    ADD COLUMN IF NOT EXISTS model_version VARCHAR(64);
+
+-- Predictions of saved publications by version of the models, written by
+-- re-scoring to compare models over the same data
+CREATE TABLE IF NOT EXISTS model_predictions (
+    owner_id BIGINT NOT NULL,  -- wall owner_id where the post is published
+    post_id BIGINT NOT NULL,  -- 0 for posts, actual post_id for comments
+    vk_id BIGINT NOT NULL,  -- post_id for posts, comment_id for comments
+    model_version VARCHAR(64) NOT NULL,
+    depression_prediction BOOLEAN NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (owner_id, post_id, vk_id, model_version)
+);
+
+-- Newest post seen in each group by incremental crawling
+CREATE TABLE IF NOT EXISTS group_watermarks (
+    group_id BIGINT PRIMARY KEY REFERENCES groups(group_id),
+    last_post_id BIGINT NOT NULL,
+    last_post_date TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Comment count of each post when its comments were last collected
+CREATE TABLE IF NOT EXISTS post_comment_counts (
+    owner_id BIGINT REFERENCES groups(group_id),  -- wall owner_id where the post is published
+    post_id BIGINT NOT NULL,
+    comments_count INTEGER NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (owner_id, post_id)
+);
+
+-- Predictions by hash of the cleaned text and version of the models
+CREATE TABLE IF NOT EXISTS prediction_cache (
+    model_version VARCHAR(64) NOT NULL,
+    text_hash CHAR(64) NOT NULL,  -- sha256 of the cleaned text
+    depression_prediction BOOLEAN NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (model_version, text_hash)
+);
+
+-- Jobs queued through the API and claimed by crawler workers
+CREATE TABLE IF NOT EXISTS crawler_jobs (
+    id VARCHAR(32) PRIMARY KEY,
+    groups TEXT[] NOT NULL,
+    target_date DATE NOT NULL,
+    state VARCHAR(16) NOT NULL DEFAULT 'queued',  -- queued, running, finished, failed or cancelled
+    worker_id VARCHAR(255),  -- worker holding the lease of a running job
+    lease_expires_at TIMESTAMP WITH TIME ZONE,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+    profile BOOLEAN NOT NULL DEFAULT FALSE,  -- profile the run
+    run_id VARCHAR(32),  -- data directory of the run, ID of the resumed job
+    status JSONB,  -- pipeline status last reported by the worker
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Column added after the table was first released
+ALTER TABLE crawler_jobs
+    ADD COLUMN IF NOT EXISTS profile BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE crawler_jobs ADD COLUMN IF NOT EXISTS run_id VARCHAR(32);
+
+CREATE INDEX IF NOT EXISTS crawler_jobs_queued
+    ON crawler_jobs (created_at) WHERE state = 'queued';
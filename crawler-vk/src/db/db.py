@@ -1,9 +1,15 @@
+import io
 import logging
 import os
-from datetime import date
+import time
+from datetime import date, datetime
+from typing import Iterable
 
 import psycopg2
 from psycopg2._psycopg import connection
+from psycopg2.extras import execute_values
+
+from src.crawler.metrics.metrics import record_db_write
 
 log = logging.getLogger(__name__)
 
@@ -70,6 +76,8 @@ def create_crawler_run(
 ) -> int:
     """
     Create a new crawler run record and link it with groups.
+    Groups missing from the groups table are skipped.
+    Does not commit, the caller owns the transaction.
 
     Args:
         conn: Database connection
@@ -92,106 +100,496 @@ def create_crawler_run(
             )
             run_id = cur.fetchone()[0]
 
-            # Link groups with the run
-            for group_id in group_ids:
-                try:
-                    cur.execute(
-                        """
-                        INSERT INTO run_groups (run_id, group_id)
-                        VALUES (%s, %s)
-                        """,
-                        (run_id, group_id),
-                    )
-                except psycopg2.errors.ForeignKeyViolation:
+            # Link groups with the run in one statement
+            group_ids = list(dict.fromkeys(group_ids))
+            if group_ids:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO run_groups (run_id, group_id)
+                    SELECT v.run_id, v.group_id
+                    FROM (VALUES %s) AS v (run_id, group_id)
+                    JOIN groups g ON g.group_id = v.group_id
+                    ON CONFLICT DO NOTHING
+                    """,
+                    [(run_id, group_id) for group_id in group_ids],
+                    page_size=len(group_ids),
+                )
+                missing = len(group_ids) - cur.rowcount
+                if missing > 0:
                     log.warning(
-                        f"Group {group_id} not found in database, skipping"
+                        f"{missing} groups not found in database, skipping"
                     )
-                    continue
 
-            conn.commit()
             return run_id
     except psycopg2.Error as e:
         log.exception("Error creating crawler run", exc_info=e)
-        conn.rollback()
         raise
 
 
-def add_group(
+def save_groups(
     conn: connection,
-    group_id: int,
-    name: str,
-    screen_name: str,
-    is_closed: int,
-    type: str,
+    groups: list[tuple[int, str, str, int, str]],
 ) -> None:
     """
-    Add a new group or update existing one.
+    Add new groups or update existing ones with a multi-row upsert.
+    Does not commit, the caller owns the transaction.
 
     Args:
         conn: Database connection
-        group_id: VK group ID
-        name: Group name
+        groups: Tuples of group_id, name, screen_name, is_closed and type
     """
+    # A row can be upserted only once per statement
+    groups = list({group[0]: group for group in groups}.values())
+    if not groups:
+        return
     try:
+        start = time.perf_counter()
         with conn.cursor() as cur:
-            cur.execute(
+            execute_values(
+                cur,
                 """
                 INSERT INTO groups (group_id, name, screen_name, is_closed, type)
-                VALUES (%s, %s, %s, %s, %s)
+                VALUES %s
                 ON CONFLICT (group_id) DO UPDATE SET
                     name = EXCLUDED.name,
                     screen_name = EXCLUDED.screen_name,
                     is_closed = EXCLUDED.is_closed,
                     type = EXCLUDED.type
                 """,  # noqa: E501
-                (group_id, name, screen_name, is_closed, type),
+                groups,
+                page_size=len(groups),
             )
-            conn.commit()
+        record_db_write("groups", len(groups), time.perf_counter() - start)
     except psycopg2.Error as e:
-        log.exception(f"Error adding/updating group {group_id}", exc_info=e)
-        conn.rollback()
+        log.exception("Error adding/updating groups", exc_info=e)
         raise
 
 
 def save_predictions(
     conn: connection,
     run_id: int,
-    owner_id: int,
-    post_id: int,
-    vk_id: int,
-    depression_prediction: bool,
-) -> None:
+    predictions: Iterable[tuple[int, int, int, bool]],
+    model_version: str | None = None,
+) -> tuple[int, int]:
     """
-    Save a single prediction to the database.
-    If a post with the same owner_id, post_id and vk_id already exists,
-    the prediction will be skipped.
+    Save predictions in bulk.
+    Rows are loaded with COPY into a staging table and merged into
+    depression_predictions. Publications with the same owner_id, post_id
+    and vk_id that already exist are skipped.
+    Does not commit, the caller owns the transaction.
 
     Args:
         conn: Database connection
         run_id: ID of the crawler run
-        owner_id: VK group ID
-        post_id: VK post ID
-        vk_id: VK comment ID
-        depression_prediction: Prediction result (True/False)
+        predictions: Tuples of owner_id, post_id (0 for posts), vk_id
+            (post ID for posts, comment ID for comments) and prediction
+        model_version: Version of the models that made the predictions
+
+    Returns:
+        Numbers of inserted and skipped predictions
+    """
+    buffer = io.StringIO()
+    total = 0
+    # NULL in COPY text format
+    version = model_version or "\\N"
+    for owner_id, post_id, vk_id, depression_prediction in predictions:
+        prediction = "t" if depression_prediction else "f"
+        buffer.write(
+            f"{run_id}\t{owner_id}\t{post_id}\t{vk_id}\t{prediction}"
+            f"\t{version}\n"
+        )
+        total += 1
+    if total == 0:
+        return 0, 0
+    buffer.seek(0)
+
+    try:
+        start = time.perf_counter()
+        with conn.cursor() as cur:
+            # Staging table lives until the end of the transaction
+            cur.execute(
+                """
+                CREATE TEMP TABLE IF NOT EXISTS predictions_staging (
+                    run_id INTEGER,
+                    owner_id BIGINT,
+                    post_id BIGINT,
+                    vk_id BIGINT,
+                    depression_prediction BOOLEAN,
+                    model_version VARCHAR(64)
+                ) ON COMMIT DROP;
+                TRUNCATE predictions_staging;
+                """
+            )
+            cur.copy_expert(
+                """
+                COPY predictions_staging
+                (run_id, owner_id, post_id, vk_id, depression_prediction,
+                 model_version)
+                FROM STDIN
+                """,
+                buffer,
+            )
+            cur.execute(
+                """
+                INSERT INTO depression_predictions
+                (run_id, owner_id, post_id, vk_id, depression_prediction,
+                 model_version)
+                SELECT run_id, owner_id, post_id, vk_id,
+                    depression_prediction, model_version
+                FROM predictions_staging
+                ON CONFLICT (owner_id, post_id, vk_id) DO NOTHING
+                """
+            )
+            inserted = cur.rowcount
+        record_db_write(
+            "depression_predictions", inserted, time.perf_counter() - start
+        )
+        return inserted, total - inserted
+    except psycopg2.Error as e:
+        log.exception("Error saving predictions", exc_info=e)
+        raise
+
+
+def save_model_predictions(
+    conn: connection,
+    model_version: str,
+    predictions: Iterable[tuple[int, int, int, bool]],
+    run_ids: list[int] | None = None,
+    apply: bool = False,
+) -> tuple[int, int]:
+    """
+    Save predictions of a version of the models for saved publications.
+    Rows are loaded with COPY into a staging table and upserted into
+    model_predictions, predictions of the same version are replaced.
+    Publications missing from depression_predictions are skipped.
+    Does not commit, the caller owns the transaction.
+
+    Args:
+        conn: Database connection
+        model_version: Version of the models that made the predictions
+        predictions: Tuples of owner_id, post_id (0 for posts), vk_id
+            (post ID for posts, comment ID for comments) and prediction
+        run_ids: Keep only publications saved by these crawler runs, None
+            for publications of any run
+        apply: Also replace the predictions in depression_predictions
+
+    Returns:
+        Numbers of saved predictions and of updated depression_predictions
     """
+    buffer = io.StringIO()
+    for owner_id, post_id, vk_id, depression_prediction in predictions:
+        prediction = "t" if depression_prediction else "f"
+        buffer.write(f"{owner_id}\t{post_id}\t{vk_id}\t{prediction}\n")
+    if buffer.tell() == 0:
+        return 0, 0
+    buffer.seek(0)
+
     try:
+        start = time.perf_counter()
         with conn.cursor() as cur:
-            try:
+            # Staging table lives until the end of the transaction
+            cur.execute(
+                """
+                CREATE TEMP TABLE IF NOT EXISTS model_predictions_staging (
+                    owner_id BIGINT,
+                    post_id BIGINT,
+                    vk_id BIGINT,
+                    depression_prediction BOOLEAN
+                ) ON COMMIT DROP;
+                TRUNCATE model_predictions_staging;
+                """
+            )
+            cur.copy_expert(
+                """
+                COPY model_predictions_staging
+                (owner_id, post_id, vk_id, depression_prediction)
+                FROM STDIN
+                """,
+                buffer,
+            )
+            # A publication may be read more than once, one row is kept
+            cur.execute(
+                """
+                INSERT INTO model_predictions
+                (owner_id, post_id, vk_id, model_version,
+                 depression_prediction)
+                SELECT DISTINCT ON (s.owner_id, s.post_id, s.vk_id)
+                    s.owner_id, s.post_id, s.vk_id, %(model_version)s,
+                    s.depression_prediction
+                FROM model_predictions_staging s
+                JOIN depression_predictions d
+                    ON d.owner_id = s.owner_id
+                    AND d.post_id = s.post_id
+                    AND d.vk_id = s.vk_id
+                WHERE %(run_ids)s::INTEGER[] IS NULL
+                    OR d.run_id = ANY(%(run_ids)s::INTEGER[])
+                ON CONFLICT (owner_id, post_id, vk_id, model_version)
+                DO UPDATE SET
+                    depression_prediction = EXCLUDED.depression_prediction,
+                    created_at = CURRENT_TIMESTAMP
+                """,
+                {"model_version": model_version, "run_ids": run_ids},
+            )
+            saved = cur.rowcount
+            updated = 0
+            if apply:
                 cur.execute(
                     """
-                    INSERT INTO depression_predictions 
-                    (run_id, owner_id, post_id, vk_id, depression_prediction)
-                    VALUES (%s, %s, %s, %s, %s)
+                    UPDATE depression_predictions d
+                    SET depression_prediction = m.depression_prediction,
+                        model_version = m.model_version
+                    FROM model_predictions m
+                    JOIN model_predictions_staging s
+                        ON s.owner_id = m.owner_id
+                        AND s.post_id = m.post_id
+                        AND s.vk_id = m.vk_id
+                    WHERE m.model_version = %(model_version)s
+                        AND d.owner_id = m.owner_id
+                        AND d.post_id = m.post_id
+                        AND d.vk_id = m.vk_id
+                        AND (
+                            d.depression_prediction != m.depression_prediction
+                            OR d.model_version IS DISTINCT FROM m.model_version
+                        )
+                        AND (
+                            %(run_ids)s::INTEGER[] IS NULL
+                            OR d.run_id = ANY(%(run_ids)s::INTEGER[])
+                        )
+                    """,
+                    {"model_version": model_version, "run_ids": run_ids},
+                )
+                updated = cur.rowcount
+        record_db_write(
+            "model_predictions", saved + updated, time.perf_counter() - start
+        )
+        return saved, updated
+    except psycopg2.Error as e:
+        log.exception("Error saving model predictions", exc_info=e)
+        raise
+
+
+def get_run_group_ids(conn: connection, run_ids: list[int]) -> list[int]:
+    """
+    Get groups analyzed by crawler runs.
+
+    Args:
+        conn: Database connection
+        run_ids: IDs of crawler runs
+
+    Returns:
+        VK group IDs of the runs
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT DISTINCT group_id FROM run_groups
+                WHERE run_id = ANY(%s)
+                ORDER BY group_id
+                """,
+                (run_ids,),
+            )
+            return [row[0] for row in cur.fetchall()]
+    except psycopg2.Error as e:
+        log.exception("Error getting groups of runs", exc_info=e)
+        raise
+
+
+def get_post_comment_counts(
+    conn: connection,
+    owner_id: int,
+    post_ids: list[int],
+) -> dict[int, int]:
+    """
+    Get comment counts of posts when their comments were last collected.
+
+    Args:
+        conn: Database connection
+        owner_id: VK group ID
+        post_ids: IDs of posts to look up
+
+    Returns:
+        Comment count by post ID, posts never collected are missing
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT post_id, comments_count
+                FROM post_comment_counts
+                WHERE owner_id = %s AND post_id = ANY(%s)
+                """,
+                (owner_id, post_ids),
+            )
+            return dict(cur.fetchall())
+    except psycopg2.Error as e:
+        log.exception("Error getting post comment counts", exc_info=e)
+        raise
+
+
+def get_group_watermarks(
+    conn: connection,
+    screen_names: list[str],
+) -> dict[str, datetime]:
+    """
+    Get dates of the newest posts seen in groups by incremental crawling.
+
+    Args:
+        conn: Database connection
+        screen_names: VK group names to look up
+
+    Returns:
+        Date of the newest seen post by group name, groups never crawled
+        are missing
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT g.screen_name, w.last_post_date
+                FROM group_watermarks w
+                JOIN groups g ON g.group_id = w.group_id
+                WHERE g.screen_name = ANY(%s)
+                """,
+                (screen_names,),
+            )
+            return dict(cur.fetchall())
+    except psycopg2.Error as e:
+        log.exception("Error getting group watermarks", exc_info=e)
+        raise
+
+
+def save_crawl_state(
+    conn: connection,
+    watermarks: list[tuple[int, int, datetime]],
+    comment_counts: list[tuple[int, int, int]],
+) -> None:
+    """
+    Save newest seen posts of groups and comment counts of posts.
+    Watermarks never move back to older posts.
+    Does not commit, the caller owns the transaction.
+
+    Args:
+        conn: Database connection
+        watermarks: Tuples of group_id, last post ID and last post date
+        comment_counts: Tuples of owner_id, post_id and comments count
+    """
+    # A row can be upserted only once per statement
+    comment_counts = list({row[:2]: row for row in comment_counts}.values())
+    try:
+        start = time.perf_counter()
+        with conn.cursor() as cur:
+            if watermarks:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO group_watermarks
+                    (group_id, last_post_id, last_post_date)
+                    VALUES %s
+                    ON CONFLICT (group_id) DO UPDATE SET
+                        last_post_id = EXCLUDED.last_post_id,
+                        last_post_date = EXCLUDED.last_post_date,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE group_watermarks.last_post_id
+                        < EXCLUDED.last_post_id
                     """,
-                    (run_id, owner_id, post_id, vk_id, depression_prediction),
+                    watermarks,
+                    page_size=len(watermarks),
                 )
-                conn.commit()
-            except psycopg2.errors.UniqueViolation:
-                log.debug(
-                    f"Post {post_id} from group {owner_id} already exists, skip"
+            if comment_counts:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO post_comment_counts
+                    (owner_id, post_id, comments_count)
+                    VALUES %s
+                    ON CONFLICT (owner_id, post_id) DO UPDATE SET
+                        comments_count = EXCLUDED.comments_count,
+                        updated_at = CURRENT_TIMESTAMP
+                    """,
+                    comment_counts,
+                    page_size=1000,
                 )
-                conn.rollback()
+        record_db_write(
+            "crawl_state",
+            len(watermarks) + len(comment_counts),
+            time.perf_counter() - start,
+        )
     except psycopg2.Error as e:
-        log.exception("Error saving prediction", exc_info=e)
-        conn.rollback()
+        log.exception("Error saving crawl state", exc_info=e)
+        raise
+
+
+def get_cached_predictions(
+    conn: connection,
+    model_version: str,
+    text_hashes: list[str],
+) -> dict[str, bool]:
+    """
+    Get cached predictions of texts.
+
+    Args:
+        conn: Database connection
+        model_version: Version of the models that made the predictions
+        text_hashes: Hashes of cleaned texts
+
+    Returns:
+        Prediction by text hash, texts not in cache are missing
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT text_hash, depression_prediction
+                FROM prediction_cache
+                WHERE model_version = %s AND text_hash = ANY(%s)
+                """,
+                (model_version, text_hashes),
+            )
+            return dict(cur.fetchall())
+    except psycopg2.Error as e:
+        log.exception("Error getting cached predictions", exc_info=e)
+        raise
+
+
+def save_cached_predictions(
+    conn: connection,
+    model_version: str,
+    predictions: Iterable[tuple[str, bool]],
+) -> None:
+    """
+    Add predictions of texts to the cache, cached texts are kept.
+    Does not commit, the caller owns the transaction.
+
+    Args:
+        conn: Database connection
+        model_version: Version of the models that made the predictions
+        predictions: Tuples of text hash and prediction
+    """
+    rows = [
+        (model_version, text_hash, bool(prediction))
+        for text_hash, prediction in predictions
+    ]
+    if not rows:
+        return
+    try:
+        start = time.perf_counter()
+        with conn.cursor() as cur:
+            execute_values(
+                cur,
+                """
+                INSERT INTO prediction_cache
+                (model_version, text_hash, depression_prediction)
+                VALUES %s
+                ON CONFLICT (model_version, text_hash) DO NOTHING
+                """,
+                rows,
+                page_size=1000,
+            )
+        record_db_write(
+            "prediction_cache", len(rows), time.perf_counter() - start
+        )
+    except psycopg2.Error as e:
+        log.exception("Error saving cached predictions", exc_info=e)
         raise
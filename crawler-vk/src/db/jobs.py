@@ -0,0 +1,358 @@
+import logging
+from typing import Any, Dict, List, Mapping
+
+import psycopg2
+from psycopg2._psycopg import connection
+from psycopg2.extras import Json, RealDictCursor, execute_values
+
+log = logging.getLogger(__name__)
+
+JOB_COLUMNS = """
+    id, groups, target_date, state, worker_id, attempts, cancel_requested,
+    profile, run_id, status, created_at, started_at, finished_at
+"""
+
+
+def create_jobs(
+    conn: connection,
+    jobs: List[tuple[str, List[str], str, bool, str]],
+) -> None:
+    """
+    Queue jobs.
+
+    Args:
+        conn: Database connection
+        jobs: Tuples of job ID, group names, target date in YYYY-MM-DD
+            format, whether the run is profiled and ID of the run the job
+            continues
+    """
+    try:
+        with conn.cursor() as cur:
+            execute_values(
+                cur,
+                """
+                INSERT INTO crawler_jobs
+                    (id, groups, target_date, profile, run_id)
+                VALUES %s
+                """,
+                jobs,
+            )
+        conn.commit()
+    except psycopg2.Error as e:
+        log.exception("Error creating jobs", exc_info=e)
+        conn.rollback()
+        raise
+
+
+def claim_job(
+    conn: connection, worker_id: str, lease_seconds: float
+) -> Dict[str, Any] | None:
+    """
+    Lease the oldest queued job to a worker.
+    Workers claiming at the same time skip rows locked by each other.
+
+    Args:
+        conn: Database connection
+        worker_id: ID of the claiming worker
+        lease_seconds: Time the worker holds the job without a heartbeat
+
+    Returns:
+        Claimed job, None if the queue is empty
+    """
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                f"""
+                UPDATE crawler_jobs
+                SET state = 'running',
+                    worker_id = %s,
+                    lease_expires_at = now() + make_interval(secs => %s),
+                    attempts = attempts + 1,
+                    started_at = now()
+                WHERE id = (
+                    SELECT id FROM crawler_jobs
+                    WHERE state = 'queued'
+                    ORDER BY created_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING {JOB_COLUMNS}
+                """,
+                (worker_id, lease_seconds),
+            )
+            job = cur.fetchone()
+        conn.commit()
+        return job
+    except psycopg2.Error as e:
+        log.exception("Error claiming job", exc_info=e)
+        conn.rollback()
+        raise
+
+
+def heartbeat_job(
+    conn: connection,
+    job_id: str,
+    worker_id: str,
+    lease_seconds: float,
+    status: Mapping[str, Any],
+) -> bool | None:
+    """
+    Extend the lease of a running job and store its pipeline status.
+
+    Args:
+        conn: Database connection
+        job_id: ID of the job
+        worker_id: ID of the worker holding the lease
+        lease_seconds: New lease duration from now
+        status: Pipeline status of the job
+
+    Returns:
+        Whether cancellation of the job was requested, None if the worker
+        no longer holds the job
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE crawler_jobs
+                SET lease_expires_at = now() + make_interval(secs => %s),
+                    status = %s
+                WHERE id = %s AND worker_id = %s AND state = 'running'
+                RETURNING cancel_requested
+                """,
+                (lease_seconds, Json(status), job_id, worker_id),
+            )
+            row = cur.fetchone()
+        conn.commit()
+        return row[0] if row else None
+    except psycopg2.Error as e:
+        log.exception("Error sending job heartbeat", exc_info=e)
+        conn.rollback()
+        raise
+
+
+def finish_job(
+    conn: connection,
+    job_id: str,
+    worker_id: str,
+    state: str,
+    status: Mapping[str, Any],
+) -> None:
+    """
+    Record the outcome of a job run by a worker.
+
+    Args:
+        conn: Database connection
+        job_id: ID of the job
+        worker_id: ID of the worker holding the lease
+        state: Final state, finished, failed or cancelled
+        status: Final pipeline status of the job
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE crawler_jobs
+                SET state = %s,
+                    status = %s,
+                    lease_expires_at = NULL,
+                    finished_at = now()
+                WHERE id = %s AND worker_id = %s AND state = 'running'
+                """,
+                (state, Json(status), job_id, worker_id),
+            )
+            if cur.rowcount == 0:
+                log.warning(f"Job {job_id} is no longer held by {worker_id}")
+        conn.commit()
+    except psycopg2.Error as e:
+        log.exception("Error finishing job", exc_info=e)
+        conn.rollback()
+        raise
+
+
+def release_job(conn: connection, job_id: str, worker_id: str) -> None:
+    """
+    Return a job interrupted by its worker shutting down to the queue.
+    The interrupted run doesn't count as an attempt, jobs with a pending
+    cancel request are cancelled instead.
+
+    Args:
+        conn: Database connection
+        job_id: ID of the job
+        worker_id: ID of the worker holding the lease
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE crawler_jobs
+                SET state = CASE
+                        WHEN cancel_requested THEN 'cancelled' ELSE 'queued'
+                    END,
+                    finished_at = CASE WHEN cancel_requested THEN now() END,
+                    started_at = CASE
+                        WHEN cancel_requested THEN started_at
+                    END,
+                    worker_id = NULL,
+                    lease_expires_at = NULL,
+                    attempts = attempts - 1,
+                    status = NULL
+                WHERE id = %s AND worker_id = %s AND state = 'running'
+                """,
+                (job_id, worker_id),
+            )
+        conn.commit()
+    except psycopg2.Error as e:
+        log.exception("Error releasing job", exc_info=e)
+        conn.rollback()
+        raise
+
+
+def requeue_expired_jobs(conn: connection, max_attempts: int) -> List[str]:
+    """
+    Return jobs of workers that stopped sending heartbeats to the queue.
+    Jobs that used up their attempts or were cancelled are closed instead.
+
+    Args:
+        conn: Database connection
+        max_attempts: Runs of a job before it is failed
+
+    Returns:
+        IDs of affected jobs
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE crawler_jobs
+                SET state = CASE
+                        WHEN cancel_requested THEN 'cancelled'
+                        WHEN attempts >= %s THEN 'failed'
+                        ELSE 'queued'
+                    END,
+                    finished_at = CASE
+                        WHEN cancel_requested OR attempts >= %s THEN now()
+                    END,
+                    started_at = CASE
+                        WHEN cancel_requested OR attempts >= %s
+                        THEN started_at
+                    END,
+                    worker_id = NULL,
+                    lease_expires_at = NULL
+                WHERE state = 'running' AND lease_expires_at < now()
+                RETURNING id
+                """,
+                (max_attempts, max_attempts, max_attempts),
+            )
+            job_ids = [row[0] for row in cur.fetchall()]
+        conn.commit()
+        return job_ids
+    except psycopg2.Error as e:
+        log.exception("Error requeueing expired jobs", exc_info=e)
+        conn.rollback()
+        raise
+
+
+def cancel_jobs(conn: connection, job_ids: List[str] | None = None) -> int:
+    """
+    Cancel queued jobs and request running jobs to stop.
+
+    Args:
+        conn: Database connection
+        job_ids: IDs of jobs to cancel, all active jobs if None
+
+    Returns:
+        Number of jobs affected
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE crawler_jobs
+                SET cancel_requested = TRUE,
+                    state = CASE
+                        WHEN state = 'queued' THEN 'cancelled' ELSE state
+                    END,
+                    finished_at = CASE
+                        WHEN state = 'queued' THEN now() ELSE finished_at
+                    END
+                WHERE state IN ('queued', 'running')
+                    AND (%s OR id = ANY(%s))
+                """,
+                (job_ids is None, job_ids or []),
+            )
+            count = cur.rowcount
+        conn.commit()
+        return count
+    except psycopg2.Error as e:
+        log.exception("Error cancelling jobs", exc_info=e)
+        conn.rollback()
+        raise
+
+
+def get_jobs(
+    conn: connection,
+    job_id: str | None = None,
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
+    """
+    Get jobs, most recent first.
+    Queued and running jobs are always returned, finished ones up to limit.
+
+    Args:
+        conn: Database connection
+        job_id: ID of a single job to get, all jobs if None
+        limit: Maximum number of finished jobs
+
+    Returns:
+        Job rows
+    """
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            if job_id is not None:
+                cur.execute(
+                    f"SELECT {JOB_COLUMNS} FROM crawler_jobs WHERE id = %s",
+                    (job_id,),
+                )
+            else:
+                cur.execute(
+                    f"""
+                    (SELECT {JOB_COLUMNS} FROM crawler_jobs
+                     WHERE state IN ('queued', 'running'))
+                    UNION ALL
+                    (SELECT {JOB_COLUMNS} FROM crawler_jobs
+                     WHERE state NOT IN ('queued', 'running')
+                     ORDER BY created_at DESC
+                     LIMIT %s)
+                    ORDER BY created_at DESC
+                    """,
+                    (limit,),
+                )
+            return [dict(row) for row in cur.fetchall()]
+    except psycopg2.Error as e:
+        log.exception("Error getting jobs", exc_info=e)
+        raise
+
+
+def reset_job_status(conn: connection, job_id: str) -> None:
+    """
+    Clear the reported pipeline status of a finished job.
+
+    Args:
+        conn: Database connection
+        job_id: ID of the job
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE crawler_jobs SET status = NULL
+                WHERE id = %s AND state NOT IN ('queued', 'running')
+                """,
+                (job_id,),
+            )
+        conn.commit()
+    except psycopg2.Error as e:
+        log.exception("Error resetting job status", exc_info=e)
+        conn.rollback()
+        raise
@@ -0,0 +1,217 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Iterator, Tuple, TypedDict
+
+import psycopg2
+from psycopg2._psycopg import connection as PgConnection
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from src.db.db import get_db_connection
+
+log = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Exception raised when no connection is available in time."""
+
+    def __init__(
+        self, message: str = "Timed out waiting for a database connection"
+    ) -> None:
+        super().__init__(message)
+
+
+class PoolStats(TypedDict):
+    size: int  # open connections, idle and in use
+    in_use: int  # connections checked out
+    idle: int  # connections waiting in the pool
+    max_size: int  # maximum number of open connections
+    checkouts: int  # total successful checkouts
+    timeouts: int  # checkouts that timed out
+    reconnects: int  # stale connections replaced on checkout
+    wait_seconds_total: float  # total time spent waiting for checkouts
+    wait_seconds_max: float  # longest wait for a checkout
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of PostgreSQL connections.
+
+    Connections idle for longer than the health check interval are pinged
+    on checkout and replaced if they are broken, so the crawler recovers
+    from database restarts without being restarted itself.
+    """
+
+    def __init__(
+        self,
+        min_size: int,
+        max_size: int,
+        timeout: float,
+        health_check_interval: float,
+    ) -> None:
+        """
+        Initialize the pool and open min_size connections.
+
+        Args:
+            min_size: Connections opened at start
+            max_size: Maximum number of open connections
+            timeout: Seconds to wait for a free connection on checkout
+            health_check_interval: Idle seconds after which a connection
+                is checked before being handed out
+        """
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._cond = threading.Condition()
+        self._idle: Deque[Tuple[PgConnection, float]] = deque()
+        self._size = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    @contextmanager
+    def connection(self) -> Iterator[PgConnection]:
+        """
+        Check out a connection for the duration of the block.
+        Uncommitted changes are rolled back when the connection is returned.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def getconn(self) -> PgConnection:
+        """
+        Check out a healthy connection, opening a new one if needed.
+
+        Returns:
+            Database connection
+
+        Raises:
+            PoolTimeout: If no connection became available within timeout
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        conn: PgConnection | None
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Reserve a slot, the connection is opened outside the lock
+                    conn, last_used = None, 0.0
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout()
+                self._cond.wait(remaining)
+
+            wait = time.monotonic() - start
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif not self._is_healthy(conn, last_used):
+                log.warning("Replacing stale database connection")
+                self._close(conn)
+                conn = self._connect()
+                with self._cond:
+                    self._reconnects += 1
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn: PgConnection) -> None:
+        """
+        Return a connection to the pool.
+        Open transactions are rolled back, broken connections are dropped.
+
+        Args:
+            conn: Connection checked out from this pool
+        """
+        healthy = not conn.closed
+        if healthy and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+            self._cond.notify()
+        if not healthy:
+            self._close(conn)
+
+    def get_stats(self) -> PoolStats:
+        """Get pool usage and checkout wait statistics."""
+        with self._cond:
+            return {
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "reconnects": self._reconnects,
+                "wait_seconds_total": round(self._wait_total, 3),
+                "wait_seconds_max": round(self._wait_max, 3),
+            }
+
+    def close(self) -> None:
+        """Close idle connections."""
+        with self._cond:
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+        for conn in idle:
+            self._close(conn)
+
+    def _connect(self) -> PgConnection:
+        conn = get_db_connection()
+        if not conn:
+            raise psycopg2.OperationalError("Failed to connect to database")
+        return conn
+
+    def _is_healthy(self, conn: PgConnection, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _close(self, conn: PgConnection) -> None:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
@@ -0,0 +1,52 @@
+import logging
+import signal
+import threading
+
+from src.config import settings
+from src.crawler.crawler import Crawler
+from src.crawler.job_queue.job_queue import JobWorker
+from src.crawler.metrics.metrics import start_metrics_server
+from src.crawler.rate_limiter.rate_limiter import create_collector
+
+log = logging.getLogger(__name__)
+
+
+def main() -> None:
+    """
+    Run pipelines of jobs queued in the database until terminated.
+    Jobs running at shutdown return to the queue for other workers.
+    """
+    collector = create_collector(
+        settings.service_token, settings.vk_requests_per_second
+    )
+    crawler = Crawler(collector)
+    worker = JobWorker(
+        crawler,
+        settings.data_dir,
+        settings.max_concurrent_jobs,
+        settings.job_lease_seconds,
+        settings.job_heartbeat_interval,
+        settings.job_poll_interval,
+        settings.job_max_attempts,
+    )
+
+    stop_requested = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop_requested.set())
+
+    # Workers have no API, metrics are served on their own port
+    metrics_server = None
+    if settings.worker_metrics_port:
+        metrics_server = start_metrics_server(settings.worker_metrics_port)
+
+    worker.start()
+    stop_requested.wait()
+    log.info("Stopping job worker")
+    worker.stop()
+    if metrics_server is not None:
+        metrics_server.shutdown()
+    crawler.db_pool.close()
+
+
+if __name__ == "__main__":
+    main()
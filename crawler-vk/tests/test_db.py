@@ -0,0 +1,72 @@
+"""
+Database tests, run against the database of the DB_* environment variables
+and skipped if it is not reachable. Each test is rolled back.
+
+Usage (from the crawler-vk directory):
+    uv run python -m pytest tests
+"""
+
+from datetime import date
+from typing import Iterator
+
+import pytest
+from psycopg2._psycopg import connection
+
+from src.db.db import (
+    create_crawler_run,
+    create_tables,
+    get_db_connection,
+    save_groups,
+    save_model_predictions,
+    save_predictions,
+)
+
+GROUP_ID = 999_999_001
+
+
+@pytest.fixture
+def conn() -> Iterator[connection]:
+    conn = get_db_connection()
+    if conn is None:
+        pytest.skip("Database is not reachable")
+    try:
+        create_tables(conn)
+        yield conn
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def get_predictions(conn: connection, run_id: int) -> list[tuple]:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT vk_id, depression_prediction, model_version
+            FROM depression_predictions
+            WHERE run_id = %s
+            ORDER BY vk_id
+            """,
+            (run_id,),
+        )
+        return cur.fetchall()
+
+
+def test_apply_leaves_other_runs(conn: connection) -> None:
+    save_groups(conn, [(GROUP_ID, "Test", "test", 0, "page")])
+    # Predictions are saved with the positive group ID as owner_id
+    owner_id = GROUP_ID
+    applied_run = create_crawler_run(conn, date(2024, 1, 1), [GROUP_ID])
+    other_run = create_crawler_run(conn, date(2024, 1, 2), [GROUP_ID])
+    save_predictions(conn, applied_run, [(owner_id, 0, 1, False)], "old")
+    save_predictions(conn, other_run, [(owner_id, 0, 2, False)], "old")
+    new = [(owner_id, 0, 1, True), (owner_id, 0, 2, True)]
+
+    # An earlier re-scoring of all runs under the same version
+    save_model_predictions(conn, "new", new)
+    saved, updated = save_model_predictions(
+        conn, "new", new, run_ids=[applied_run], apply=True
+    )
+
+    assert (saved, updated) == (1, 1)
+    assert get_predictions(conn, applied_run) == [(1, True, "new")]
+    assert get_predictions(conn, other_run) == [(2, False, "old")]
@@ -0,0 +1,15 @@
+import { CRAWLER_URL } from '@/lib/env';
+import { proxyEventStream } from '@/lib/eventStream';
+
+export const dynamic = 'force-dynamic';
+
+export async function GET(
+    request: Request,
+    { params }: { params: Promise<{ jobId: string }> }
+) {
+    const { jobId } = await params;
+    return proxyEventStream(
+        `${CRAWLER_URL}/jobs/${encodeURIComponent(jobId)}/stream`,
+        request.signal
+    );
+}
@@ -0,0 +1,8 @@
+import { CRAWLER_URL } from '@/lib/env';
+import { proxyEventStream } from '@/lib/eventStream';
+
+export const dynamic = 'force-dynamic';
+
+export async function GET(request: Request) {
+    return proxyEventStream(`${CRAWLER_URL}/status/stream`, request.signal);
+}
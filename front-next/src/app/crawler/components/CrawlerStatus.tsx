@@ -39,6 +39,23 @@ export default function CrawlerStatus({
                         Progress: {status?.progress}%
                     </p>
                 )}
+                {isWorking && status?.stages && (
+                    <ul className="text-gray-600">
+                        {Object.entries(status.stages).map(
+                            ([stage, progress]) => (
+                                <li key={stage}>
+                                    {stage}: {progress.state}
+                                    {progress.state !== 'pending' &&
+                                        ` (${progress.completed}${
+                                            progress.total !== null
+                                                ? `/${progress.total}`
+                                                : ''
+                                        })`}
+                                </li>
+                            )
+                        )}
+                    </ul>
+                )}
                 {status?.error && (
                     <div className="flex flex-col gap-2">
                         <p className="text-red-500">{status.error}</p>
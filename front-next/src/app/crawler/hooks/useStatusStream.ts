@@ -0,0 +1,56 @@
+import type { CrawlerStatusType } from '@/types/crawler';
+import { useEffect } from 'react';
+
+type Changes = { [key: string]: unknown };
+
+// Merges changed fields, nested like the status, into a copy of the status
+function mergeChanges<T extends Changes>(target: T, changes: Changes): T {
+    const result: Changes = { ...target };
+    for (const [key, value] of Object.entries(changes)) {
+        const current = result[key];
+        result[key] =
+            value !== null &&
+            typeof value === 'object' &&
+            current !== null &&
+            typeof current === 'object'
+                ? mergeChanges(current as Changes, value as Changes)
+                : value;
+    }
+    return result as T;
+}
+
+// Follows status pushed by the crawler: a snapshot, then changed fields only.
+// Calls onEnd when the job is no longer active or the stream fails.
+export default function useStatusStream(
+    url: string | null,
+    onStatus: (
+        update: (status: CrawlerStatusType | null) => CrawlerStatusType | null
+    ) => void,
+    onEnd: () => void
+) {
+    useEffect(() => {
+        if (!url) return;
+        const source = new EventSource(url);
+
+        source.addEventListener('snapshot', (event) => {
+            const snapshot: CrawlerStatusType = JSON.parse(event.data);
+            onStatus(() => snapshot);
+        });
+        source.addEventListener('changes', (event) => {
+            const changes: Changes = JSON.parse(event.data);
+            onStatus((status) => status && mergeChanges(status, changes));
+        });
+        source.addEventListener('end', () => {
+            source.close();
+            onEnd();
+        });
+        source.onerror = () => {
+            // Reconnects on its own unless the request was rejected
+            if (source.readyState === EventSource.CLOSED) {
+                onEnd();
+            }
+        };
+
+        return () => source.close();
+    }, [url, onStatus, onEnd]);
+}
@@ -7,14 +7,15 @@ import type {
 import { useCallback, useEffect, useState } from 'react';
 import CrawlerForm from './components/CrawlerForm';
 import CrawlerStatus from './components/CrawlerStatus';
-import usePolling from './hooks/usePolling';
+import useStatusStream from './hooks/useStatusStream';
 
-const POLLING_INTERVAL = 2000;
+const STATUS_STREAM_URL = '/api/crawler/status/stream';
 
 export default function CrawlerPage() {
     const [status, setStatus] = useState<CrawlerStatusType | null>(null);
     const [loading, setLoading] = useState(false);
-    const [isPolling, setIsPolling] = useState(false);
+    // Status stream of the followed job, null when not following one
+    const [streamUrl, setStreamUrl] = useState<string | null>(null);
     const [error, setError] = useState<string | null>(null);
 
     const fetchStatus = useCallback(async () => {
@@ -23,16 +24,21 @@ export default function CrawlerPage() {
             const newStatus: CrawlerStatusType = await res.json();
             setStatus(newStatus);
 
-            // Stop polling if crawler is idle
-            if (newStatus.state === 'idle') {
-                setIsPolling(false);
+            // Follow a job that is already running
+            if (newStatus.state !== 'idle') {
+                setStreamUrl((url) => url ?? STATUS_STREAM_URL);
             }
         } catch (error) {
             console.error('Error fetching status:', error);
         }
     }, []);
 
-    usePolling(fetchStatus, isPolling, POLLING_INTERVAL);
+    const handleStreamEnd = useCallback(() => {
+        setStreamUrl(null);
+        fetchStatus();
+    }, [fetchStatus]);
+
+    useStatusStream(streamUrl, setStatus, handleStreamEnd);
 
     const handleStop = async () => {
         setLoading(true);
@@ -62,8 +68,8 @@ export default function CrawlerPage() {
             const data: CollectDataResponse = await res.json();
             if (data.error) {
                 setError(data.error);
-            } else {
-                setIsPolling(true);
+            } else if (data.job_id) {
+                setStreamUrl(`/api/crawler/jobs/${data.job_id}/stream`);
             }
         } catch (error) {
             console.error('Error collecting data:', error);
@@ -0,0 +1,18 @@
+// Passes a server-sent events stream of the crawler through to the client.
+// The upstream request is aborted when the client disconnects.
+export async function proxyEventStream(url: string, signal: AbortSignal) {
+    const res = await fetch(url, { signal, cache: 'no-store' });
+    if (!res.ok || !res.body) {
+        const data = await res.json();
+        return new Response(JSON.stringify(data), { status: res.status });
+    }
+
+    return new Response(res.body, {
+        headers: {
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            Connection: 'keep-alive',
+            'X-Accel-Buffering': 'no',
+        },
+    });
+}
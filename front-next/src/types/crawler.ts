@@ -7,27 +7,103 @@ export type CrawlerState =
     | "inference" // inference
     | "saving_results"; // saving results
 
+export type PipelineStage =
+    | "collecting_groups"
+    | "collecting_data"
+    | "preprocessing"
+    | "inference"
+    | "saving_results";
+
+export type StageProgress = {
+    state: "pending" | "running" | "done";
+    completed: number; // groups for collection stages, publications otherwise
+    total: number | null;
+};
+
+export type CacheStats = {
+    hits: number;
+    misses: number;
+};
+
+export type SaveStats = {
+    inserted: number;
+    skipped: number;
+};
+
 export type CrawlerStatusType = {
     state: CrawlerState;
     current_group: string | null;
     progress: number | null;
     error: string | null;
     should_stop: boolean;
+    cache_stats: Record<string, CacheStats>;
+    peak_rss_bytes: number | null;
+    save_stats: SaveStats;
+    stages: Record<PipelineStage, StageProgress>;
 };
 
 export type CollectDataRequest = {
     groups: string[];
     target_date: string;
+    profile?: boolean;  // profile the runs, see /profiles of the crawler
 };
 
 export type CollectDataResponse = {
     status: string;
+    job_id?: string;
+    job_ids?: string[];  // all jobs when the group list was split
     groups: string[];
     target_date: string;
     error?: string;
     current_status?: CrawlerStatusType;
 };
 
+export type JobState =
+    | "queued"
+    | "running"
+    | "finished"
+    | "failed"
+    | "cancelled";
+
+export type JobInfo = {
+    id: string;
+    groups: string[];
+    target_date: string;
+    state: JobState;
+    created_at: string;
+    started_at: string | null;
+    finished_at: string | null;
+    profile: boolean;  // whether the run is profiled
+    run_id: string;  // data directory of the run, see /resume of the crawler
+    status: CrawlerStatusType;
+};
+
 export type StopResponse = {
     status: string;
 };
+
+export type RescoreSource = "features" | "texts";
+
+export type RescoreRequest = {
+    group_ids?: number[];  // all groups if empty
+    run_ids?: number[];  // only predictions of these runs are re-scored
+    source?: RescoreSource;
+    apply?: boolean;  // replace predictions of the runs
+    reload_classifier?: boolean;
+};
+
+export type RescoreInfo = {
+    id: string;
+    group_ids: number[];
+    run_ids: number[];
+    source: RescoreSource;
+    apply: boolean;
+    state: "queued" | "running" | "finished" | "failed";
+    model_version: string | null;
+    scored: number;
+    saved: number;  // predictions saved to model_predictions
+    updated: number;  // predictions replaced in depression_predictions
+    created_at: string;
+    finished_at: string | null;
+    error: string | null;
+};